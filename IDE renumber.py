@@ -1,12 +1,13 @@
 import os
-import glob
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
+import batch_tools
+from batch_tools import get_ide_files, auto_start_ids
+from id_allocator import DEFAULT_ID_CEILING
+from write_journal import WriteJournal
+from profiling import profile_from_environment
 
-def get_ide_files(directory):
-    return glob.glob(os.path.join(directory, "*.ide"))
-
-def renumber_ide_files(directory, start_id, mode, file_ids=None):
+def renumber_ide_files(directory, start_id, mode, file_ids=None, picked=False):
     ide_files_list = get_ide_files(directory)
     if not ide_files_list:
         messagebox.showerror("Error", "No IDE files found in the selected directory.")
@@ -17,50 +18,55 @@ def renumber_ide_files(directory, start_id, mode, file_ids=None):
     except ValueError:
         messagebox.showerror("Error", "Invalid start ID. Please enter a number.")
         return
-    
-    for file_path in ide_files_list:
-        temp_file = os.path.join(directory, "temp_ide.txt")
-        file_start_id = start_id if mode == "Batch" else file_ids.get(file_path, start_id)
-        
-        try:
-            file_start_id = int(file_start_id)
-        except ValueError:
-            messagebox.showerror("Error", f"Invalid start ID for {os.path.basename(file_path)}.")
-            continue
-
-        with open(file_path, 'r') as source_file, open(temp_file, 'w') as dst_file:
-            valid_line = False
-            for line in source_file:
-                if line.startswith(("objs", "tobj")):
-                    valid_line = True
-                
-                if not (line.startswith('#') or line.startswith('\n') or line[0].isalpha()):
-                    if valid_line:
-                        ide_line = line.split(',')
-                        ide_line[0] = str(file_start_id)
-                        ide_line.pop()
-                        ide_line = ",".join(ide_line) + ", 0\n"
-                        dst_file.write(ide_line)
-                        file_start_id += 1
-                        start_id += 1  # Ensure start_id continues across files in Batch Mode
-                    else:
-                        dst_file.write(line)
-                else:
-                    dst_file.write(line)
-                
-                if line.startswith("end"):
-                    valid_line = False
-        
-        os.remove(file_path)
-        os.rename(temp_file, file_path)
-    
-    messagebox.showinfo("Success", "IDE files renumbered successfully!")
+
+    # The IDEs and IPLs are committed as one batch, originals are kept in .write_journal
+    ipl_files = batch_tools.find_ipl_files(ipl_path.get()) if ipl_path.get() else []
+    try:
+        with WriteJournal(batch_tools.journal_root(ide_files_list + ipl_files)) as journal:
+            renumbered, errors, remap = batch_tools.renumber_ide_files(ide_files_list, start_id, mode, file_ids, journal=journal)
+            if ipl_files:
+                rewritten, ipl_errors = batch_tools.apply_remap_to_ipl_files(ipl_files, remap, journal=journal)
+                errors += ipl_errors
+    except Exception as e:
+        messagebox.showerror("Error", f"Renumbering failed, no files were changed: {e}")
+        return
+
+    counts = f"({sum(renumbered.values())} entries in {len(renumbered)} files, {remap.changed} IDs changed)"
+    summary = f"IDE files renumbered with errors {counts}" if errors else f"IDE files renumbered successfully! {counts}"
+    if ipl_files:
+        summary += f"\n{sum(rewritten.values())} inst lines rewritten in {sum(1 for count in rewritten.values() if count)} of {len(rewritten)} IPL files."
+
+    # Start IDs that were picked automatically
+    if picked and file_ids:
+        lines = [f"{os.path.basename(path)}: {file_start}" for path, file_start in file_ids.items()]
+        summary += "\nPicked start IDs:\n" + "\n".join(lines[:30]) + (f"\n... and {len(lines) - 30} more" if len(lines) > 30 else "")
+    elif picked:
+        summary += f"\nPicked start ID: {start_id}"
+
+    # Old ID -> new ID table, saved next to the IDEs
+    if save_remap_var.get():
+        remap_path = os.path.join(directory, "id_remap.txt")
+        remap.save(remap_path)
+        summary += f"\nID remap table saved to {remap_path}"
+
+    # One dialog for the outcome, a warning listing the failed files if there were any
+    if errors:
+        messagebox.showwarning("Warning", summary + "\n\nSome files were not renumbered:\n" + "\n".join(errors[:30]) +
+                               (f"\n... and {len(errors) - 30} more" if len(errors) > 30 else ""))
+    else:
+        messagebox.showinfo("Success", summary)
 
 def browse_folder():
     folder_selected = filedialog.askdirectory()
     folder_path.set(folder_selected)
     update_file_list()
 
+def browse_reference_folder():
+    reference_path.set(filedialog.askdirectory())
+
+def browse_ipl_folder():
+    ipl_path.set(filedialog.askdirectory())
+
 def update_file_list():
     directory = folder_path.get()
     ide_files = get_ide_files(directory)
@@ -94,84 +100,126 @@ def start_renumbering():
         messagebox.showerror("Error", "Please select a folder.")
         return
     
-    if not start_id_str:
+    if not start_id_str and not auto_var.get():
         messagebox.showerror("Error", "Please enter a Start ID.")
         return
-        
-    # Debug print to see what value we're getting
-    print(f"Start ID entered: '{start_id_str}'")
-    
+
     try:
-        start_id = int(start_id_str)
-        print(f"Converted to integer: {start_id}")
+        start_id = int(start_id_str or 0)
     except ValueError:
         messagebox.showerror("Error", f"Invalid Start ID: '{start_id_str}'. Please enter a number only.")
         return
-    
-    file_ids = {file: entry.get().strip() for file, entry in file_entries.items()} if mode == "Individual" else None
-    renumber_ide_files(directory, start_id, mode, file_ids)
-
-# GUI Setup
-root = tk.Tk()
-root.title("IDE ID Renumber Script")
-root.geometry("550x700")
-root.configure(bg="#2E2E2E")
 
-# Styling
-style = ttk.Style()
-style.theme_use("clam")
-style.configure("TButton", background="#3A3A3A", foreground="white", font=("Arial", 10))
-style.configure("TLabel", background="#2E2E2E", foreground="white", font=("Arial", 12))
-
-folder_path = tk.StringVar()
-mode_var = tk.StringVar(value="Batch")
-file_entries = {}
-
-# Folder Selection
-frame_top = tk.Frame(root, bg="#2E2E2E")
-frame_top.pack(fill="x", padx=10, pady=5)
-
-tk.Label(frame_top, text="Select IDE Files Folder:", bg="#2E2E2E", fg="white").pack(anchor="w")
-entry_folder = tk.Entry(frame_top, textvariable=folder_path, width=50, state="readonly", bg="#1E1E1E", fg="white")
-entry_folder.pack(side="left", padx=5, pady=5)
-ttk.Button(frame_top, text="Browse", command=browse_folder).pack(side="right", padx=5)
-
-# Mode Selection
-frame_mode = tk.Frame(root, bg="#2E2E2E")
-frame_mode.pack(fill="x", padx=10, pady=5)
-
-tk.Label(frame_mode, text="Mode:", bg="#2E2E2E", fg="white").pack(anchor="w")
-tk.Radiobutton(frame_mode, text="Batch - Single start ID for all files", variable=mode_var, value="Batch", command=update_file_list, bg="#2E2E2E", fg="white", selectcolor="#444").pack(anchor="w")
-tk.Radiobutton(frame_mode, text="Individual - Unique start ID for each file", variable=mode_var, value="Individual", command=update_file_list, bg="#2E2E2E", fg="white", selectcolor="#444").pack(anchor="w")
-
-# Start ID Entry
-frame_id = tk.Frame(root, bg="#2E2E2E")
-frame_id.pack(fill="x", padx=10, pady=5)
-
-tk.Label(frame_id, text="Enter Start ID (Batch Mode):", bg="#2E2E2E", fg="white").pack(anchor="w")
-start_id_entry = tk.Entry(frame_id, width=10, bg="#1E1E1E", fg="white", insertbackground="white")
-start_id_entry.pack(anchor="w", pady=5)
-
-# Scrollable File List
-frame_files = tk.Frame(root, bg="#2E2E2E", bd=2, relief="sunken")
-frame_files.pack(fill="both", expand=True, padx=10, pady=5)
-
-file_canvas = tk.Canvas(frame_files, bg="#1E1E1E", highlightthickness=0)
-file_scrollbar = ttk.Scrollbar(frame_files, orient="vertical", command=file_canvas.yview)
-file_frame_container = tk.Frame(file_canvas, bg="#1E1E1E")
-
-file_canvas.create_window((0, 0), window=file_frame_container, anchor="nw")
-file_canvas.configure(yscrollcommand=file_scrollbar.set)
-
-file_scrollbar.pack(side="right", fill="y")
-file_canvas.pack(side="left", fill="both", expand=True)
-
-file_list_frame = tk.Frame(file_frame_container, bg="#1E1E1E")
-file_list_frame.pack(fill="both", expand=True)
+    if auto_var.get():
+        # The Start ID is the lowest ID the free ranges may start at
+        try:
+            ceiling = int(ceiling_entry.get().strip())
+        except ValueError:
+            messagebox.showerror("Error", "Invalid ID limit. Please enter a number.")
+            return
+        picked = auto_start_ids(directory, mode, start_id, ceiling, reference_path.get() or None)
+        if picked is None:
+            messagebox.showerror("Error", f"Not enough contiguous free IDs between {start_id} and {ceiling}.")
+            return
+        start_id, file_ids = picked
+        renumber_ide_files(directory, start_id, mode, file_ids, picked=True)
+        return
 
-# Start Button
-style.configure("Bold.TButton", font=("Arial", 10, "bold"))
-start_button = ttk.Button(root, text="Renumber IDs", command=start_renumbering, style="Bold.TButton")
-start_button.pack(pady=10)
+    file_ids = {file: entry.get().strip() for file, entry in file_entries.items()} if mode == "Individual" else None
+    renumber_ide_files(directory, start_id, mode, file_ids)
 
-root.mainloop()
\ No newline at end of file
+def create_gui():
+    global folder_path, reference_path, ipl_path, auto_var, save_remap_var, mode_var, file_entries
+    global start_id_entry, ceiling_entry, file_canvas, file_list_frame
+
+    root = tk.Tk()
+    root.title("IDE ID Renumber Script")
+    root.geometry("550x820")
+    root.configure(bg="#2E2E2E")
+
+    # Styling
+    style = ttk.Style()
+    style.theme_use("clam")
+    style.configure("TButton", background="#3A3A3A", foreground="white", font=("Arial", 10))
+    style.configure("TLabel", background="#2E2E2E", foreground="white", font=("Arial", 12))
+
+    folder_path = tk.StringVar()
+    reference_path = tk.StringVar()
+    ipl_path = tk.StringVar()
+    save_remap_var = tk.BooleanVar(value=True)
+    auto_var = tk.BooleanVar(value=False)
+    mode_var = tk.StringVar(value="Batch")
+    file_entries = {}
+
+    # Folder Selection
+    frame_top = tk.Frame(root, bg="#2E2E2E")
+    frame_top.pack(fill="x", padx=10, pady=5)
+
+    tk.Label(frame_top, text="Select IDE Files Folder:", bg="#2E2E2E", fg="white").pack(anchor="w")
+    entry_folder = tk.Entry(frame_top, textvariable=folder_path, width=50, state="readonly", bg="#1E1E1E", fg="white")
+    entry_folder.pack(side="left", padx=5, pady=5)
+    ttk.Button(frame_top, text="Browse", command=browse_folder).pack(side="right", padx=5)
+
+    # Mode Selection
+    frame_mode = tk.Frame(root, bg="#2E2E2E")
+    frame_mode.pack(fill="x", padx=10, pady=5)
+
+    tk.Label(frame_mode, text="Mode:", bg="#2E2E2E", fg="white").pack(anchor="w")
+    tk.Radiobutton(frame_mode, text="Batch - Single start ID for all files", variable=mode_var, value="Batch", command=update_file_list, bg="#2E2E2E", fg="white", selectcolor="#444").pack(anchor="w")
+    tk.Radiobutton(frame_mode, text="Individual - Unique start ID for each file", variable=mode_var, value="Individual", command=update_file_list, bg="#2E2E2E", fg="white", selectcolor="#444").pack(anchor="w")
+
+    # Start ID Entry
+    frame_id = tk.Frame(root, bg="#2E2E2E")
+    frame_id.pack(fill="x", padx=10, pady=5)
+
+    tk.Label(frame_id, text="Enter Start ID (Batch Mode):", bg="#2E2E2E", fg="white").pack(anchor="w")
+    start_id_entry = tk.Entry(frame_id, width=10, bg="#1E1E1E", fg="white", insertbackground="white")
+    start_id_entry.pack(anchor="w", pady=5)
+
+    # Automatic start IDs from the free ranges of the game's IDE files
+    tk.Checkbutton(frame_id, text="Pick free start IDs automatically (Start ID = lowest ID to use)", variable=auto_var, bg="#2E2E2E", fg="white", selectcolor="#444").pack(anchor="w")
+    frame_reference = tk.Frame(frame_id, bg="#2E2E2E")
+    frame_reference.pack(fill="x", pady=2)
+    tk.Label(frame_reference, text="Used IDs from (game folder, optional):", bg="#2E2E2E", fg="white").pack(anchor="w")
+    tk.Entry(frame_reference, textvariable=reference_path, width=50, state="readonly", bg="#1E1E1E", fg="white").pack(side="left", padx=5, pady=5)
+    ttk.Button(frame_reference, text="Browse", command=browse_reference_folder).pack(side="right", padx=5)
+    tk.Label(frame_id, text="ID Limit:", bg="#2E2E2E", fg="white").pack(anchor="w")
+    ceiling_entry = tk.Entry(frame_id, width=10, bg="#1E1E1E", fg="white", insertbackground="white")
+    ceiling_entry.insert(0, str(DEFAULT_ID_CEILING))
+    ceiling_entry.pack(anchor="w", pady=5)
+
+    # ID remap table and the IPLs it is applied to
+    frame_remap = tk.Frame(root, bg="#2E2E2E")
+    frame_remap.pack(fill="x", padx=10, pady=5)
+    tk.Checkbutton(frame_remap, text="Save old -> new ID table (id_remap.txt)", variable=save_remap_var, bg="#2E2E2E", fg="white", selectcolor="#444").pack(anchor="w")
+    tk.Label(frame_remap, text="Update IPL files in (optional):", bg="#2E2E2E", fg="white").pack(anchor="w")
+    tk.Entry(frame_remap, textvariable=ipl_path, width=50, state="readonly", bg="#1E1E1E", fg="white").pack(side="left", padx=5, pady=5)
+    ttk.Button(frame_remap, text="Browse", command=browse_ipl_folder).pack(side="right", padx=5)
+
+    # Scrollable File List
+    frame_files = tk.Frame(root, bg="#2E2E2E", bd=2, relief="sunken")
+    frame_files.pack(fill="both", expand=True, padx=10, pady=5)
+
+    file_canvas = tk.Canvas(frame_files, bg="#1E1E1E", highlightthickness=0)
+    file_scrollbar = ttk.Scrollbar(frame_files, orient="vertical", command=file_canvas.yview)
+    file_frame_container = tk.Frame(file_canvas, bg="#1E1E1E")
+
+    file_canvas.create_window((0, 0), window=file_frame_container, anchor="nw")
+    file_canvas.configure(yscrollcommand=file_scrollbar.set)
+
+    file_scrollbar.pack(side="right", fill="y")
+    file_canvas.pack(side="left", fill="both", expand=True)
+
+    file_list_frame = tk.Frame(file_frame_container, bg="#1E1E1E")
+    file_list_frame.pack(fill="both", expand=True)
+
+    # Start Button
+    style.configure("Bold.TButton", font=("Arial", 10, "bold"))
+    start_button = ttk.Button(root, text="Renumber IDs", command=start_renumbering, style="Bold.TButton")
+    start_button.pack(pady=10)
+
+    root.mainloop()
+
+if __name__ == "__main__":
+    profile_from_environment()
+    create_gui()
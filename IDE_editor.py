@@ -1,8 +1,82 @@
-import subprocess
 import os
+import hashlib
+import shutil
+import tempfile
+import queue
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import tkinter as tk
-from tkinter import filedialog, messagebox, ttk, scrolledtext
+from tkinter import filedialog, messagebox, ttk, scrolledtext, simpledialog
 import re
+from parse_cache import ParseCache, decode_text, parse_rows
+from search_index import SearchIndex
+from batch_replace import ReplaceRule, changed_line_range
+from conflict_tracker import ConflictTracker
+from id_allocator import IDAllocator, DEFAULT_ID_CEILING
+import batch_tools
+from batch_tools import Cancelled, RENUMBERED_SECTIONS, extract_ids_from_ide, write_unused_ids_report, write_duplicate_ids_report
+from gta_parser import ID_SECTIONS
+from write_journal import WriteJournal
+from profiling import profiler, profiled, profile_from_environment
+
+HIGHLIGHT_TAGS = ("section", "id", "modelname", "coordinate", "comment", "keyword", "conflict")
+SECTION_HEADERS = {"objs", "tobj", "anim", "inst", "path", "2dfx", "txdp", "end"}
+COORDINATE_PATTERN = re.compile(r'-?\d*\.?\d+')
+HIGHLIGHT_CHUNK_LINES = 2000  # lines highlighted per idle step in the background pass
+LOAD_TICK_SECONDS = 0.03  # time spent inserting loaded files per main loop tick
+PARALLEL_PARSE_MIN_FILES = 8  # below this many changed files, parsing stays on the loader thread
+WINDOW_MAX_LINES = 20000  # lines of IDE text kept in the Text widget around the cursor
+SEARCH_PAGE_SIZE = 200  # search hits highlighted at a time
+WATCH_INTERVAL_MS = 2000  # how often loaded files are checked for changes on disk
+WATCH_FILES_PER_TICK = 500  # files stat()ed per check, bigger sets are covered over several checks
+
+def file_stamp(path):
+    # (mtime, size) of a file, None when it is gone
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def text_hash(text):
+    return hashlib.sha1(text.encode("utf-8", errors="ignore")).digest()
+
+def write_text_atomic(path, text):
+    # Write to a temp file next to `path` and rename it over the original, so an
+    # interrupted save leaves either the old or the new file, never half of one.
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", errors="ignore") as file:
+            file.write(text)
+            file.flush()
+            os.fsync(file.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+class IDEDocument:
+    # One loaded IDE file. Its text lives here while the file is outside the editor window.
+    __slots__ = ("path", "name", "text", "lines")
+
+    def __init__(self, path, text):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.set_text(text)
+
+    def set_text(self, text):
+        self.text = text
+        self.lines = text.count('\n') + 3  # header, content and the blank separator lines in the editor
+
+    def chunk(self):
+        return f"// --- {self.name} --- //\n{self.text}\n\n"
 
 class IDEFileEditor:
     def __init__(self, root):
@@ -12,11 +86,48 @@ class IDEFileEditor:
 
         # Variables
         self.ide_files = []
+        self.documents = []  # IDEDocument per entry of ide_files
         self.current_directory = None
-        self.file_sections = {}
         self.original_contents = {}
-        self.search_results = []
+        self.original_hashes = {}  # hash of original_contents, computed the first time a file is edited
+        self.search_results = []  # (document index, line in the document, column, length)
         self.current_search_index = -1
+        self.search_page = None
+        self.search_index = SearchIndex()
+        self.unindexed_documents = set()  # loaded or edited since the last search
+        self.conflicts = ConflictTracker()  # duplicate IDs and model names, updated on every edit
+        self.conflict_items = []  # ("id" or "model", key) of each conflicts panel row
+        self.conflict_next = {}  # (kind, key) -> next location to show when the row is picked again
+        self.conflict_job = None
+        # Only documents[window_start:window_end] are in the Text widget, each starting at file_mark(index)
+        self.window_start = 0
+        self.window_end = 0
+        self.lines_before_window = 0
+        self.lines_after_window = 0
+        self.slide_job = None
+        self.parse_cache = ParseCache()  # parsed records of every IDE seen, kept across runs
+        self.id_ceiling = DEFAULT_ID_CEILING  # highest model ID, raise it for fastman92's limit adjuster
+        self.dirty_lines = None  # (first, last) lines edited since the last highlight
+        self.highlight_job = None
+        self.highlight_next_line = None  # next line of the background highlight pass
+        self.suspend_edit_tracking = False
+        self.load_queue = None
+        self.load_cancel = None
+        self.load_job = None
+        self.load_errors = []
+        self.load_parsing = 0
+        self.tool_queue = None  # progress of the tool running on a worker thread
+        self.tool_cancel = None
+        self.tool_title = None
+        self.tool_on_done = None
+        self.tool_span = None
+        self.load_span = None  # profiled load, from start_loading() to finish_loading()
+        self.profiling_var = tk.BooleanVar(value=False)
+        self.replace_history = []  # (document index, text before, text after) of the last batch replace
+        self.replace_dialog = None
+        self.file_stamps = {}  # path -> (mtime, size) of each loaded file as the editor last read or wrote it
+        self.watch_next = 0  # next document to check for changes on disk
+        self.watch_busy = False  # a reload prompt is open
 
         # Styling
         self.root.configure(bg="#2E2E2E")
@@ -34,6 +145,13 @@ class IDEFileEditor:
         self.file_list.pack(fill="both", expand=True, padx=5, pady=5)
         self.file_list.bind("<<ListboxSelect>>", self.navigate_to_file)
 
+        self.conflict_label = tk.Label(self.sidebar, text="Conflicts", bg="#252525", fg="white", font=("Arial", 12, "bold"))
+        self.conflict_label.pack(pady=5)
+        self.conflict_list = tk.Listbox(self.sidebar, bg="#1E1E1E", fg="#FF7070", font=("Arial", 10), height=8, selectbackground="#555555")
+        self.conflict_list.pack(fill="x", padx=5, pady=5)
+        self.conflict_list.bind("<<ListboxSelect>>", self.show_conflict)
+        self.conflict_list.bind("<Double-Button-1>", self.show_conflict)
+
         # Search Bar
         self.search_frame = tk.Frame(self.root, bg="#2E2E2E")
         self.search_frame.pack(fill="x", padx=10, pady=5)
@@ -65,9 +183,15 @@ class IDEFileEditor:
         self.text_editor.tag_configure("coordinate", foreground="#FF69B4")   # Coordinates
         self.text_editor.tag_configure("comment", foreground="#808080")     # Comments
         self.text_editor.tag_configure("keyword", foreground="#FF00FF")     # Special keywords
+        self.text_editor.tag_config("search_highlight", background="yellow", foreground="black")
+        self.text_editor.tag_config("highlight", background="#444444")
+        self.text_editor.tag_configure("conflict", foreground="#FF5555", underline=True)  # duplicate ID or model name
         
-        # Bind syntax highlighting to text changes
-        self.text_editor.bind("<KeyRelease>", self.highlight_syntax)
+        # Re-highlight only the lines touched by each edit, and the viewport while scrolling
+        self.install_edit_hook()
+        self.text_editor.configure(yscrollcommand=self.on_editor_scroll)
+        # The scrollbar spans every loaded file, not only the ones in the editor window
+        self.text_editor.vbar.configure(command=self.on_scrollbar)
 
         # Menu
         menu_bar = tk.Menu(self.root)
@@ -78,6 +202,9 @@ class IDEFileEditor:
         file_menu.add_command(label="Save Changes", command=self.save_edits)
         file_menu.add_command(label="Save Selected File", command=self.save_selected_file)
         file_menu.add_separator()
+        file_menu.add_command(label="Find and Replace in All Files...", command=self.open_replace_dialog)
+        file_menu.add_command(label="Undo Last Replace", command=self.undo_last_replace)
+        file_menu.add_separator()
         file_menu.add_command(label="Exit", command=self.root.quit)
         menu_bar.add_cascade(label="File", menu=file_menu)
         
@@ -85,129 +212,389 @@ class IDEFileEditor:
         tools_menu = tk.Menu(menu_bar, tearoff=0)
         tools_menu.add_command(label="Generate Unused IDs & Description of IDEs", command=self.generate_unused_ids)
         tools_menu.add_command(label="Generate Duplicated IDs of IDEs", command=self.generate_duplicate_ids)
+        tools_menu.add_command(label="Find Free ID Range", command=self.find_free_id_range)
+        tools_menu.add_command(label="Set ID Limit", command=self.set_id_ceiling)
         tools_menu.add_command(label="IDE Renumbering", command=self.launch_IDE_Renumber_tool)
         tools_menu.add_command(label="IPL Lod Separator", command=self.launch_IPL_LOD_Separator_Tool)
         tools_menu.add_command(label="IPL ID Sorting", command=self.launch_IPL_ID_Sorting_Tool)
+        tools_menu.add_command(label="Validate IPL Placements", command=self.launch_IPL_Validation_Tool)
+        tools_menu.add_separator()
+        tools_menu.add_checkbutton(label="Profile Operations", variable=self.profiling_var, command=self.toggle_profiling)
+        tools_menu.add_command(label="Save Profile Trace...", command=self.save_profile_trace)
         
         menu_bar.add_cascade(label="Tools", menu=tools_menu)
         # Status Bar
         self.status_bar = ttk.Label(self.root, text="No file loaded", anchor="w")
         self.status_bar.pack(fill="x", side="bottom")
 
+        # Progress of loading or of a running tool, only shown while one is busy
+        self.load_frame = tk.Frame(self.root, bg="#2E2E2E")
+        self.load_progress = ttk.Progressbar(self.load_frame, mode="determinate")
+        self.load_progress.pack(side="left", fill="x", expand=True, padx=5)
+        ttk.Button(self.load_frame, text="Cancel", command=self.cancel_task).pack(side="right", padx=5)
+        self.root.bind("<Escape>", lambda event: self.cancel_task())
+        self.root.after(WATCH_INTERVAL_MS, self.watch_files)
+
     def search_text(self):
-        self.text_editor.tag_remove("search_highlight", "1.0", tk.END)
+        self.clear_search()
         search_query = self.search_entry.get().strip()
         if not search_query:
             return
 
-        self.search_results = []
-        self.current_search_index = -1
-        start_pos = "1.0"
-        
-        while True:
-            start_pos = self.text_editor.search(search_query, start_pos, stopindex=tk.END, nocase=True)
-            if not start_pos:
-                break
-            end_pos = f"{start_pos}+{len(search_query)}c"
-            self.text_editor.tag_add("search_highlight", start_pos, end_pos)
-            self.search_results.append(start_pos)
-            start_pos = end_pos  # Move forward
+        # Look the query up in the index of IDs, model names and TXD names of every loaded file
+        span = profiler.begin("search")
+        self.update_search_index()
+        try:
+            with profiler.phase("search.query"):
+                self.search_results = self.search_index.search(search_query)
+        except re.error as e:
+            profiler.end(span)
+            self.status_bar.config(text=f"Invalid regular expression: {e}")
+            return
+        profiler.count("search.results", len(self.search_results))
 
-        self.text_editor.tag_config("search_highlight", background="yellow", foreground="black")
-        self.next_search_result()  # Move to first match
+        if not self.search_results:
+            self.status_bar.config(text=f"No results for {search_query}")
+        else:
+            self.next_search_result()  # Move to first match
+        self.show_profile(span)
+
+    @profiled("search.index")
+    def update_search_index(self):
+        for index in sorted(self.unindexed_documents):
+            self.sync_document(index)
+            self.search_index.index_document(index, self.documents[index].text)
+        self.unindexed_documents.clear()
+
+    def apply_search_tags(self):
+        # Tag the hits of the current page that fall inside the editor window
+        self.text_editor.tag_remove("search_highlight", "1.0", tk.END)
+        self.search_page = max(self.current_search_index, 0) // SEARCH_PAGE_SIZE
+        page_start = self.search_page * SEARCH_PAGE_SIZE
+
+        indices = []
+        header_lines = {}
+        for document, line, column, length in self.search_results[page_start:page_start + SEARCH_PAGE_SIZE]:
+            if not self.window_start <= document < self.window_end:
+                continue
+            if document not in header_lines:
+                header_lines[document] = self.text_line(self.file_mark(document))
+            line += header_lines[document] + 1
+            indices.append(f"{line}.{column}")
+            indices.append(f"{line}.{column + length}")
+        if indices:
+            self.text_editor.tag_add("search_highlight", *indices)
 
     def next_search_result(self):
         if self.search_results:
             self.current_search_index = (self.current_search_index + 1) % len(self.search_results)
-            self.text_editor.see(self.search_results[self.current_search_index])
+            self.show_search_result(self.current_search_index)
 
     def previous_search_result(self):
         if self.search_results:
             self.current_search_index = (self.current_search_index - 1) % len(self.search_results)
-            self.text_editor.see(self.search_results[self.current_search_index])
+            self.show_search_result(self.current_search_index)
+
+    def show_search_result(self, result_index):
+        document, line, column, length = self.search_results[result_index]
+        if not self.window_start <= document < self.window_end:
+            self.set_window(document)  # tags the current page
+        elif result_index // SEARCH_PAGE_SIZE != self.search_page:
+            self.apply_search_tags()
+
+        line += self.text_line(self.file_mark(document)) + 1
+        self.text_editor.see(f"{line}.{column}")
+        self.status_bar.config(text=f"Result {result_index + 1} of {len(self.search_results)} in {self.documents[document].name}")
 
     def clear_search(self):
         self.text_editor.tag_remove("search_highlight", "1.0", tk.END)
         self.search_results = []
         self.current_search_index = -1
+        self.search_page = None
     
-    def launch_IPL_ID_Sorting_Tool(self):
-        tool_path = os.path.join(os.path.dirname(__file__), "IPL ID Sorting Script.py")
-        if os.path.exists(tool_path):
-           subprocess.Popen(["python", tool_path], shell=True)
-        else:
-           messagebox.showerror("Error", "Tool script not found!")
+    # --- Tools, run in-process on a worker thread ---
+
+    def run_tool(self, title, work, on_done):
+        # work(progress) runs on a worker thread and returns the result passed to on_done
+        # on the main loop. progress(done, total, path) raises Cancelled after Cancel/Esc,
+        # which rolls back the tool's write journal.
+        if self.load_queue is not None or self.tool_queue is not None:
+            messagebox.showwarning("Busy", "Please wait for the current task to finish.")
+            return
 
+        self.tool_queue = out = queue.Queue()
+        self.tool_cancel = cancel = threading.Event()
+        self.tool_title = title
+        self.tool_on_done = on_done
+        self.tool_span = profiler.begin("tool")
+        self.load_progress.configure(value=0, maximum=1)
+        self.load_frame.pack(fill="x", side="bottom", before=self.status_bar)
+        self.status_bar.config(text=f"{title}... (Esc to cancel)")
+
+        def progress(done, total, path):
+            if cancel.is_set():
+                raise Cancelled()
+            out.put(("progress", done, total, path))
+
+        def worker():
+            try:
+                out.put(("done", work(progress)))
+            except Cancelled:
+                out.put(("cancelled",))
+            except Exception as e:
+                out.put(("error", e))
+
+        threading.Thread(target=worker, daemon=True).start()
+        self.root.after(50, self.poll_tool)
+
+    def poll_tool(self):
+        message = None
+        while True:
+            try:
+                message = self.tool_queue.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] != "progress":
+                break
+            _, done, total, path = message
+            self.load_progress.configure(value=done, maximum=max(total, 1))
+            self.status_bar.config(text=f"{self.tool_title}... {done}/{total} {os.path.basename(path)} (Esc to cancel)")
 
+        if message is None or message[0] == "progress":
+            self.root.after(50, self.poll_tool)
+            return
 
-    def launch_IDE_Renumber_tool(self):
-        tool_path = os.path.join(os.path.dirname(__file__), "IDE renumber.py")
-        if os.path.exists(tool_path):
-           subprocess.Popen(["python", tool_path], shell=True)
+        title, on_done, span = self.tool_title, self.tool_on_done, self.tool_span
+        self.tool_queue = self.tool_cancel = self.tool_on_done = self.tool_span = None
+        self.load_frame.pack_forget()
+        if message[0] == "cancelled":
+            self.status_bar.config(text=f"{title} cancelled, no files were changed")
+            self.show_profile(span)
+        elif message[0] == "error":
+            self.status_bar.config(text=f"{title} failed")
+            self.show_profile(span)
+            messagebox.showerror("Error", f"{title} failed, no files were changed: {message[1]}")
         else:
-           messagebox.showerror("Error", "Tool script not found!")
-
-    def launch_IPL_LOD_Separator_Tool(self):
-        tool_path = os.path.join(os.path.dirname(__file__), "ipl lod separator.py")
-        if os.path.exists(tool_path):
-           subprocess.Popen(["python", tool_path], shell=True)
+            # on_done reloads the changed files and reports, its dialogs are not timed
+            profiler.end(span)
+            summary = profiler.last_summary
+            on_done(message[1])
+            if span is not None:
+                self.status_bar.config(text=f"{self.status_bar.cget('text')}  [{summary}]")
+
+    def cancel_task(self):
+        if self.tool_cancel is not None:
+            self.tool_cancel.set()
         else:
-           messagebox.showerror("Error", "Tool script not found!")
+            self.cancel_loading()
+
+    def save_before_tool(self):
+        # Tools that rewrite IDE files work on what is saved, offer to save pending edits first
+        self.sync_window()
+        dirty = [index for index in range(len(self.documents)) if self.is_document_dirty(index)]
+        if not dirty:
+            return True
+        if not messagebox.askyesno("Unsaved Changes", f"{len(dirty)} IDE files have unsaved changes. Save them before running the tool?"):
+            return False
+        for index in dirty:
+            self.write_document(index)
+        return True
+
+    def reload_documents(self, paths, keep_edits=True):
+        # Re-read files rewritten on disk by a tool or another program. Only those files
+        # change in the editor (see set_document_text), the rest of the window and its
+        # highlighting stay. Files with unsaved edits keep them unless keep_edits is False,
+        # the disk version becomes their baseline either way. Returns the names of the kept ones.
+        paths = {os.path.normcase(os.path.abspath(path)) for path in paths}
+        changed = [index for index, document in enumerate(self.documents) if os.path.normcase(os.path.abspath(document.path)) in paths]
+        if not changed:
+            return []
+
+        self.sync_window()
+        edited = []
+        for index in changed:
+            document = self.documents[index]
+            stamp = file_stamp(document.path)
+            with open(document.path, "rb") as f:
+                text = decode_text(f.read())
+            self.file_stamps[document.path] = stamp
+            if keep_edits and self.is_document_dirty(index):
+                edited.append(document.name)
+            else:
+                self.set_document_text(index, text)
+                text = document.text
+            self.original_contents[document.path] = text
+            self.original_hashes.pop(document.path, None)
+        self.refresh_after_text_changes()
+        return edited
+
+    def selected_or_all_documents(self, action):
+        selection = self.file_list.curselection()
+        if selection:
+            return [self.documents[selection[0]].path]
+        if messagebox.askyesno(action, f"No file is selected in the list. {action} all {len(self.documents)} loaded IDE files?"):
+            return list(self.ide_files)
+        return []
+
+    def pick_renumber_start(self, ide_files, at_least):
+        # First free block for the renumbered entries, from the cached records of every loaded file
+        renumbered = set(ide_files)
+        used_ids = set()
+        count = 0
+        for ide_file in self.ide_files:
+            for record in self.parse_cache.get_records(ide_file):
+                if record.id is None or record.section not in ID_SECTIONS:
+                    continue
+                if ide_file in renumbered and record.section in RENUMBERED_SECTIONS:
+                    count += 1
+                else:
+                    used_ids.add(record.id)
+        return IDAllocator(used_ids, self.id_ceiling).find_free(count, at_least)
 
-    def generate_unused_ids(self):
-        if not self.current_directory:
-            messagebox.showwarning("No Directory Selected", "Please open an IDE directory first.")
+    def launch_IDE_Renumber_tool(self):
+        if not self.ide_files:
+            messagebox.showwarning("No Files Loaded", "Please open IDE files first.")
+            return
+        ide_files = self.selected_or_all_documents("Renumber")
+        if not ide_files or not self.save_before_tool():
             return
 
-        output_path = os.path.join(self.current_directory, "unused_ids_and_description_of_IDEs.txt")
-        used_ids = set()
-        ide_details = []
+        start = simpledialog.askstring("IDE Renumbering", "Start ID (leave empty to use the first free block of IDs):", parent=self.root)
+        if start is None:
+            return
+        start = start.strip()
+        if start and not start.isdigit():
+            messagebox.showerror("Error", "Invalid start ID. Please enter a number.")
+            return
+        ipl_directory = filedialog.askdirectory(title="IPL folder to update with the new IDs (Cancel to skip)")
+        sources = {document.path: document.text for document in self.documents if document.path in set(ide_files)}
+
+        def work(progress):
+            start_id = int(start) if start else self.pick_renumber_start(ide_files, 0)
+            if start_id is None:
+                raise ValueError(f"not enough contiguous free IDs up to {self.id_ceiling}")
+            ipl_files = batch_tools.find_ipl_files(ipl_directory) if ipl_directory else []
+            with WriteJournal(batch_tools.journal_root(ide_files + ipl_files)) as journal:
+                renumbered, errors, remap = batch_tools.renumber_ide_files(ide_files, start_id, progress=progress, journal=journal, sources=sources)
+                rewritten, ipl_errors = batch_tools.apply_remap_to_ipl_files(ipl_files, remap, progress, journal)
+            remap_path = os.path.join(os.path.dirname(ide_files[0]), "id_remap.txt")
+            remap.save(remap_path)
+            return start_id, renumbered, rewritten, errors + ipl_errors, remap, remap_path
+
+        def done(result):
+            start_id, renumbered, rewritten, errors, remap, remap_path = result
+            edited = self.reload_documents(renumbered)
+            summary = f"Renumbered {sum(renumbered.values())} entries in {len(renumbered)} IDE files from ID {start_id}, {remap.changed} IDs changed"
+            if rewritten:
+                summary += f", {sum(rewritten.values())} inst lines updated in {sum(1 for count in rewritten.values() if count)} IPL files"
+            self.status_bar.config(text=summary)
+            if errors or edited:
+                messagebox.showwarning("IDE Renumbering", "\n".join(errors + [f"{name} was edited while renumbering, your edits were kept" for name in edited]))
+            else:
+                messagebox.showinfo("IDE Renumbering", f"{summary}.\n\nID remap table saved to {remap_path}")
 
-        # Extracting used IDs from IDE files
-        for ide_file in self.ide_files:
-            ids, total_entries = self.extract_ids_from_ide(ide_file)
-            used_ids.update(ids)
-            ide_details.append(self.describe_ide_file(ide_file, ids, total_entries))
+        self.run_tool("Renumbering IDs", work, done)
 
-        unused_ids_formatted = self.find_unused_ids(used_ids)
+    def launch_IPL_ID_Sorting_Tool(self):
+        if not self.ide_files:
+            messagebox.showwarning("No Files Loaded", "Please open IDE files first.")
+            return
+        ipl_directory = filedialog.askdirectory(title="Select the IPL folder to sort")
+        if not ipl_directory:
+            return
+        ipl_files = batch_tools.get_files_with_extension(ipl_directory, "ipl")
+        if not ipl_files:
+            messagebox.showerror("Error", "No IPL files found in the selected folder.")
+            return
 
-        with open(output_path, "w", encoding="utf-8") as output_file:
-            output_file.write("\n".join(ide_details))
-            output_file.write("\nUnused IDs from 0 to 90000:\n")
-            output_file.write(unused_ids_formatted + "\n")
+        # The model -> ID lookup comes from the editor's documents, edits included
+        self.sync_window()
+        ide_files = list(self.ide_files)
+        sources = {document.path: document.text for document in self.documents}
 
-        messagebox.showinfo("Success", f"Unused IDs saved to {output_path}")
+        def work(progress):
+            sorter = batch_tools.IPLIDSorter()
+            sorter.process_ide_files(ide_files, sources)
+            rewritten = sorter.process_ipl_files(ipl_files, progress)
+            return sorter, rewritten, sorter.write_report(rewritten, ipl_directory)
 
-    def extract_ids_from_ide(self, file_path):
-        ids = set()
-        total_entries = 0
-        try:
-            with open(file_path, "r", encoding="utf-8", errors="ignore") as file:
-                for line in file:
-                    parts = line.strip().split(',')
-                    if parts and parts[0].isdigit():
-                        id_value = int(parts[0])
-                        ids.add(id_value)
-                        total_entries += 1
-        except Exception as e:
-            print(f"Error reading {file_path}: {e}")
-        return ids, total_entries
-
-    def describe_ide_file(self, file_path, ids, total_entries):
-        file_name = os.path.basename(file_path)
-        min_id, max_id = (min(ids), max(ids)) if ids else ("N/A", "N/A")
-
-        if "vehicle" in file_name.lower():
-            description = "Defines all vehicles in the game."
-        elif "map" in file_name.lower() or "objects" in file_name.lower():
-            description = "Defines world objects and buildings."
-        elif "ped" in file_name.lower():
-            description = "Defines pedestrian models and behavior."
-        else:
-            description = "General game objects and assets."
+        def done(result):
+            sorter, rewritten, report_path = result
+            summary = f"{sum(rewritten.values())} lines rewritten in {sum(1 for count in rewritten.values() if count)} of {len(rewritten)} IPL files."
+            if sorter.ambiguous_models:
+                summary += f"\n{len(sorter.ambiguous_models)} models are defined with different IDs in more than one IDE entry and were left untouched."
+            self.status_bar.config(text=f"IPL ID sorting finished, {summary.splitlines()[0]}")
+            messagebox.showinfo("IPL ID Sorting", f"{summary}\n\nFull report saved to {report_path}")
+
+        self.run_tool("Sorting IPL IDs", work, done)
+
+    def launch_IPL_Validation_Tool(self):
+        if not self.ide_files:
+            messagebox.showwarning("No Files Loaded", "Please open IDE files first.")
+            return
+        ipl_directory = filedialog.askdirectory(title="Select the IPL folder to validate")
+        if not ipl_directory:
+            return
+        ipl_files = batch_tools.find_ipl_files(ipl_directory)
+        if not ipl_files:
+            messagebox.showerror("Error", "No IPL files found in the selected folder.")
+            return
+
+        # Checked against the editor's documents, unsaved edits included
+        self.sync_window()
+        ide_files = list(self.ide_files)
+        sources = {document.path: document.text for index, document in enumerate(self.documents) if self.is_document_dirty(index)}
+        report_path = os.path.join(ipl_directory, "placement_report.txt")
+        json_path = os.path.join(ipl_directory, "placement_report.json")
+
+        def work(progress):
+            check, errors = batch_tools.validate_placements(ide_files, ipl_files, self.parse_cache, progress, sources)
+            return check, errors, batch_tools.write_validation_report(check, report_path, json_path)
+
+        def done(result):
+            check, errors, unused = result
+            self.parse_cache.save()
+            summary = (f"{check.placements} placements checked: {len(check.missing)} missing models, "
+                       f"{len(check.mismatches)} ID/name mismatches, {len(unused)} unused IDE definitions")
+            self.status_bar.config(text=summary)
+            for error in errors:
+                print(f"Error reading {error}")
+            messagebox.showinfo("IPL Placement Validation", f"{summary}.\n\nReport saved to {report_path}\n(and as JSON to {json_path})"
+                                + (f"\n\n{len(errors)} files could not be read, see the console." if errors else ""))
+
+        self.run_tool("Validating IPL placements", work, done)
 
-        return f"File: {file_name}\nDescription: {description}\nID Range: {min_id} - {max_id}\nTotal Entries: {total_entries}\n{'-'*40}\n"
+    def launch_IPL_LOD_Separator_Tool(self):
+        file_paths = filedialog.askopenfilenames(title="Select IPL Files", filetypes=[("IPL Files", "*.ipl")])
+        if not file_paths:
+            return
+        binary = messagebox.askyesnocancel("IPL LOD Separator", "Write the remaining (non-LOD) entries as binary IPLs?")
+        if binary is None:
+            return
+
+        def work(progress):
+            return batch_tools.separate_lod_files(list(file_paths), progress=progress, binary=binary)
+
+        def done(result):
+            separated, errors = result
+            self.status_bar.config(text=f"Moved {sum(separated.values())} LOD entries out of {sum(1 for count in separated.values() if count)} of {len(file_paths)} IPL files")
+            if errors:
+                messagebox.showerror("Error", "An error occurred while processing:\n" + "\n".join(errors))
+
+        self.run_tool("Separating LODs", work, done)
+
+    def generate_unused_ids(self):
+        if not self.current_directory:
+            messagebox.showwarning("No Directory Selected", "Please open an IDE directory first.")
+            return
+
+        output_path = os.path.join(self.current_directory, "unused_ids_and_description_of_IDEs.txt")
+        _, errors = write_unused_ids_report(self.ide_files, output_path, self.id_ceiling, self.parse_cache)
+        self.parse_cache.save()
+        for error in errors:
+            print(f"Error reading {error}")
 
+        messagebox.showinfo("Success", f"Unused IDs saved to {output_path}")
 
     def generate_duplicate_ids(self):
         if not self.current_directory:
@@ -215,283 +602,997 @@ class IDEFileEditor:
             return
 
         output_path = os.path.join(self.current_directory, "duplicated_objects.txt")
-        id_dict = {}  # Format: {id_number: [(ide_file, model_name), ...]}
-        model_dict = {}  # Format: {model_name_lower: [(ide_file, original_model_name), ...]}
-        id_duplicates = []
-        model_duplicates = []
+        self.sync_window()
+        sources = {document.path: document.text for index, document in enumerate(self.documents) if self.is_document_dirty(index)}
+        _, _, errors = write_duplicate_ids_report(self.ide_files, output_path, self.parse_cache, sources=sources)
+        self.parse_cache.save()
+        for error in errors:
+            print(f"Error processing {error}")
 
-        # Keywords to ignore
-        ignore_keywords = {"objs", "end", "tobj", "path", "2dfx", "anim", "txdp"}
+        messagebox.showinfo("Success", f"Duplicate IDs and model names saved to {output_path}")
 
-        # First pass: collect all IDs and model names
+    def collect_used_ids(self):
+        used_ids = set()
         for ide_file in self.ide_files:
-            if ide_file.endswith(".ide") and os.path.exists(ide_file):
-                try:
-                    with open(ide_file, 'r', encoding="utf-8") as file:
-                        current_section = None
-                        for line in file:
-                            line = line.strip()
-                            
-                            if not line or line.startswith("#"):
-                                continue
-                            
-                            # Update section tracking    
-                            lower_line = line.lower()
-                            if lower_line in {"objs", "tobj", "weap", "peds", "cars", "hier", "end", "path", "2dfx", "anim", "txdp"}:
-                                current_section = lower_line
-                                continue
-                            
-                            # Skip processing for non-data sections
-                            if not current_section or current_section in {"end", "path", "2dfx", "anim", "txdp"}:
-                                continue
-
-                            parts = [part.strip() for part in line.split(',')]
-                            
-                            # Get ID and model name regardless of section type
-                            # Just check if we have at least 2 parts and first is a number
-                            if len(parts) >= 2 and parts[0].strip().isdigit():
-                                id_number = parts[0].strip()
-                                model_name = parts[1].strip()
-                                
-                                # Store the section type with the data for better reporting
-                                if id_number not in id_dict:
-                                    id_dict[id_number] = []
-                                id_dict[id_number].append((ide_file, model_name, current_section))
-
-                                # Store model name occurrences (case-insensitive)
-                                if model_name:
-                                    model_name_lower = model_name.lower()
-                                    if model_name_lower not in model_dict:
-                                        model_dict[model_name_lower] = []
-                                    model_dict[model_name_lower].append((ide_file, model_name, current_section))
-
-                except Exception as e:
-                    print(f"Error processing {ide_file}: {e}")
-
-        # Second pass: identify duplicates
-        for id_number, occurrences in id_dict.items():
-            if len(occurrences) > 1:
-                files_info = [f"{os.path.basename(file)} ({section})" for file, _, section in occurrences]
-                duplicate_entry = f"ID {id_number} is used by: {' and '.join(files_info)}"
-                id_duplicates.append(duplicate_entry)
-
-        for model_name_lower, occurrences in model_dict.items():
-            if len(occurrences) > 1:
-                # Filter out duplicates from the same file
-                unique_files = {(os.path.basename(file), section) for file, _, section in occurrences}
-                if len(unique_files) > 1:
-                    files_info = [f"{file} ({section})" for file, section in unique_files]
-                    model_name = occurrences[0][1]  # Use the first occurrence's original model name
-                    duplicate_entry = f"Model {model_name} is used by: {' and '.join(sorted(files_info))}"
-                    model_duplicates.append(duplicate_entry)
-
-        # Write results to file
-        with open(output_path, "w", encoding="utf-8") as output_file:
-            output_file.write("=== Duplicate IDs ===\n")
-            if id_duplicates:
-                output_file.write("\n".join(sorted(id_duplicates)) + "\n")
-            else:
-                output_file.write("No duplicate IDs found.\n")
-
-            output_file.write("\n=== Duplicate Model Names ===\n")
-            if model_duplicates:
-                output_file.write("\n".join(sorted(model_duplicates)) + "\n")
-            else:
-                output_file.write("No duplicate model names found.\n")
+            try:
+                ids, _ = extract_ids_from_ide(ide_file, self.parse_cache)
+            except (OSError, UnicodeError) as e:
+                print(f"Error reading {ide_file}: {e}")
+                continue
+            used_ids.update(ids)
+        self.parse_cache.save()
+        return used_ids
 
-        messagebox.showinfo("Success", f"Duplicate IDs and model names saved to {output_path}")
+    def find_free_id_range(self):
+        if not self.ide_files:
+            messagebox.showwarning("No Files Loaded", "Please open IDE files first.")
+            return
 
-    def find_unused_ids(self, used_ids, id_range=90000):
-        all_ids = set(range(id_range + 1))
-        unused_ids = sorted(all_ids - used_ids)
+        count = simpledialog.askinteger("Find Free ID Range", "Number of contiguous IDs needed:", parent=self.root, minvalue=1, maxvalue=self.id_ceiling + 1)
+        if count is None:
+            return
+        at_least = simpledialog.askinteger("Find Free ID Range", "Lowest acceptable ID:", parent=self.root, initialvalue=0, minvalue=0, maxvalue=self.id_ceiling)
+        if at_least is None:
+            return
 
-        compressed_ranges = []
-        start = None
+        allocator = IDAllocator(self.collect_used_ids(), self.id_ceiling)
+        start = allocator.find_free(count, at_least)
+        if start is None:
+            messagebox.showinfo("Find Free ID Range", f"No {count} contiguous free IDs between {at_least} and {self.id_ceiling}.")
+        else:
+            messagebox.showinfo("Find Free ID Range", f"IDs {start} - {start + count - 1} are free.")
 
-        for i in range(len(unused_ids)):
-            if start is None:
-                start = unused_ids[i]
-            if i == len(unused_ids) - 1 or unused_ids[i] + 1 != unused_ids[i + 1]:
-                if start == unused_ids[i]:
-                    compressed_ranges.append(str(start))
-                else:
-                    compressed_ranges.append(f"{start}-{unused_ids[i]}")
-                start = None
+    def set_id_ceiling(self):
+        ceiling = simpledialog.askinteger("Set ID Limit", "Highest model ID (raise it when using fastman92's limit adjuster):", parent=self.root, initialvalue=self.id_ceiling, minvalue=1)
+        if ceiling is not None:
+            self.id_ceiling = ceiling
+            self.status_bar.config(text=f"ID limit set to {ceiling}")
 
-        return ", ".join(compressed_ranges)
     def open_and_edit_files(self):
         self.current_directory = filedialog.askdirectory(title="Select GTA SA Directory")
         if not self.current_directory:
             return
-        
-        self.ide_files = []
-        self.file_sections.clear()
-        self.original_contents.clear()
-        self.file_list.delete(0, tk.END)
-        self.text_editor.delete("1.0", tk.END)
-
-        for dirpath, _, filenames in os.walk(self.current_directory):
-            for file in filenames:
-                if file.lower().endswith(".ide"):
-                    file_path = os.path.join(dirpath, file)
-                    self.ide_files.append(file_path)
-                    self.load_file_into_editor(file_path)
 
-        self.status_bar.config(text=f"Loaded {len(self.ide_files)} IDE files")
-        self.highlight_syntax()
+        self.start_loading(directory=self.current_directory)
 
     def open_multiple_files(self):
         file_paths = filedialog.askopenfilenames(title="Select IDE Files", filetypes=[("IDE Files", "*.ide")])
         if not file_paths:
             return
 
+        self.start_loading(file_paths=list(file_paths))
+
+    def start_loading(self, directory=None, file_paths=None):
+        if self.tool_queue is not None:
+            messagebox.showwarning("Busy", "Please wait for the current task to finish.")
+            return
+        # Stage 1 runs on a background thread: directory walk, reads on a thread pool and
+        # parsing of changed files on a process pool. Stage 2 inserts the files into the
+        # editor on the main loop in small chunks, see poll_loading().
+        self.cancel_loading()
+        self.reset_documents()
+        self.load_span = profiler.begin("load")
+
+        self.load_queue = queue.Queue()
+        self.load_cancel = threading.Event()
+        self.load_errors = []
+        self.load_parsing = 0
+        self.load_total = len(file_paths) if file_paths else 0
+        self.load_progress.configure(value=0, maximum=max(self.load_total, 1))
+        self.load_frame.pack(fill="x", side="bottom", before=self.status_bar)
+        self.status_bar.config(text="Scanning folder..." if directory else "Loading IDE files...")
+
+        threading.Thread(target=self.load_files_worker, args=(directory, file_paths, self.load_queue, self.load_cancel), daemon=True).start()
+        self.load_job = self.root.after(10, self.poll_loading)
+
+    def load_files_worker(self, directory, file_paths, out, cancel):
+        cache = self.parse_cache
+        cache.hits = cache.misses = 0
+        if directory:
+            file_paths = cache.walk(directory)
+            out.put(("total", len(file_paths)))
+
+        def read(file_path):
+            if cancel.is_set():
+                return None
+            try:
+                stat = os.stat(file_path)
+                with profiler.phase("load.read"), open(file_path, "rb") as f:
+                    data = f.read()
+                profiler.count("load.bytes", len(data))
+                rows, stamp, data = cache.lookup(file_path, data, stat)
+                return decode_text(data), (None if rows is not None else (stamp, data)), (stat.st_mtime_ns, stat.st_size)
+            except Exception as e:
+                return e
+
+        changed = []
+        with ThreadPoolExecutor() as pool:
+            for file_path, result in zip(file_paths, pool.map(read, file_paths)):
+                if cancel.is_set():
+                    pool.shutdown(cancel_futures=True)
+                    return
+                if isinstance(result, Exception):
+                    out.put(("error", file_path, str(result)))
+                    continue
+                text, parse_job, file_stamp = result
+                out.put(("file", file_path, text, file_stamp))
+                if parse_job:
+                    changed.append((file_path,) + parse_job)
+
+        # Files that changed since the last run are parsed on all cores
+        out.put(("parsing", len(changed)))
+        profiler.count("load.parsed", len(changed))
+        parse_span = profiler.begin("load.parse")
+        if len(changed) >= PARALLEL_PARSE_MIN_FILES:
+            try:
+                with ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn")) as pool:
+                    parsed = pool.map(parse_rows, [data for _, _, data in changed], chunksize=4)
+                    for (file_path, stamp, _), rows in zip(changed, parsed):
+                        cache.store(file_path, stamp, rows)
+                changed = []
+            except (BrokenProcessPool, OSError) as e:
+                print(f"Parallel parsing unavailable, parsing on one core: {e}")
+        for file_path, stamp, data in changed:
+            cache.store(file_path, stamp, parse_rows(data))
+        profiler.end(parse_span)
+
+        if directory:
+            cache.forget_missing(directory, file_paths)
+        with profiler.phase("load.save_cache"):
+            cache.save()
+        out.put(("done", cache.misses, cache.hits))
+
+    def poll_loading(self):
+        self.load_job = None
+        if self.load_queue is None:
+            return
+
+        deadline = time.perf_counter() + LOAD_TICK_SECONDS
+        first_chunk = not self.ide_files
+        while time.perf_counter() < deadline:
+            try:
+                message = self.load_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if message[0] == "total":
+                self.load_total = message[1]
+                self.load_progress.configure(maximum=max(self.load_total, 1))
+            elif message[0] == "file":
+                self.add_document(message[1], message[2], message[3])
+            elif message[0] == "parsing":
+                self.load_parsing = message[1]
+            elif message[0] == "error":
+                print(f"Error reading {message[1]}: {message[2]}")
+                self.load_errors.append(message[1])
+            elif message[0] == "done":
+                self.finish_loading(f"Loaded {len(self.ide_files)} IDE files ({message[1]} parsed, {message[2]} from cache)")
+                return
+
+        done = len(self.ide_files) + len(self.load_errors)
+        self.load_progress.configure(value=done)
+        if self.load_parsing:
+            self.status_bar.config(text=f"Loaded {done} IDE files, parsing {self.load_parsing} changed files... (Esc to cancel)")
+        else:
+            self.status_bar.config(text=f"Loading IDE files... {done}/{self.load_total or '?'} (Esc to cancel)")
+        if first_chunk and self.ide_files:
+            self.highlight_visible_lines()
+        self.load_job = self.root.after(10, self.poll_loading)
+
+    def cancel_loading(self):
+        if self.load_queue is None:
+            return
+        self.load_cancel.set()
+        if self.load_job is not None:
+            self.root.after_cancel(self.load_job)
+        self.finish_loading(f"Loading cancelled, {len(self.ide_files)} IDE files loaded")
+
+    def finish_loading(self, message):
+        self.load_queue = None
+        self.load_job = None
+        self.load_frame.pack_forget()
+        if self.load_errors:
+            message += f", {len(self.load_errors)} could not be read"
+        self.status_bar.config(text=message)
+        self.highlight_syntax()
+        self.refresh_conflicts()
+        profiler.count("load.files", len(self.ide_files))
+        self.show_profile(self.load_span)
+        self.load_span = None
+
+    def reset_documents(self):
+        self.clear_window()
+        self.clear_search()
         self.ide_files = []
-        self.file_sections.clear()
+        self.documents = []
         self.original_contents.clear()
+        self.original_hashes.clear()
+        self.file_stamps.clear()
+        self.search_index.clear()
+        self.unindexed_documents.clear()
+        self.conflicts.clear()
+        self.refresh_conflicts()
         self.file_list.delete(0, tk.END)
-        self.text_editor.delete("1.0", tk.END)
+        self.lines_before_window = 0
+        self.lines_after_window = 0
+
+    @profiled("load.insert")
+    def add_document(self, file_path, file_content, stamp=None):
+        self.original_contents[file_path] = file_content  # shared with the document until it is edited
+        self.file_stamps[file_path] = stamp or file_stamp(file_path)
+        self.ide_files.append(file_path)
+        self.documents.append(IDEDocument(file_path, file_content))
+        self.unindexed_documents.add(len(self.documents) - 1)
+        self.conflicts.set_document(len(self.documents) - 1, file_content)
+        self.file_list.insert(tk.END, self.documents[-1].name)
+        self.lines_after_window += self.documents[-1].lines
+
+        # Fill the editor window while it has room, the rest stays in the documents
+        if self.window_end == len(self.documents) - 1 and self.text_line("end-1c") < WINDOW_MAX_LINES:
+            self.append_to_window()
+
+    # --- Editor window over the documents ---
+
+    def file_mark(self, index):
+        return f"ide_file_{index}"
+
+    def untracked_edit(self, command, *args):
+        # Window changes are not user edits: keep them out of highlighting and the undo stack
+        self.suspend_edit_tracking = True
+        self.text_editor.configure(undo=False)
+        try:
+            getattr(self.text_editor, command)(*args)
+        finally:
+            self.text_editor.configure(undo=True)
+            self.suspend_edit_tracking = False
+
+    def clear_window(self):
+        for index in range(self.window_start, self.window_end):
+            self.text_editor.mark_unset(self.file_mark(index))
+        self.untracked_edit("delete", "1.0", tk.END)
+        self.text_editor.edit_reset()
+        self.window_start = self.window_end = 0
+
+    def append_to_window(self):
+        index = self.window_end
+        position = self.text_editor.index("end-1c")
+        self.untracked_edit("insert", tk.END, self.documents[index].chunk())
+        self.text_editor.mark_set(self.file_mark(index), position)
+        self.text_editor.mark_gravity(self.file_mark(index), "left")
+        self.window_end += 1
+        self.lines_after_window -= self.documents[index].lines
+
+    def prepend_to_window(self):
+        index = self.window_start - 1
+        chunk = self.documents[index].chunk()
+        chunk_lines = chunk.count('\n')
+        self.untracked_edit("insert", "1.0", chunk)
+        # The old first mark stayed at 1.0, move it back to its file header
+        self.text_editor.mark_set(self.file_mark(self.window_start), f"{chunk_lines + 1}.0")
+        self.text_editor.mark_set(self.file_mark(index), "1.0")
+        self.text_editor.mark_gravity(self.file_mark(index), "left")
+        self.window_start = index
+        self.lines_before_window -= self.documents[index].lines
+
+    def drop_first_from_window(self):
+        index = self.window_start
+        self.sync_document(index)
+        self.untracked_edit("delete", self.file_mark(index), self.file_mark(index + 1))
+        self.text_editor.mark_unset(self.file_mark(index))
+        self.window_start += 1
+        self.lines_before_window += self.documents[index].lines
+
+    def drop_last_from_window(self):
+        index = self.window_end - 1
+        self.sync_document(index)
+        self.untracked_edit("delete", self.file_mark(index), tk.END)
+        self.text_editor.mark_unset(self.file_mark(index))
+        self.window_end -= 1
+        self.lines_after_window += self.documents[index].lines
+
+    @profiled("editor.window")
+    def set_window(self, index):
+        # Rebuild the editor window around documents[index]
+        self.sync_window()
+        self.clear_window()
+
+        start, end = index, index + 1
+        lines = self.documents[index].lines
+        grown = True
+        while grown:
+            grown = False
+            if end < len(self.documents) and lines + self.documents[end].lines <= WINDOW_MAX_LINES:
+                lines += self.documents[end].lines
+                end += 1
+                grown = True
+            if start > 0 and lines + self.documents[start - 1].lines <= WINDOW_MAX_LINES:
+                start -= 1
+                lines += self.documents[start].lines
+                grown = True
+
+        # One insert for the whole window, then a mark at each file header
+        chunks = [self.documents[i].chunk() for i in range(start, end)]
+        self.untracked_edit("insert", "1.0", "".join(chunks))
+        line = 1
+        for i, chunk in zip(range(start, end), chunks):
+            self.text_editor.mark_set(self.file_mark(i), f"{line}.0")
+            self.text_editor.mark_gravity(self.file_mark(i), "left")
+            line += chunk.count('\n')
+
+        self.window_start, self.window_end = start, end
+        self.lines_before_window = sum(document.lines for document in self.documents[:start])
+        self.lines_after_window = sum(document.lines for document in self.documents[end:])
+        self.highlight_syntax()
+        self.apply_search_tags()
 
-        for file_path in file_paths:
-            self.ide_files.append(file_path)
-            self.load_file_into_editor(file_path)
+    def document_text_range(self, index):
+        start = f"{self.file_mark(index)} + 1 lines"
+        end = self.file_mark(index + 1) if index + 1 < self.window_end else "end-1c"
+        return start, end
+
+    def sync_document(self, index):
+        # Copy the editor's text of a file in the window back into its document
+        if not self.window_start <= index < self.window_end:
+            return
+        text = self.text_editor.get(*self.document_text_range(index))
+        # Drop the blank separator lines added after each file
+        if text.endswith("\n\n"):
+            text = text[:-2]
+        elif text.endswith("\n"):
+            text = text[:-1]
+        document = self.documents[index]
+        if text != document.text:
+            document.set_text(text)
+
+    def sync_window(self):
+        for index in range(self.window_start, self.window_end):
+            self.sync_document(index)
+
+    def window_document_at(self, line):
+        # Index of the window document shown at a widget line (binary search over the file marks)
+        low, high = self.window_start, self.window_end - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.text_line(self.file_mark(middle)) <= line:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def slide_window(self):
+        # Pull in the next/previous file when scrolled to an edge of the window and drop
+        # files at the other edge while over budget, keeping the same text at the top of the view.
+        self.slide_job = None
+        first, last = (float(f) for f in self.text_editor.yview())
+        top_line = self.text_line("@0,0")
+        anchor = self.window_document_at(top_line)
+        anchor_offset = top_line - self.text_line(self.file_mark(anchor))
+
+        reset_undo = False
+        if last >= 1.0 and self.window_end < len(self.documents):
+            self.append_to_window()
+            while self.text_line("end-1c") > WINDOW_MAX_LINES and self.window_start < anchor:
+                self.drop_first_from_window()
+                reset_undo = True
+        elif first <= 0.0 and self.window_start > 0:
+            self.prepend_to_window()
+            reset_undo = True
+            while self.text_line("end-1c") > WINDOW_MAX_LINES and self.window_end - 1 > anchor:
+                self.drop_last_from_window()
+        else:
+            return
 
-        self.status_bar.config(text=f"Loaded {len(self.ide_files)} IDE files")
+        if reset_undo:
+            # Undo entries point at text positions that have moved
+            self.text_editor.edit_reset()
+        self.text_editor.yview(f"{self.file_mark(anchor)} + {anchor_offset} lines")
         self.highlight_syntax()
+        self.apply_search_tags()
 
-    def load_file_into_editor(self, file_path):
-        try:
-            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                file_content = f.read()
-                self.original_contents[file_path] = file_content
+    def on_scrollbar(self, *args):
+        if args[0] != "moveto" or not self.documents:
+            self.text_editor.yview(*args)
+            return
 
-                start_index = self.text_editor.index(tk.END)
-                self.text_editor.insert(tk.END, f"// --- {os.path.basename(file_path)} --- //\n", "file_header")
-                self.text_editor.insert(tk.END, file_content + "\n\n")
-                end_index = self.text_editor.index(tk.END)
+        # Map the fraction over all documents to a file and a line in it
+        window_lines = self.text_line("end-1c")
+        total = self.lines_before_window + window_lines + self.lines_after_window
+        target = float(args[1]) * total
+        if self.lines_before_window <= target < self.lines_before_window + window_lines:
+            self.text_editor.yview_moveto((target - self.lines_before_window) / window_lines)
+            return
 
-                self.file_sections[file_path] = (start_index, end_index)
-                self.file_list.insert(tk.END, os.path.basename(file_path))
-        except Exception as e:
-            print(f"Error reading {file_path}: {e}")
+        line = 0
+        for index, document in enumerate(self.documents):
+            if self.window_start <= index < self.window_end:
+                line_count = self.text_line(self.document_text_range(index)[1]) - self.text_line(self.file_mark(index))
+            else:
+                line_count = document.lines
+            if target < line + line_count or index == len(self.documents) - 1:
+                break
+            line += line_count
+        if not self.window_start <= index < self.window_end:
+            self.set_window(index)
+        self.text_editor.yview(f"{self.file_mark(index)} + {int(target - line)} lines")
 
     def navigate_to_file(self, event):
-        try:
-            self.text_editor.tag_remove("highlight", "1.0", tk.END)
-
-            selected_file = self.file_list.get(self.file_list.curselection())
-            for path, (start, end) in self.file_sections.items():
-                if os.path.basename(path) == selected_file:
-                    self.text_editor.see(start)
-                    self.text_editor.tag_add("highlight", start, end)
-                    self.text_editor.tag_config("highlight", background="#444444")
-                    return
-        except Exception:
-            pass
+        selection = self.file_list.curselection()
+        if not selection:
+            return
+        index = selection[0]
+        self.text_editor.tag_remove("highlight", "1.0", tk.END)
+
+        if not self.window_start <= index < self.window_end:
+            self.set_window(index)
+        start = self.file_mark(index)
+        end = self.file_mark(index + 1) if index + 1 < self.window_end else tk.END
+        self.text_editor.yview(start)
+        self.text_editor.tag_add("highlight", start, end)
+
+    def is_document_dirty(self, index):
+        # Whether a document differs from the file as it was loaded or last saved
+        document = self.documents[index]
+        original = self.original_contents[document.path]
+        if document.text is original:
+            return False
+        if document.path not in self.original_hashes:
+            self.original_hashes[document.path] = text_hash(original)
+        if text_hash(document.text) != self.original_hashes[document.path]:
+            return True
+        document.text = original  # edited back to the original, share it again
+        return False
+
+    @profiled("save.write")
+    def write_document(self, index):
+        document = self.documents[index]
+        write_text_atomic(document.path, document.text)
+        self.file_stamps[document.path] = file_stamp(document.path)
+        self.original_contents[document.path] = document.text
+        self.original_hashes[document.path] = text_hash(document.text)
 
     def save_edits(self):
         if not self.ide_files:
             messagebox.showwarning("No Files Loaded", "Please open IDE files first.")
             return
 
-        full_text = self.text_editor.get("1.0", tk.END)
-
-        try:
-            for ide_file in self.ide_files:
-                file_basename = os.path.basename(ide_file)
-                start_marker = f"// --- {file_basename} --- //\n"
-
-                start_index = full_text.find(start_marker)
-                if (start_index == -1):
-                    continue
-
-                start_index += len(start_marker)
-                next_section_index = full_text.find("// ---", start_index)
+        # Only files that differ from their baseline are written, untouched files keep their mtime
+        self.sync_window()
+        dirty = [index for index in range(len(self.documents)) if self.is_document_dirty(index)]
+        if not dirty:
+            self.status_bar.config(text="No changes to save")
+            return
 
-                new_content = full_text[start_index:next_section_index].strip() if next_section_index != -1 else full_text[start_index:].strip()
+        written = 0
+        errors = []
+        span = profiler.begin("save")
+        for index in dirty:
+            try:
+                self.write_document(index)
+                written += 1
+            except Exception as e:
+                errors.append(f"{self.documents[index].name}: {e}")
+        profiler.count("save.files", written)
+
+        self.status_bar.config(text=f"Saved {written} changed IDE files ({len(self.documents) - len(dirty)} unchanged)")
+        self.show_profile(span)
+        if errors:
+            messagebox.showerror("Error", f"Error saving changes to {len(errors)} files:\n" + "\n".join(errors[:20]))
+        else:
+            messagebox.showinfo("Success", f"Changes saved successfully! {written} files written.")
 
-                with open(ide_file, "w", encoding="utf-8", errors="ignore") as file:
-                    file.write(new_content)
+    def save_selected_file(self):
+        selection = self.file_list.curselection()
+        if not selection:
+            messagebox.showerror("Error", "No file selected.")
+            return
 
-            messagebox.showinfo("Success", "Changes saved successfully!")
-            self.status_bar.config(text="Changes saved successfully")
-        except Exception as e:
-            messagebox.showerror("Error", f"Error saving changes: {e}")
+        index = selection[0]
+        self.sync_document(index)
+        document = self.documents[index]
+        if not self.is_document_dirty(index):
+            self.status_bar.config(text=f"{document.name} has no changes to save")
+            return
 
-    def save_selected_file(self):
         try:
-            selected_file = self.file_list.get(self.file_list.curselection())
-            for path, (start, end) in self.file_sections.items():
-                if os.path.basename(path) == selected_file:
-                    full_text = self.text_editor.get("1.0", tk.END)
-                    start_marker = f"// --- {selected_file} --- //\n"
-
-                    start_index = full_text.find(start_marker)
-                    if (start_index == -1):
-                        messagebox.showerror("Error", "Could not find selected file in editor.")
-                        return
+            span = profiler.begin("save")
+            self.write_document(index)
+            self.status_bar.config(text=f"{document.name} saved successfully")
+            self.show_profile(span)
+            messagebox.showinfo("Success", f"{document.name} saved successfully!")
+        except Exception as e:
+            messagebox.showerror("Error", f"Error saving {document.name}: {e}")
 
-                    start_index += len(start_marker)
-                    next_section_index = full_text.find("// ---", start_index)
+    # --- Batch find and replace ---
 
-                    new_content = full_text[start_index:next_section_index].strip() if next_section_index != -1 else full_text[start_index:].strip()
+    def open_replace_dialog(self):
+        if self.replace_dialog is not None and self.replace_dialog.winfo_exists():
+            self.replace_dialog.lift()
+            return
+        dialog = self.replace_dialog = tk.Toplevel(self.root)
+        dialog.title("Find and Replace in All Files")
+        dialog.configure(bg="#2E2E2E")
+        dialog.transient(self.root)
+
+        find_var, replace_var, where_var, sections_var = (tk.StringVar() for _ in range(4))
+        column_var = tk.StringVar(value="All")
+        regex_var, case_var, whole_var, selected_var = (tk.BooleanVar(value=False) for _ in range(4))
+        rows = (("Find:", ttk.Entry(dialog, textvariable=find_var, width=40)),
+                ("Replace with:", ttk.Entry(dialog, textvariable=replace_var, width=40)),
+                ("Column:", ttk.Combobox(dialog, textvariable=column_var, width=37,
+                                         values=("All", "1 (ID)", "2 (Model)", "3 (TXD)", "4 (Draw distance)", "5 (Flags)"))),
+                ("Only entries where:", ttk.Entry(dialog, textvariable=where_var, width=40)),
+                ("Only sections:", ttk.Entry(dialog, textvariable=sections_var, width=40)))
+        for row, (label, widget) in enumerate(rows):
+            ttk.Label(dialog, text=label).grid(row=row, column=0, sticky="w", padx=5, pady=2)
+            widget.grid(row=row, column=1, sticky="we", padx=5, pady=2)
+        options = tk.Frame(dialog, bg="#2E2E2E")
+        options.grid(row=len(rows), column=0, columnspan=2, sticky="w", padx=5)
+        for text, variable in (("Regex", regex_var), ("Match case", case_var), ("Whole field", whole_var), ("Selected files only", selected_var)):
+            tk.Checkbutton(options, text=text, variable=variable, fg="white", bg="#2E2E2E", selectcolor="#2E2E2E",
+                           activebackground="#2E2E2E", activeforeground="white").pack(side="left")
+        ttk.Label(dialog, text='e.g. column "3 (TXD)", where "model ^= lae_", sections "objs, tobj"',
+                  font=("Arial", 9)).grid(row=len(rows) + 1, column=0, columnspan=2, sticky="w", padx=5)
+        result_label = ttk.Label(dialog, text="", font=("Arial", 10))
+        result_label.grid(row=len(rows) + 3, column=0, columnspan=2, sticky="w", padx=5, pady=5)
+
+        def make_rule():
+            column = column_var.get().split(" ", 1)[0]
+            try:
+                return ReplaceRule(find_var.get(), replace_var.get(),
+                                   column=None if column.lower() in ("", "all") else int(column),
+                                   regex=regex_var.get(), match_case=case_var.get(), whole_field=whole_var.get(),
+                                   where=where_var.get().strip() or None,
+                                   sections=[section.strip() for section in sections_var.get().split(",") if section.strip()] or None)
+            except (ValueError, re.error) as e:
+                messagebox.showerror("Find and Replace", f"Invalid replace: {e}", parent=dialog)
+                return None
+
+        def scope():
+            if selected_var.get():
+                return list(self.file_list.curselection())
+            return list(range(len(self.documents)))
+
+        def count():
+            rule = make_rule()
+            if rule:
+                self.sync_window()
+                counts = [rule.apply(self.documents[index].text)[1] for index in scope()]
+                result_label.config(text=f"{sum(counts)} matches in {sum(1 for value in counts if value)} files")
+
+        def replace_all():
+            rule = make_rule()
+            if rule:
+                files, replacements = self.replace_in_documents(rule, scope())
+                result_label.config(text=f"Replaced {replacements} matches in {files} files")
+
+        buttons = tk.Frame(dialog, bg="#2E2E2E")
+        buttons.grid(row=len(rows) + 2, column=0, columnspan=2, pady=5)
+        ttk.Button(buttons, text="Count", command=count).pack(side="left", padx=5)
+        ttk.Button(buttons, text="Replace All", command=replace_all).pack(side="left", padx=5)
+        ttk.Button(buttons, text="Close", command=dialog.destroy).pack(side="left", padx=5)
+
+    def replace_in_documents(self, rule, indices):
+        # Applies a ReplaceRule to the whole text of each document. Every changed file is one
+        # edit: one widget replace (one undo step) for files in the editor window, a text swap
+        # for the others. Returns (files changed, replacements).
+        self.sync_window()
+        span = profiler.begin("replace")
+        batch = []
+        replacements = 0
+        for index in indices:
+            old_text = self.documents[index].text
+            new_text, count = rule.apply(old_text)
+            if count:
+                self.set_document_text(index, new_text)
+                batch.append((index, old_text, new_text))
+                replacements += count
+        profiler.count("replace.files", len(batch))
+        profiler.count("replace.matches", replacements)
+        if batch:
+            self.replace_history = batch
+            self.refresh_after_text_changes()
+        self.status_bar.config(text=f"Replaced {replacements} matches in {len(batch)} files (File > Undo Last Replace reverts them)")
+        self.show_profile(span)
+        return len(batch), replacements
+
+    def undo_last_replace(self):
+        # Puts back the text of every file of the last batch replace that was not edited since
+        if not self.replace_history:
+            messagebox.showinfo("Undo Last Replace", "There is no replace to undo.")
+            return
+        self.sync_window()
+        restored = 0
+        skipped = []
+        for index, old_text, new_text in self.replace_history:
+            if index < len(self.documents) and self.documents[index].text == new_text:
+                self.set_document_text(index, old_text)
+                restored += 1
+            elif index < len(self.documents):
+                skipped.append(self.documents[index].name)
+        self.replace_history = []
+        self.refresh_after_text_changes()
+        self.status_bar.config(text=f"Undid the replace in {restored} files")
+        if skipped:
+            messagebox.showwarning("Undo Last Replace", f"{len(skipped)} files were edited after the replace and were left as they are:\n" + "\n".join(skipped[:20]))
+
+    def set_document_text(self, index, new_text):
+        document = self.documents[index]
+        if not self.window_start <= index < self.window_end:
+            lines = document.lines
+            document.set_text(new_text)
+            if index < self.window_start:
+                self.lines_before_window += document.lines - lines
+            else:
+                self.lines_after_window += document.lines - lines
+            self.conflicts.set_document(index, new_text)
+            self.unindexed_documents.add(index)
+            return
 
-                    with open(path, "w", encoding="utf-8", errors="ignore") as file:
-                        file.write(new_content)
+        # Only the lines that differ go through the widget, as one tracked (undoable) edit
+        changed = changed_line_range(document.text, new_text)
+        if changed is None:
+            return
+        first, old_last, new_last = changed
+        old_count = document.text.count('\n') + 1
+        new_lines = new_text.split('\n')[first:new_last + 1]
+        line = self.text_line(self.file_mark(index)) + 1  # widget line of the document's first line
+        self.text_editor.edit_separator()
+        if old_last < first:  # lines inserted
+            if first < old_count:
+                self.text_editor.insert(f"{line + first}.0", "\n".join(new_lines) + "\n")
+            else:
+                self.text_editor.insert(f"{line + first - 1}.end", "\n" + "\n".join(new_lines))
+        elif new_last < first:  # lines removed
+            if old_last + 1 < old_count:
+                self.text_editor.delete(f"{line + first}.0", f"{line + old_last + 1}.0")
+            else:
+                self.text_editor.delete(f"{line + first - 1}.end", f"{line + old_last}.end")
+        else:
+            self.text_editor.replace(f"{line + first}.0", f"{line + old_last}.end", "\n".join(new_lines))
+        self.text_editor.edit_separator()
+        self.sync_document(index)
+
+    def refresh_after_text_changes(self):
+        # One refresh after a batch of whole-file changes: search hits moved, conflicts may have changed
+        self.clear_search()
+        if self.conflict_job is not None:
+            self.root.after_cancel(self.conflict_job)
+        self.refresh_conflicts()
+
+    # --- Changes made on disk by other programs ---
+
+    def watch_files(self):
+        # Cheap mtime/size polling of the loaded files, a slice of them per check
+        self.root.after(WATCH_INTERVAL_MS, self.watch_files)
+        if self.watch_busy or self.load_queue is not None or self.tool_queue is not None or not self.documents:
+            return  # tools reload what they wrote themselves
+
+        changed = []
+        missing = []
+        for _ in range(min(WATCH_FILES_PER_TICK, len(self.documents))):
+            index = self.watch_next % len(self.documents)
+            self.watch_next = index + 1
+            path = self.documents[index].path
+            stamp = file_stamp(path)
+            if stamp == self.file_stamps.get(path):
+                continue
+            self.file_stamps[path] = stamp
+            if stamp is None:
+                missing.append(self.documents[index].name)
+            else:
+                changed.append(index)
+        if missing:
+            self.status_bar.config(text=f"{', '.join(missing[:5])} {'was' if len(missing) == 1 else 'were'} deleted or moved on disk, saving writes {'it' if len(missing) == 1 else 'them'} back")
+        if changed:
+            self.reload_changed_files(changed)
+
+    def reload_changed_files(self, changed):
+        # Reloads files changed on disk, asking first about the ones with unsaved edits
+        self.watch_busy = True
+        try:
+            self.sync_window()
+            edited = [index for index in changed if self.is_document_dirty(index)]
+            clean = [index for index in changed if index not in edited]
+            self.reload_documents([self.documents[index].path for index in clean])
+            discard_edits = False
+            if edited:
+                names = [self.documents[index].name for index in edited]
+                discard_edits = messagebox.askyesno(
+                    "Files Changed on Disk",
+                    f"{len(names)} files with unsaved edits were changed by another program:\n" + "\n".join(names[:20])
+                    + "\n\nReload them from disk? Your edits to them are lost.\n"
+                    "No keeps your edits, saving them overwrites the new version on disk.")
+                self.reload_documents([self.documents[index].path for index in edited], keep_edits=not discard_edits)
+            names = [self.documents[index].name for index in (changed if discard_edits else clean)]
+            if names:
+                self.status_bar.config(text=f"Reloaded {len(names)} files changed on disk: {', '.join(names[:5])}{'...' if len(names) > 5 else ''}")
+        except OSError as e:
+            self.status_bar.config(text=f"Error reloading a file changed on disk: {e}")
+        finally:
+            self.watch_busy = False
+
+    # --- Profiling ---
+
+    def toggle_profiling(self):
+        # Tools > Profile Operations: every load, search, save and tool run is timed until it is unticked
+        if self.profiling_var.get():
+            profiler.start()
+            self.status_bar.config(text="Profiling on, the status bar shows the timings of each operation")
+            return
+        profiler.stop()
+        if profiler.phases and messagebox.askyesno("Profiling", "Profiling stopped. Save the trace?"):
+            self.save_profile_trace()
+        else:
+            self.status_bar.config(text="Profiling off")
 
-                    messagebox.showinfo("Success", f"{selected_file} saved successfully!")
-                    self.status_bar.config(text=f"{selected_file} saved successfully")
-                    return
-            messagebox.showerror("Error", "Could not find selected file.")
-        except Exception:
-            messagebox.showerror("Error", "No file selected.")
+    def save_profile_trace(self):
+        if not profiler.phases:
+            messagebox.showinfo("Profiling", "Nothing was profiled yet, tick Tools > Profile Operations first.")
+            return
+        path = filedialog.asksaveasfilename(title="Save Profile Trace", defaultextension=".json",
+                                            initialfile="profile_trace.json", filetypes=[("JSON Files", "*.json")])
+        if not path:
+            return
+        try:
+            profiler.write_trace(path)
+            self.status_bar.config(text=f"Profile trace saved to {path}")
+        except OSError as e:
+            messagebox.showerror("Error", f"Error saving the profile trace: {e}")
+
+    def show_profile(self, span):
+        # Ends a profiled operation and adds its timings to the status bar message
+        if profiler.end(span) is not None:
+            self.status_bar.config(text=f"{self.status_bar.cget('text')}  [{profiler.last_summary}]")
+
+    # --- Live ID / model name conflicts ---
+
+    @profiled("editor.conflicts")
+    def track_conflicts(self, first, last, delta):
+        # Lines first..last of the widget were edited and delta lines were added, update
+        # the conflict multimaps from just those lines when they lie inside one file
+        if self.window_end <= self.window_start:
+            return
+        document = self.window_document_at(first)
+        header = self.text_line(self.file_mark(document))
+        document_first = first - header - 1
+        old_count = last - first + 1 - delta
+        next_header = self.text_line(self.file_mark(document + 1)) if document + 1 < self.window_end else None
+        if document_first >= 0 and old_count >= 0 and (next_header is None or last < next_header) \
+                and document_first + old_count <= self.conflicts.line_count(document):
+            new_lines = self.text_editor.get(f"{first}.0", f"{last}.end").split('\n')
+            read_line = lambda line: self.text_editor.get(f"{header + 1 + line}.0", f"{header + 1 + line}.end")
+            self.conflicts.replace_lines(document, document_first, old_count, new_lines, read_line)
+        else:
+            # A file header or several files were touched, re-read those files
+            for index in range(document, self.window_document_at(last) + 1):
+                self.sync_document(index)
+                self.conflicts.set_document(index, self.documents[index].text)
+        if self.conflicts.take_changed() and self.conflict_job is None:
+            self.conflict_job = self.root.after_idle(self.refresh_conflicts)
+
+    def refresh_conflicts(self):
+        # Conflicts panel, and the flags of the lines on screen (other lines may have
+        # gained or lost a conflict with the one just edited)
+        self.conflict_job = None
+        self.conflicts.take_changed()
+        self.conflict_items = []
+        self.conflict_list.delete(0, tk.END)
+        rows = []
+        for kind, key, count in self.conflicts.conflicts():
+            self.conflict_items.append((kind, key))
+            rows.append(f"ID {key} ({count} entries)" if kind == "id" else f"Model {key} ({count} entries)")
+        if rows:
+            self.conflict_list.insert(tk.END, *rows)
+        self.conflict_label.config(text=f"Conflicts ({len(rows)})" if rows else "Conflicts")
+        if self.window_end > self.window_start:
+            self.highlight_visible_lines()
+
+    def show_conflict(self, event=None):
+        # Shows the next entry of the picked conflict, cycling through all of them
+        selection = self.conflict_list.curselection()
+        if not selection or selection[0] >= len(self.conflict_items):
+            return
+        kind, key = self.conflict_items[selection[0]]
+        locations = self.conflicts.locations(model_id=key) if kind == "id" else self.conflicts.locations(model=key)
+        if not locations:
+            return
+        number = self.conflict_next.get((kind, key), 0) % len(locations)
+        self.conflict_next[(kind, key)] = number + 1
+        document, line = locations[number]
+        if not self.window_start <= document < self.window_end:
+            self.set_window(document)
+        line += self.text_line(self.file_mark(document)) + 1
+        self.text_editor.tag_remove("highlight", "1.0", tk.END)
+        self.text_editor.tag_add("highlight", f"{line}.0", f"{line}.end")
+        self.text_editor.mark_set("insert", f"{line}.0")
+        self.text_editor.see(f"{line}.0")
+        label = f"ID {key}" if kind == "id" else f"Model {key}"
+        self.status_bar.config(text=f"{label}: entry {number + 1} of {len(locations)}, in {self.documents[document].name}")
+
+    def install_edit_hook(self):
+        # Route the Text widget's Tcl command through Python so every insert/delete
+        # (typing, paste, cut, undo) reports which lines it touched.
+        widget = self.text_editor._w
+        self.text_editor_cmd = widget + "_orig"
+        self.root.tk.call("rename", widget, self.text_editor_cmd)
+        self.root.tk.createcommand(widget, self.text_editor_proxy)
+
+    def text_line(self, index):
+        return int(str(self.root.tk.call(self.text_editor_cmd, "index", index)).split('.')[0])
+
+    def text_editor_proxy(self, *args):
+        call = self.root.tk.call
+        command = args[0] if args else ""
+
+        if command == "insert":
+            first = min(self.text_line(args[1]), self.text_line("end-1c"))
+            result = call((self.text_editor_cmd,) + args)
+            added = sum(text.count('\n') for text in args[2::2])
+            self.mark_lines_dirty(first, first + added, added)
+            return result
+
+        if command in ("delete", "replace"):
+            first = self.text_line(args[1])
+            last = self.text_line(args[2]) if len(args) > 2 else self.text_line(args[1] + "+1c")
+            last = min(last, self.text_line("end-1c"))
+            result = call((self.text_editor_cmd,) + args)
+            added = sum(text.count('\n') for text in args[3::2]) if command == "replace" else 0
+            self.mark_lines_dirty(first, first + added, added - (last - first))
+            return result
+
+        if command == "edit" and len(args) > 1 and args[1] in ("undo", "redo"):
+            lines_before = self.text_line("end")
+            result = call((self.text_editor_cmd,) + args)
+            first, last = self.visible_line_range()
+            insert_line = self.text_line("insert")
+            self.mark_lines_dirty(min(first, insert_line), max(last, insert_line), self.text_line("end") - lines_before)
+            return result
+
+        return call((self.text_editor_cmd,) + args)
+
+    def mark_lines_dirty(self, first, last, delta=0):
+        # delta lines were added (or removed if negative) after line `first`, so
+        # anything already queued below it has moved.
+        if self.suspend_edit_tracking:
+            # Files being appended by the loader are highlighted once loading finishes
+            return
+        self.track_conflicts(first, last, delta)
+        if self.dirty_lines is None:
+            self.root.after_idle(self.flush_dirty_lines)
+        else:
+            dirty_first, dirty_last = self.dirty_lines
+            if delta:
+                if dirty_first > first:
+                    dirty_first = max(first, dirty_first + delta)
+                if dirty_last > first:
+                    dirty_last = max(first, dirty_last + delta)
+            first, last = min(first, dirty_first), max(last, dirty_last)
+        self.dirty_lines = (first, last)
+        if self.window_end > self.window_start:
+            self.unindexed_documents.update(range(self.window_document_at(first), self.window_document_at(last) + 1))
+
+        if delta and self.highlight_next_line is not None and self.highlight_next_line > first:
+            self.highlight_next_line = max(first, self.highlight_next_line + delta)
+
+    def flush_dirty_lines(self):
+        if self.dirty_lines:
+            first, last = self.dirty_lines
+            self.dirty_lines = None
+            self.highlight_lines(first, last)
+
+    def visible_line_range(self):
+        first = self.text_line("@0,0")
+        last = self.text_line(f"@0,{self.text_editor.winfo_height()}")
+        return first, last
+
+    def on_editor_scroll(self, first, last):
+        first, last = float(first), float(last)
+        # Show the position over all loaded files on the scrollbar
+        window_lines = self.text_line("end-1c")
+        total = self.lines_before_window + window_lines + self.lines_after_window
+        self.text_editor.vbar.set((self.lines_before_window + first * window_lines) / total,
+                                  (self.lines_before_window + last * window_lines) / total)
+
+        # Lines scrolled into view before the background pass reached them
+        if self.highlight_job is not None:
+            self.root.after_idle(self.highlight_visible_lines)
+
+        # Reaching either end of the window brings in the neighbouring files
+        at_edge = (last >= 1.0 and self.window_end < len(self.documents)) or (first <= 0.0 and self.window_start > 0)
+        if at_edge and self.slide_job is None:
+            self.slide_job = self.root.after_idle(self.slide_window)
+
+    def highlight_visible_lines(self):
+        self.highlight_lines(*self.visible_line_range())
 
     def highlight_syntax(self, event=None):
-        # Clear existing tags
-        for tag in ["section", "id", "modelname", "coordinate", "comment", "keyword"]:
-            self.text_editor.tag_remove(tag, "1.0", "end")
-        
-        # Get all text content
-        content = self.text_editor.get("1.0", "end")
-        
-        # Process line by line
-        for line_num, line in enumerate(content.split('\n'), 1):
-            # Skip empty lines
-            if not line.strip():
-                continue
-                
-            # Highlight comments
-            if '#' in line:
-                comment_start = line.index('#')
-                start_index = f"{line_num}.{comment_start}"
-                self.text_editor.tag_add("comment", start_index, f"{line_num}.end")
-                continue
-            
-            # Highlight section headers
-            if line.strip().lower() in {"objs", "tobj", "anim", "inst", "path", "2dfx", "txdp", "end"}:
-                self.text_editor.tag_add("section", f"{line_num}.0", f"{line_num}.end")
-                continue
-            
-            # Process data lines
-            parts = line.strip().split(',')
-            if len(parts) > 1:
-                # Highlight ID (first number)
-                if parts[0].strip().isdigit():
-                    self.text_editor.tag_add("id", f"{line_num}.0", f"{line_num}.{len(parts[0])}")
-                
-                # Highlight model name (second part)
-                if len(parts) > 1:
-                    start_pos = len(parts[0]) + 1
-                    end_pos = start_pos + len(parts[1])
-                    self.text_editor.tag_add("modelname", f"{line_num}.{start_pos}", f"{line_num}.{end_pos}")
-                
-                # Highlight coordinates (floating point numbers)
-                for i, part in enumerate(parts[2:], 2):
-                    if re.match(r'-?\d*\.?\d+', part.strip()):
-                        start_pos = sum(len(p) + 1 for p in parts[:i])
-                        end_pos = start_pos + len(part)
-                        self.text_editor.tag_add("coordinate", f"{line_num}.{start_pos}", f"{line_num}.{end_pos}")
+        # Highlight what is on screen right away, then the rest of the buffer in idle-time chunks
+        if self.highlight_job is not None:
+            self.root.after_cancel(self.highlight_job)
+            self.highlight_job = None
+
+        self.dirty_lines = None
+        self.highlight_visible_lines()
+        self.highlight_next_line = 1
+        self.highlight_job = self.root.after(1, self.highlight_next_chunk)
+
+    def highlight_next_chunk(self):
+        first = self.highlight_next_line
+        last_line = self.text_line("end-1c")
+        if first > last_line:
+            self.highlight_job = None
+            self.highlight_next_line = None
+            return
+
+        last = min(first + HIGHLIGHT_CHUNK_LINES - 1, last_line)
+        self.highlight_lines(first, last)
+        self.highlight_next_line = last + 1
+        self.highlight_job = self.root.after(1, self.highlight_next_chunk)
+
+    @profiled("editor.highlight")
+    def highlight_lines(self, first, last):
+        # Clear and re-tokenize lines first..last (inclusive) with one tag_add call per tag
+        profiler.count("editor.highlighted_lines", last - first + 1)
+        for tag in HIGHLIGHT_TAGS:
+            self.text_editor.tag_remove(tag, f"{first}.0", f"{last}.end")
+
+        content = self.text_editor.get(f"{first}.0", f"{last}.end")
+
+        conflicting_ids = self.conflicts.conflicting_ids
+        conflicting_models = self.conflicts.conflicting_models
+        ranges = {tag: [] for tag in HIGHLIGHT_TAGS}
+        for line_num, line in enumerate(content.split('\n'), first):
+            for tag, start, end in self.tokenize_line(line):
+                ranges[tag].append(f"{line_num}.{start}")
+                ranges[tag].append(f"{line_num}.{end}")
+                # Flag IDs and model names defined more than once
+                if tag == "id" and conflicting_ids and int(line[start:end]) in conflicting_ids or \
+                        tag == "modelname" and conflicting_models and line[start:end].strip().lower() in conflicting_models:
+                    ranges["conflict"].append(f"{line_num}.{start}")
+                    ranges["conflict"].append(f"{line_num}.{end}")
+
+        for tag, indices in ranges.items():
+            if indices:
+                self.text_editor.tag_add(tag, *indices)
+
+    def tokenize_line(self, line):
+        # Returns (tag, start column, end column) for every highlighted token of a line
+        stripped = line.strip()
+        if not stripped:
+            return []
+
+        # Highlight comments
+        if '#' in line:
+            return [("comment", line.index('#'), len(line))]
+
+        # Highlight section headers
+        if stripped.lower() in SECTION_HEADERS:
+            return [("section", 0, len(line))]
+
+        # Process data lines
+        parts = line.split(',')
+        if len(parts) < 2:
+            return []
+
+        tokens = []
+        # Highlight ID (first number)
+        if parts[0].strip().isdigit():
+            tokens.append(("id", 0, len(parts[0])))
+
+        # Highlight model name (second part)
+        start_pos = len(parts[0]) + 1
+        tokens.append(("modelname", start_pos, start_pos + len(parts[1])))
+
+        # Highlight coordinates (floating point numbers)
+        start_pos += len(parts[1]) + 1
+        for part in parts[2:]:
+            if COORDINATE_PATTERN.match(part.strip()):
+                tokens.append(("coordinate", start_pos, start_pos + len(part)))
+            start_pos += len(part) + 1
+        return tokens
 
 if __name__ == "__main__":
+    profile_from_environment()
     root = tk.Tk()
     app = IDEFileEditor(root)
     root.mainloop()
@@ -1,11 +1,14 @@
 # took inspiration from grinch's script
 
-import glob, os
+import os
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
+from batch_tools import IPLIDSorter, get_files_with_extension
+from profiling import profile_from_environment
 
-class IPLIDSorterGUI:
+class IPLIDSorterGUI(IPLIDSorter):
     def __init__(self, master):
+        IPLIDSorter.__init__(self)
         self.master = master
         master.title("IPL ID Sorting Script")
         master.configure(bg="#2E2E2E")
@@ -82,8 +85,7 @@ class IPLIDSorterGUI:
             self.tree.insert("", 'end', values=(os.path.basename(ide_file), os.path.basename(ipl_file)))
 
     def get_files_with_extension(self, path, extention):
-        search_path = os.path.join(path, "*." + extention)
-        return glob.glob(search_path)
+        return get_files_with_extension(path, extention)
 
     def process_files(self):
         if not self.ide_files_list or not self.ipl_files_list:
@@ -92,90 +94,22 @@ class IPLIDSorterGUI:
 
         try:
             self.process_ide_files(self.ide_files_list)
-            self.process_ipl_files(self.ipl_files_list)
-            messagebox.showinfo("Success", "Sorting finished successfully.")
+            rewritten = self.process_ipl_files(self.ipl_files_list)
+            report_path = self.write_report(rewritten, self.ipl_files_path)
+
+            total = sum(rewritten.values())
+            changed_files = sum(1 for count in rewritten.values() if count)
+            summary = f"Sorting finished successfully.\n\n{total} lines rewritten in {changed_files} of {len(rewritten)} IPL files."
+            if self.ambiguous_models:
+                summary += f"\n{len(self.ambiguous_models)} models are defined with different IDs in more than one IDE entry and were left untouched."
+            summary += f"\n\nFull report saved to {report_path}"
+            messagebox.showinfo("Success", summary)
         except Exception as e:
             messagebox.showerror("Error", str(e))
 
-    def process_ide_files(self, func_ide_list):
-        self.ide_models = set()
-        for x in func_ide_list:
-            with open(x,'r') as ide:
-                valid_line : bool = False
-                for line in ide:
-                    if (line[:4] == "objs" or line[:4] == "tobj"):
-                        valid_line = True
-                    
-                    if valid_line and not (line[0] == '#' or line[0] == '\n' or (line[0] >= 'A' and line[0] <= 'z')):
-                        data_line = line.split(',')
-                        if len(data_line) > 1:
-                            self.ide_models.add(data_line[1].strip())
-
-                    if (line[:3] == "end"):
-                        valid_line = False
-
-    def get_id_name(self, func_line):
-        if (func_line[0] != '\n'):
-            data_line = func_line.split(',')
-            return data_line
-
-    def is_inst_line(self, ipl_line):
-        if(ipl_line[:3] == "end"):
-            return "inst end" 
-        elif not (ipl_line[0] == '#' or ipl_line[0] == '\n' or (ipl_line[0] >= 'A' and ipl_line[0] <= 'z')):
-            return True
-        return False
-
-    def remove_file(self, file):
-        if os.path.exists(file):
-            os.remove(file)
-
-    def process_ipl_files(self, func_ipl_list):      
-        index = 0
-        for y in func_ipl_list:
-            should_break = False  
-            with open(str(y),'r') as ipl:
-                lines = ipl.readlines()
-
-            with open(str(y),'w') as ipl:
-                for a in lines:
-                    if(self.is_inst_line(a) == "inst end"):
-                        ipl.write("end\n")
-                    elif(self.is_inst_line(a)):
-                        ipl_line = self.get_id_name(a)
-                        model_name = ipl_line[1].strip()
-                        if model_name in self.ide_models:
-                            # Find corresponding ID in IDE and update IPL
-                            for x in self.ide_files_list:
-                                with open(x, 'r') as ide:
-                                    ide.seek(0)
-                                    valid_line = False
-                                    for b in ide:
-                                        if (b[:4] == "objs" or b[:4] == "tobj"):
-                                            valid_line = True
-                                        
-                                        if valid_line and not (b[0] == '#' or b[0] == '\n' or (b[0] >= 'A' and b[0] <= 'z')):
-                                            ide_line = self.get_id_name(b)
-                                            ide_model_name = ide_line[1].strip()
-                                            if ide_model_name == model_name:
-                                                ipl_line[0] = ide_line[0]
-                                                full_ipl_line = ",".join(ipl_line)
-                                                ipl.write(full_ipl_line)
-                                                should_break = True
-                                                break
-                                        if (b[:3] == "end"):
-                                            valid_line = False
-                                    if should_break:
-                                        should_break = False
-                                        break
-                        else:
-                            ipl.write(a) # Keep the line as is if model not in IDE
-                    else:
-                        ipl.write(a)
-            index += 1
-
 # ----- Main -----
 if __name__ == "__main__":
+    profile_from_environment()
     root = tk.Tk()
     gui = IPLIDSorterGUI(root)
     root.mainloop()
@@ -0,0 +1,110 @@
+# Find and replace over the whole text of IDE files, for bulk edits such as renaming
+# a TXD in every file or changing the draw distance of every model with a prefix.
+#
+#   rule = ReplaceRule("vgn_", "lvn_", column=3)                      # TXD column only
+#   rule = ReplaceRule("299", "300", column=4, whole_field=True, where="model ^= lae_")
+#   rule = ReplaceRule(r"^(\d+)$", r"\g<1>0", column=4, regex=True, sections=("objs",))
+#   new_text, count = rule.apply(text)
+#
+# Columns are counted from 1 over the comma separated fields of an entry line, the
+# spacing around a field is kept. `where` takes a search box query (see search_index.py)
+# that an entry has to match to be changed. Without any scoping the rule is one
+# re.subn over the whole text.
+
+import re
+
+from gta_parser import iter_ide_lines, ENTRY
+from search_index import parse_query, line_fields
+
+
+class ReplaceRule:
+    def __init__(self, find, replace, column=None, regex=False, match_case=False, whole_field=False, where=None, sections=None):
+        # Raises ValueError for an empty search or a column below 1, re.error for a bad pattern or query
+        if not find:
+            raise ValueError("Nothing to find")
+        if column is not None and column < 1:
+            raise ValueError("Columns are counted from 1")
+        pattern = find if regex else re.escape(find)
+        if whole_field:
+            pattern = rf"\A(?:{pattern})\Z"
+        self.pattern = re.compile(pattern, 0 if match_case else re.IGNORECASE)
+        # Plain replacements are literal, regex ones may use \1 and \g<name>
+        self.replacement = replace if regex else (lambda match: replace)
+        self.column = column
+        self.whole_field = whole_field
+        self.where = parse_query(where) if where else None
+        self.sections = {section.lower() for section in sections} if sections else None
+
+    @property
+    def per_entry(self):
+        return self.column is not None or self.whole_field or self.where is not None or self.sections is not None
+
+    def entry_matches(self, line, section):
+        fields, mode, value = self.where
+        for field, term, _, _ in line_fields(line, section):
+            if field not in fields:
+                continue
+            if mode == "exact" and term == value or mode == "prefix" and term.startswith(value) \
+                    or mode == "contains" and value in term or mode == "regex" and value.search(term):
+                return True
+        return False
+
+    def replace_field(self, part):
+        # Replaces inside one field, keeping the spaces around it
+        value = part.strip()
+        if not value:
+            return part, 0
+        new_value, count = self.pattern.subn(self.replacement, value)
+        if not count:
+            return part, 0
+        leading = part[:len(part) - len(part.lstrip())]
+        trailing = part[len(part.rstrip()):]
+        return leading + new_value + trailing, count
+
+    def apply_line(self, line, section):
+        if self.sections is not None and section not in self.sections:
+            return line, 0
+        if self.where is not None and not self.entry_matches(line, section):
+            return line, 0
+        if self.column is None:
+            return self.replace_field(line)
+        parts = line.split(',')
+        if self.column > len(parts):
+            return line, 0
+        parts[self.column - 1], count = self.replace_field(parts[self.column - 1])
+        return (",".join(parts), count) if count else (line, 0)
+
+    def apply(self, text):
+        # Returns (new text, replacements made), the text itself when nothing changed
+        if not self.per_entry:
+            new_text, count = self.pattern.subn(self.replacement, text)
+            return (new_text, count) if count else (text, 0)
+
+        lines = text.split('\n')
+        total = 0
+        for line, record in iter_ide_lines(lines):
+            if record.kind != ENTRY:
+                continue
+            new_line, count = self.apply_line(line, record.section)
+            if count:
+                lines[record.line_no - 1] = new_line
+                total += count
+        return ("\n".join(lines), total) if total else (text, 0)
+
+
+def changed_line_range(old_text, new_text):
+    # (first line, old last line, new last line) from 0 of the lines that differ between
+    # two texts, so an editor only has to touch those. None when they are equal.
+    if old_text == new_text:
+        return None
+    old_lines = old_text.split('\n')
+    new_lines = new_text.split('\n')
+    first = 0
+    shortest = min(len(old_lines), len(new_lines))
+    while first < shortest and old_lines[first] == new_lines[first]:
+        first += 1
+    old_last, new_last = len(old_lines) - 1, len(new_lines) - 1
+    while old_last >= first and new_last >= first and old_lines[old_last] == new_lines[new_last]:
+        old_last -= 1
+        new_last -= 1
+    return first, old_last, new_last
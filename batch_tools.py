@@ -0,0 +1,1475 @@
+# GUI-free core of the editor tools, with a command line entry point for unattended map builds.
+#
+#   python batch_tools.py renumber IDE_DIR --start 18000
+#   python batch_tools.py renumber IDE_DIR --auto --reference GAME_DATA_DIR --ceiling 65000
+#   python batch_tools.py renumber IDE_DIR --start 18000 --remap remap.txt --ipl IPL_DIR
+#   python batch_tools.py apply-remap remap.txt IPL_DIR
+#   python batch_tools.py journals FOLDER / recover FOLDER / restore FOLDER/.write_journal/BATCH
+#   python batch_tools.py prune FOLDER [--keep N]
+#   python batch_tools.py self-check
+#   python batch_tools.py sort-ipl-ids --ide IDE_DIR --ipl IPL_DIR
+#   python batch_tools.py separate-lods a.ipl b.ipl [--output DIR] [--binary] [--workers N]
+#   python batch_tools.py convert IPL_DIR --to binary|text [--ide IDE_DIR] [--output DIR]
+#   python batch_tools.py transform IPL_DIR --min X Y Z --max X Y Z --rotate 90 --pivot X Y Z --translate X Y Z
+#   python batch_tools.py region IPL_DIR --center X Y Z --radius 50 [--model NAME] [--output region.ipl]
+#   python batch_tools.py nearest IPL_DIR --at X Y Z [--model NAME] [--count 5]
+#   python batch_tools.py replace IDE_DIR --find vgn_ --replace lvn_ [--column 3] [--where "model ^= lae_"] [--regex]
+#   python batch_tools.py unused-ids DIR [DIR ...] --output unused.txt [--ceiling 90000]
+#   python batch_tools.py duplicates DIR [DIR ...] --output duplicated_objects.txt
+#   python batch_tools.py validate --ide IDE_DIR --ipl IPL_DIR [--json placement_report.json] [--strict]
+#   python batch_tools.py --profile trace.json COMMAND ...   (times the run, see profiling.py)
+#
+# Files are rewritten in journaled batches (see write_journal.py): a batch is committed
+# as a whole, and the originals are kept in .write_journal unless --no-backup is given.
+# Only the newest --keep-batches (default 20) finished batches of a folder are kept.
+#
+# Exit codes: 0 success, 1 some files failed, 2 bad arguments, 3 findings with --strict.
+
+import argparse
+import contextlib
+import io
+import glob
+import json
+import multiprocessing
+import os
+import re
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from batch_replace import ReplaceRule
+from gta_parser import iter_ide_lines, iter_ipl_lines, parse_ide, parse_ipl, is_binary_ipl, ENTRY, ID_SECTIONS
+from profiling import profiler, profiled
+from id_allocator import IDAllocator, DEFAULT_ID_CEILING, collect_used_ids, find_ide_files, format_ranges
+from write_journal import WriteJournal, JournalError, KEEP_BATCHES, recover, restore, list_journals, prune, find_files
+
+EXIT_OK = 0
+EXIT_FILE_ERRORS = 1
+EXIT_USAGE = 2
+EXIT_FINDINGS = 3
+
+RENUMBERED_SECTIONS = ("objs", "tobj")
+PLACED_SECTIONS = ("objs", "tobj", "anim")  # IDE sections of models that IPL inst entries place
+PARALLEL_MIN_FILES = 4  # fewer files than this are not worth starting worker processes for
+BINARY_CHUNK_ROWS = 20000  # entries converted at once when writing a binary IPL remainder
+
+
+class Cancelled(Exception):
+    # Raised by a progress callback to stop a batch, its journal is rolled back
+    pass
+
+
+def get_files_with_extension(directory, extension):
+    return glob.glob(os.path.join(directory, "*." + extension))
+
+
+def get_ide_files(directory):
+    return get_files_with_extension(directory, "ide")
+
+
+def path_key(path):
+    # The same file gives the same key however its path was written
+    return os.path.normcase(os.path.abspath(path))
+
+
+def journal_root(paths):
+    # Folder whose .write_journal holds the backups of a batch touching `paths`
+    directories = [os.path.dirname(os.path.abspath(path)) for path in paths] or [os.getcwd()]
+    try:
+        return os.path.commonpath(directories)
+    except ValueError:  # files on different drives
+        return directories[0]
+
+
+@contextlib.contextmanager
+def batch_journal(journal, paths):
+    # Use the caller's journal, or give the batch its own that commits when the batch is done
+    if journal is not None:
+        yield journal
+        return
+    with WriteJournal(journal_root(paths)) as journal:
+        yield journal
+
+
+def open_text(file_path, sources=None):
+    # Text of a file, from `sources` (path -> text already in memory, e.g. the
+    # editor's loaded documents) when it is there, from disk otherwise
+    if sources is not None and file_path in sources:
+        return io.StringIO(sources[file_path])
+    return open(file_path, 'r')
+
+
+def file_records(file_path, cache=None, sources=None):
+    # Entry records of an IDE file, from `sources` (see open_text) or the parse cache when given
+    if sources is not None and file_path in sources:
+        return [record for _, record in iter_ide_lines(io.StringIO(sources[file_path])) if record.kind == ENTRY]
+    return cache.get_records(file_path) if cache else parse_ide(file_path)
+
+
+# ----- IDE renumbering -----
+
+def count_renumbered_entries(file_path):
+    return sum(1 for record in parse_ide(file_path) if record.section in RENUMBERED_SECTIONS and record.id is not None)
+
+
+def auto_start_ids(directory, mode, at_least=0, ceiling=DEFAULT_ID_CEILING, reference_directory=None):
+    # Picks start IDs from the IDs that are free in the reference IDEs (the game's
+    # data folder) or, without one, in the renumbered folder itself. The entries
+    # that are about to be renumbered do not count as used.
+    # Returns (start_id, file_ids) for renumber_ide_files, or None if the IDs do not fit.
+    ide_files_list = get_ide_files(directory)
+    renumbered = {os.path.normcase(os.path.abspath(path)) for path in ide_files_list}
+
+    def is_renumbered(file_path, record):
+        return record.section in RENUMBERED_SECTIONS and os.path.normcase(os.path.abspath(file_path)) in renumbered
+
+    used_files = find_ide_files(reference_directory) if reference_directory else []
+    reference_files = {os.path.normcase(os.path.abspath(path)) for path in used_files}
+    used_files += [path for path in ide_files_list if os.path.normcase(os.path.abspath(path)) not in reference_files]
+    allocator = IDAllocator(collect_used_ids(used_files, is_renumbered), ceiling)
+    counts = {path: count_renumbered_entries(path) for path in ide_files_list}
+
+    if mode == "Batch":
+        start_id = allocator.allocate(sum(counts.values()), at_least)
+        return None if start_id is None else (start_id, None)
+
+    file_ids = {}
+    for path, count in counts.items():
+        file_ids[path] = allocator.allocate(count, at_least)
+        if file_ids[path] is None:
+            return None
+    return at_least, file_ids
+
+
+class IDRemap:
+    # Old ID -> new ID table of a renumber. An old ID that was duplicated in the IDEs
+    # and got more than one new ID is looked up by (old ID, model name) instead.
+    def __init__(self):
+        self.entries = []  # (old id, new id, model) in renumber order, unchanged IDs included
+        self.changed = 0
+        self.by_id = {}
+        self.by_model = {}  # (old id, lowercase model) -> new id, only for duplicated old IDs
+        self.duplicated_ids = set()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, old_id, new_id, model):
+        self.entries.append((old_id, new_id, model))
+        self.changed += old_id != new_id
+        self.by_model[(old_id, model.lower())] = new_id
+        if old_id in self.duplicated_ids:
+            return
+        if old_id in self.by_id and self.by_id[old_id] != new_id:
+            del self.by_id[old_id]
+            self.duplicated_ids.add(old_id)
+        else:
+            self.by_id[old_id] = new_id
+
+    def lookup(self, old_id, model):
+        new_id = self.by_id.get(old_id)
+        if new_id is None and old_id in self.duplicated_ids and model:
+            new_id = self.by_model.get((old_id, model.lower()))
+        return new_id
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            file.write("# old id, new id, model\n")
+            for old_id, new_id, model in self.entries:
+                file.write(f"{old_id}, {new_id}, {model}\n")
+
+
+def load_remap(path):
+    remap = IDRemap()
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            parts = [part.strip() for part in line.split(',')]
+            if len(parts) >= 3 and parts[0].isdigit() and parts[1].isdigit():
+                remap.add(int(parts[0]), int(parts[1]), parts[2])
+    return remap
+
+
+@profiled("renumber")
+def renumber_ide_files(ide_files, start_id, mode="Batch", file_ids=None, progress=None, journal=None, sources=None):
+    # Renumbers the objs/tobj entries of each file. In Batch mode the IDs continue
+    # across files from start_id, in Individual mode file_ids[file] gives each file's start.
+    # The files are committed together through `journal` (or a journal of their own).
+    # Returns ({file: entries renumbered}, [error messages], IDRemap of the changed IDs).
+    with batch_journal(journal, ide_files) as journal:
+        return renumber_into_journal(ide_files, start_id, mode, file_ids, progress, journal, sources)
+
+
+def renumber_into_journal(ide_files, start_id, mode, file_ids, progress, journal, sources):
+    renumbered = {}
+    errors = []
+    remap = IDRemap()
+    file_starts = {path_key(path): value for path, value in (file_ids or {}).items()}
+    for done, file_path in enumerate(ide_files, 1):
+        own_start = mode != "Batch" and path_key(file_path) in file_starts
+        file_start_id = file_starts[path_key(file_path)] if own_start else start_id
+        if file_start_id is None:
+            errors.append(f"{file_path}: no start ID given")
+            continue
+        try:
+            file_start_id = int(file_start_id)
+        except (TypeError, ValueError):
+            errors.append(f"{file_path}: invalid start ID {file_start_id!r}")
+            continue
+
+        count = 0
+        file_remap = []
+        try:
+            with open_text(file_path, sources) as source_file, open(journal.stage(file_path), 'w') as dst_file:
+                for line, record in iter_ide_lines(source_file):
+                    if record.kind == ENTRY and record.section in RENUMBERED_SECTIONS and record.id is not None:
+                        ide_line = line.split(',')
+                        ide_line[0] = str(file_start_id + count)
+                        ide_line.pop()
+                        dst_file.write(",".join(ide_line) + ", 0\n")
+                        file_remap.append((record.id, file_start_id + count, record.model or ""))
+                        count += 1
+                    else:
+                        dst_file.write(line)
+        except (OSError, UnicodeError) as e:
+            journal.discard(file_path)
+            errors.append(f"{file_path}: {e}")
+            continue
+
+        for entry in file_remap:
+            remap.add(*entry)
+
+        if not own_start:
+            start_id += count  # IDs continue across the files that start from start_id
+        renumbered[file_path] = count
+        profiler.count("renumber.files")
+        profiler.count("renumber.entries", count)
+        if progress:
+            progress(done, len(ide_files), file_path)
+    return renumbered, errors, remap
+
+
+def find_ipl_files(directory):
+    # IPL files of a folder and its subfolders, including "Separated IPLs"
+    return find_files(directory, ".ipl")
+
+
+@profiled("apply_remap")
+def apply_remap_to_ipl_files(ipl_files, remap, progress=None, journal=None):
+    # Rewrites the IDs of inst entries through a renumber's IDRemap, one dictionary
+    # lookup per line. Returns ({ipl file: lines rewritten}, [error messages]).
+    with batch_journal(journal, ipl_files) as journal:
+        return apply_remap_into_journal(ipl_files, remap, progress, journal)
+
+
+def apply_remap_into_journal(ipl_files, remap, progress, journal):
+    rewritten = {}
+    errors = []
+    for done, file_path in enumerate(ipl_files, 1):
+        count = 0
+        try:
+            with open(file_path, 'r') as ipl, open(journal.stage(file_path), 'w') as out:
+                for line, record in iter_ipl_lines(ipl):
+                    new_id = remap.lookup(record.id, record.model) if record.kind == ENTRY and record.section == "inst" else None
+                    if new_id is not None and new_id != record.id:
+                        ipl_line = line.split(',')
+                        ipl_line[0] = str(new_id)
+                        out.write(",".join(ipl_line))
+                        count += 1
+                    else:
+                        out.write(line)
+            if not count:
+                journal.discard(file_path)
+            rewritten[file_path] = count
+            profiler.count("apply_remap.files")
+            profiler.count("apply_remap.lines", count)
+        except (OSError, UnicodeError) as e:
+            journal.discard(file_path)
+            errors.append(f"{file_path}: {e}")
+        if progress:
+            progress(done, len(ipl_files), file_path)
+    return rewritten, errors
+
+
+# ----- IPL ID sorting -----
+
+class IPLIDSorter:
+    def __init__(self):
+        # model name -> (id, ide file, section), built once and used for every IPL line
+        self.ide_models = {}
+        # model name -> every (id, ide file, section) it was found with, only for models with conflicting IDs
+        self.ambiguous_models = {}
+
+    @profiled("sort_ids.ides")
+    def process_ide_files(self, func_ide_list, sources=None):
+        self.ide_models = {}
+        self.ambiguous_models = {}
+        all_entries = {}
+        for x in func_ide_list:
+            for record in file_records(x, sources=sources):
+                if record.section in RENUMBERED_SECTIONS and record.id is not None and record.model:
+                    entry = (record.id, x, record.section)
+                    if record.model not in all_entries:
+                        all_entries[record.model] = [entry]
+                        self.ide_models[record.model] = entry
+                    else:
+                        all_entries[record.model].append(entry)
+
+        for model_name, entries in all_entries.items():
+            if len({entry[0] for entry in entries}) > 1:
+                self.ambiguous_models[model_name] = entries
+                del self.ide_models[model_name]
+
+    @profiled("sort_ids")
+    def process_ipl_files(self, func_ipl_list, progress=None, journal=None):
+        # Returns {ipl file: number of lines whose ID was changed}. Nothing is
+        # written unless every file was processed.
+        rewritten = {}
+        with batch_journal(journal, func_ipl_list) as journal:
+            for done, y in enumerate(func_ipl_list, 1):
+                count = 0
+                with open(str(y),'r') as ipl, open(journal.stage(str(y)),'w') as out:
+                    for a, record in iter_ipl_lines(ipl):
+                        entry = self.ide_models.get(record.model) if record.kind == ENTRY and record.section == "inst" else None
+                        if entry and record.id != entry[0]:
+                            ipl_line = a.split(',')
+                            ipl_line[0] = str(entry[0])
+                            out.write(",".join(ipl_line))
+                            count += 1
+                        else:
+                            out.write(a) # Keep the line as is if model not in IDE, ambiguous or already correct
+
+                if not count:
+                    journal.discard(str(y))
+                rewritten[y] = count
+                profiler.count("sort_ids.lines", count)
+                if progress:
+                    progress(done, len(func_ipl_list), y)
+        return rewritten
+
+    def write_report(self, rewritten, directory):
+        report_path = os.path.join(directory, "ipl_id_sorting_report.txt")
+        with open(report_path, 'w', encoding="utf-8") as report:
+            report.write("=== Rewritten Lines Per IPL ===\n")
+            for ipl_file, count in rewritten.items():
+                report.write(f"{os.path.basename(ipl_file)}: {count}\n")
+            report.write(f"Total: {sum(rewritten.values())}\n")
+
+            report.write("\n=== Ambiguous Models (left untouched) ===\n")
+            if self.ambiguous_models:
+                for model_name in sorted(self.ambiguous_models):
+                    entries = self.ambiguous_models[model_name]
+                    info = [f"ID {ide_id} in {os.path.basename(ide_file)} ({section})" for ide_id, ide_file, section in entries]
+                    report.write(f"Model {model_name} is defined as: {' and '.join(info)}\n")
+            else:
+                report.write("No ambiguous models found.\n")
+        return report_path
+
+
+# ----- IPL LOD separation -----
+
+def is_lod_entry(record):
+    return record.kind == ENTRY and record.section == "inst" and record.model is not None and record.model.lower().startswith("lod")
+
+
+def lod_column(line):
+    # LOD index of an inst line (its last column), None when it is not a number
+    value = line.rstrip("\r\n").rpartition(",")[2].strip()
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def with_lod_column(line, lod):
+    # The inst line with its LOD index replaced, spacing and line ending kept
+    body = line.rstrip("\r\n")
+    head, separator, value = body.rpartition(",")
+    return head + separator + value[:len(value) - len(value.lstrip())] + str(lod) + line[len(body):]
+
+
+def lod_output_path(file_path, output_directory=None):
+    # Where the LOD entries of an IPL go, default "Separated IPLs" next to the file
+    directory = output_directory or os.path.join(os.path.dirname(file_path), "Separated IPLs")
+    return os.path.join(directory, os.path.basename(file_path))
+
+
+def separate_lods_into(file_path, lod_path, out_path, binary=False):
+    # Writes the LOD inst entries of an IPL to lod_path and the rest to out_path, as a
+    # binary IPL when `binary` is set. An entry is a LOD when another entry's LOD index
+    # points at it, or when its model name starts with "lod". Files that look separated
+    # already (relinked indices, or LODs only) raise ValueError. The LOD indices of both
+    # outputs are relinked to the rows the LODs get in the LOD file (-1 when they point
+    # outside the section). The file is streamed twice, only one LOD flag and row number
+    # per inst entry are kept in between. Module level so it can run in a worker process.
+    # Returns the number of LOD entries, nothing is written when it is 0.
+    if binary:
+        from binary_ipl import BinaryIPLWriter, INST_SECTION, CARS_SECTION
+
+    # First pass: which rows are LODs, and the size of a binary remainder
+    is_lod = bytearray()
+    own_lods = array("i")  # LOD index of every row, -1 for none
+    cars_count = 0
+    with open(file_path, "r") as file:
+        for line, record in iter_ipl_lines(file):
+            if record.kind == ENTRY and record.section == "inst":
+                is_lod.append(is_lod_entry(record))
+                lod = lod_column(line)
+                own_lods.append(lod if lod is not None and lod >= 0 else -1)
+            elif binary and record.kind == ENTRY:
+                if record.section != "cars":
+                    raise ValueError(f"{record.section} entries cannot be stored in a binary IPL (line {record.line_no})")
+                cars_count += 1
+    rows = len(is_lod)
+    for row, lod in enumerate(own_lods):
+        if 0 <= lod < rows:
+            if not is_lod[lod] and own_lods[lod] >= 0:
+                # A LOD with a LOD of its own: the indices are the relinked ones of an
+                # earlier run, separating again would move buildings out
+                raise ValueError(f"already separated (row {row} links to row {lod}, which has a LOD itself), skipped")
+            is_lod[lod] = 1
+    del own_lods
+    lod_count = sum(is_lod)
+    if not lod_count:
+        return 0
+    if lod_count == rows:
+        raise ValueError("holds only LOD entries, it looks like a separated LOD file, skipped")
+
+    # Old row -> row in the LOD file
+    new_rows = array("i", [-1]) * rows
+    lod_row = 0
+    for row, moved in enumerate(is_lod):
+        if moved:
+            new_rows[row] = lod_row
+            lod_row += 1
+
+    # Second pass: every line straight to its output, LOD indices relinked. A binary
+    # remainder is converted BINARY_CHUNK_ROWS entries at a time.
+    chunks = {INST_SECTION: [], CARS_SECTION: []} if binary else None
+    with open(file_path, "r") as file, open(lod_path, "w") as lod_file, \
+            open(out_path, "wb" if binary else "w") as out:
+        if binary:
+            writer = BinaryIPLWriter(out, rows - lod_count, cars_count)
+
+            def write(line, record):
+                if record.kind != ENTRY:
+                    return  # headers and comments have no place in a binary IPL
+                chunk = chunks[INST_SECTION if record.section == "inst" else CARS_SECTION]
+                chunk.append(line)
+                if len(chunk) >= BINARY_CHUNK_ROWS:
+                    flush()
+
+            def flush():
+                writer.write_text(chunks[INST_SECTION], chunks[CARS_SECTION], file_path)
+                chunks[INST_SECTION].clear()
+                chunks[CARS_SECTION].clear()
+        else:
+            def write(line, record):
+                out.write(line)
+        lod_file.write("inst\n")
+        row = 0
+        for line, record in iter_ipl_lines(file):
+            if record.kind == ENTRY and record.section == "inst":
+                lod = lod_column(line)
+                if lod is not None and lod != -1:
+                    relinked = new_rows[lod] if 0 <= lod < rows else -1
+                    if relinked != lod:
+                        line = with_lod_column(line, relinked)
+                row += 1
+                if is_lod[row - 1]:
+                    lod_file.write(line if line.endswith("\n") else line + "\n")
+                    continue
+            write(line, record)
+        lod_file.write("end\n")
+        if binary:
+            flush()
+            writer.finish()
+    return lod_count
+
+
+@profiled("separate_lods")
+def separate_lod_files(file_paths, output_directory=None, progress=None, journal=None, binary=False, workers=None):
+    # Separates the LODs of many IPLs on a pool of worker processes (`workers`, default
+    # one per core, 1 to stay in this process). Each output is staged in the journal up
+    # front and written by a worker, so the journal commits or rolls back the whole batch.
+    # Returns ({file: LOD entries moved}, [error messages])
+    separated = {}
+    errors = []
+    jobs = []  # (file, staged LOD output, staged remainder, LOD output)
+    lod_outputs = {}
+    completed = set()
+    with batch_journal(journal, file_paths) as journal:
+        for file_path in dict.fromkeys(file_paths):
+            lod_path = lod_output_path(file_path, output_directory)
+            if os.path.abspath(lod_path) in lod_outputs:
+                errors.append(f"{file_path}: its LOD file {lod_path} is also written for {lod_outputs[os.path.abspath(lod_path)]}")
+                continue
+            if os.path.exists(lod_path):
+                # Separated before, a second run would treat the remaining buildings as LODs
+                errors.append(f"{file_path}: already separated, {lod_path} exists (delete it to separate again)")
+                continue
+            try:
+                os.stat(file_path)
+            except OSError as e:
+                errors.append(f"{file_path}: {e}")
+                continue
+            lod_outputs[os.path.abspath(lod_path)] = file_path
+            jobs.append((file_path, journal.stage(lod_path), journal.stage(file_path), lod_path))
+
+        def finished(job, count=0, error=None):
+            file_path, _, _, lod_path = job
+            completed.add(file_path)
+            if error is not None:
+                errors.append(f"{file_path}: {error}")
+            else:
+                separated[file_path] = count
+                profiler.count("separate_lods.entries", count)
+            if error is not None or not count:
+                journal.discard(file_path)
+                journal.discard(lod_path)
+            if progress:
+                progress(len(separated) + len(errors), len(file_paths), file_path)
+
+        pending = list(jobs)
+        if len(pending) >= PARALLEL_MIN_FILES and workers != 1:
+            try:
+                with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                    futures = {pool.submit(separate_lods_into, job[0], job[1], job[2], binary): job for job in pending}
+                    try:
+                        for future in as_completed(futures):
+                            try:
+                                finished(futures[future], future.result())
+                            except (OSError, ValueError) as e:
+                                finished(futures[future], error=e)
+                    except BaseException:
+                        for future in futures:
+                            future.cancel()  # e.g. Cancelled from the progress callback
+                        raise
+                pending = []
+            except (BrokenProcessPool, OSError) as e:
+                print(f"Parallel LOD separation unavailable, using one core: {e}")
+                pending = [job for job in pending if job[0] not in completed]
+
+        for job in pending:
+            try:
+                finished(job, separate_lods_into(job[0], job[1], job[2], binary))
+            except (OSError, ValueError) as e:
+                finished(job, error=e)
+    return separated, errors
+
+
+# ----- Find and replace -----
+
+@profiled("replace")
+def replace_in_files(file_paths, rule, progress=None, journal=None):
+    # Applies a batch_replace.ReplaceRule to each file, only changed files are written.
+    # Returns ({file: replacements}, [error messages])
+    replaced = {}
+    errors = []
+    with batch_journal(journal, file_paths) as journal:
+        for done, file_path in enumerate(file_paths, 1):
+            try:
+                with open(file_path, "r", encoding="utf-8", errors="ignore", newline="") as file:
+                    text = file.read()
+                new_text, count = rule.apply(text)
+                if count:
+                    with open(journal.stage(file_path), "w", encoding="utf-8", newline="") as out:
+                        out.write(new_text)
+                replaced[file_path] = count
+            except OSError as e:
+                journal.discard(file_path)
+                errors.append(f"{file_path}: {e}")
+            if progress:
+                progress(done, len(file_paths), file_path)
+    return replaced, errors
+
+
+# ----- Binary IPLs -----
+
+@profiled("model_names")
+def model_names(ide_files, cache=None):
+    # model ID -> model name of the IDE definitions, to name the entries of binary IPLs
+    names = {}
+    for ide_file in ide_files:
+        for record in file_records(ide_file, cache):
+            if record.id is not None and record.model and record.section in ID_SECTIONS:
+                names.setdefault(record.id, record.model)
+    return names
+
+
+def convert_ipl(file_path, journal, to_binary=True, output_directory=None, models=None):
+    # Stages the text (or binary) IPL as binary (or text), in place unless
+    # output_directory is given. Files already in the target format are skipped.
+    # Returns the number of inst entries converted, or None when skipped.
+    output_path = os.path.join(output_directory, os.path.basename(file_path)) if output_directory else file_path
+    if is_binary_ipl(file_path) == to_binary:
+        return None
+    from binary_ipl import text_sections_to_arrays, binary_ipl_bytes, read_binary_ipl, arrays_to_text_lines
+    if to_binary:
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as file:
+            inst, cars = text_sections_to_arrays(file, file_path)
+        with open(journal.stage(output_path), "wb") as out:
+            out.write(binary_ipl_bytes(inst, cars))
+    else:
+        inst, cars = read_binary_ipl(file_path)
+        with open(journal.stage(output_path), "w", encoding="utf-8") as out:
+            out.writelines(arrays_to_text_lines(inst, cars, models))
+    return len(inst)
+
+
+@profiled("convert")
+def convert_ipl_files(file_paths, to_binary=True, output_directory=None, models=None, progress=None, journal=None):
+    # Returns ({file: inst entries converted, None if already converted}, [error messages])
+    converted = {}
+    errors = []
+    with batch_journal(journal, file_paths) as journal:
+        for done, file_path in enumerate(file_paths, 1):
+            try:
+                converted[file_path] = convert_ipl(file_path, journal, to_binary, output_directory, models)
+                profiler.count("convert.entries", converted[file_path] or 0)
+            except (OSError, ValueError) as e:
+                journal.discard(os.path.join(output_directory, os.path.basename(file_path)) if output_directory else file_path)
+                errors.append(f"{file_path}: {e}")
+            if progress:
+                progress(done, len(file_paths), file_path)
+    return converted, errors
+
+
+# ----- Map region transforms -----
+
+def transform_ipl(file_path, journal, minimum=None, maximum=None, rotate=None, pivot=(0, 0, 0), translate=None, interior=None):
+    # Rotates (around pivot), then moves and/or changes the interior of the inst
+    # entries inside the minimum..maximum box (every entry without a box).
+    # Returns the number of entries changed, nothing is staged when it is 0.
+    from ipl_store import InstStore
+    store = InstStore.load(file_path)
+    rows = store.in_bbox(minimum or (None, None, None), maximum or (None, None, None))
+    if not rows.any():
+        return 0
+    if rotate:
+        store.rotate(rotate, pivot, rows=rows)
+    if translate:
+        store.translate(translate, rows=rows)
+    if interior is not None:
+        store.set_interior(interior, rows=rows)
+    if not store.changed.any():
+        return 0
+    with open(journal.stage(file_path), "w", encoding="utf-8", newline="") as out:
+        out.writelines(store.text_lines())
+    return int(store.changed.sum())
+
+
+@profiled("transform")
+def transform_ipl_files(file_paths, minimum=None, maximum=None, rotate=None, pivot=(0, 0, 0), translate=None, interior=None, progress=None, journal=None):
+    # Returns ({file: inst entries changed}, [error messages])
+    transformed = {}
+    errors = []
+    with batch_journal(journal, file_paths) as journal:
+        for done, file_path in enumerate(file_paths, 1):
+            try:
+                transformed[file_path] = transform_ipl(file_path, journal, minimum, maximum, rotate, pivot, translate, interior)
+                profiler.count("transform.entries", transformed[file_path])
+            except (OSError, ValueError) as e:
+                journal.discard(file_path)
+                errors.append(f"{file_path}: {e}")
+            if progress:
+                progress(done, len(file_paths), file_path)
+    return transformed, errors
+
+
+# ----- Reports -----
+
+def extract_ids_from_ide(file_path, cache=None):
+    ids = set()
+    total_entries = 0
+    for record in file_records(file_path, cache):
+        if record.id is not None and record.section in ID_SECTIONS:
+            ids.add(record.id)
+            total_entries += 1
+    return ids, total_entries
+
+
+def describe_ide_file(file_path, ids, total_entries):
+    file_name = os.path.basename(file_path)
+    min_id, max_id = (min(ids), max(ids)) if ids else ("N/A", "N/A")
+
+    if "vehicle" in file_name.lower():
+        description = "Defines all vehicles in the game."
+    elif "map" in file_name.lower() or "objects" in file_name.lower():
+        description = "Defines world objects and buildings."
+    elif "ped" in file_name.lower():
+        description = "Defines pedestrian models and behavior."
+    else:
+        description = "General game objects and assets."
+
+    return f"File: {file_name}\nDescription: {description}\nID Range: {min_id} - {max_id}\nTotal Entries: {total_entries}\n{'-'*40}\n"
+
+
+@profiled("unused_ids")
+def write_unused_ids_report(ide_files, output_path, ceiling=DEFAULT_ID_CEILING, cache=None, progress=None):
+    # Description of each IDE and the unused IDs from 0 to ceiling.
+    # Returns (free ID ranges, [error messages]).
+    used_ids = set()
+    ide_details = []
+    errors = []
+    for done, ide_file in enumerate(ide_files, 1):
+        try:
+            ids, total_entries = extract_ids_from_ide(ide_file, cache)
+        except (OSError, UnicodeError) as e:
+            errors.append(f"{ide_file}: {e}")
+            ids, total_entries = set(), 0
+        used_ids.update(ids)
+        profiler.count("unused_ids.entries", total_entries)
+        ide_details.append(describe_ide_file(ide_file, ids, total_entries))
+        if progress:
+            progress(done, len(ide_files), ide_file)
+
+    free_ranges = IDAllocator(used_ids, ceiling).free_ranges()
+    with open(output_path, "w", encoding="utf-8") as output_file:
+        output_file.write("\n".join(ide_details))
+        output_file.write(f"\nUnused IDs from 0 to {ceiling}:\n")
+        output_file.write(format_ranges(free_ranges) + "\n")
+    return free_ranges, errors
+
+
+@profiled("duplicates")
+def write_duplicate_ids_report(ide_files, output_path, cache=None, progress=None, sources=None):
+    # Returns (id duplicates, model duplicates, [error messages]).
+    # `sources` (path -> text) reports unsaved editor text instead of the file.
+    id_dict = {}  # Format: {id_number: [(ide_file, model_name), ...]}
+    model_dict = {}  # Format: {model_name_lower: [(ide_file, original_model_name), ...]}
+    id_duplicates = []
+    model_duplicates = []
+    errors = []
+
+    # First pass: collect all IDs and model names
+    for done, ide_file in enumerate(ide_files, 1):
+        if ide_file.lower().endswith(".ide") and os.path.exists(ide_file):
+            try:
+                for record in file_records(ide_file, cache, sources):
+                    if record.section not in ID_SECTIONS or record.id is None:
+                        continue
+
+                    id_number = str(record.id)
+                    model_name = record.model
+
+                    # Store the section type with the data for better reporting
+                    if id_number not in id_dict:
+                        id_dict[id_number] = []
+                    id_dict[id_number].append((ide_file, model_name, record.section))
+
+                    # Store model name occurrences (case-insensitive)
+                    if model_name:
+                        model_name_lower = model_name.lower()
+                        if model_name_lower not in model_dict:
+                            model_dict[model_name_lower] = []
+                        model_dict[model_name_lower].append((ide_file, model_name, record.section))
+
+            except (OSError, UnicodeError) as e:
+                errors.append(f"{ide_file}: {e}")
+        if progress:
+            progress(done, len(ide_files), ide_file)
+
+    # Second pass: identify duplicates
+    for id_number, occurrences in id_dict.items():
+        if len(occurrences) > 1:
+            files_info = [f"{os.path.basename(file)} ({section})" for file, _, section in occurrences]
+            duplicate_entry = f"ID {id_number} is used by: {' and '.join(files_info)}"
+            id_duplicates.append(duplicate_entry)
+
+    for model_name_lower, occurrences in model_dict.items():
+        if len(occurrences) > 1:
+            # Filter out duplicates from the same file
+            unique_files = {(os.path.basename(file), section) for file, _, section in occurrences}
+            if len(unique_files) > 1:
+                files_info = [f"{file} ({section})" for file, section in unique_files]
+                model_name = occurrences[0][1]  # Use the first occurrence's original model name
+                duplicate_entry = f"Model {model_name} is used by: {' and '.join(sorted(files_info))}"
+                model_duplicates.append(duplicate_entry)
+
+    # Write results to file
+    with open(output_path, "w", encoding="utf-8") as output_file:
+        output_file.write("=== Duplicate IDs ===\n")
+        if id_duplicates:
+            output_file.write("\n".join(sorted(id_duplicates)) + "\n")
+        else:
+            output_file.write("No duplicate IDs found.\n")
+
+        output_file.write("\n=== Duplicate Model Names ===\n")
+        if model_duplicates:
+            output_file.write("\n".join(sorted(model_duplicates)) + "\n")
+        else:
+            output_file.write("No duplicate model names found.\n")
+    return id_duplicates, model_duplicates, errors
+
+
+# ----- IPL / IDE cross-reference -----
+
+class PlacementCheck:
+    # Every IDE definition is hashed once, (id, model) pairs for the common case of a
+    # placement that matches its definition, and id -> model / model -> id for
+    # explaining the ones that do not. The IPLs are then streamed against the tables.
+    def __init__(self):
+        self.pairs = set()  # (id, lowercase model) of every definition
+        self.id_models = {}  # id -> (model, ide file, section) of its first definition
+        self.model_ids = {}  # lowercase model -> (id, ide file, section) of its first definition
+        self.used_ids = set()  # IDs placed by at least one inst entry
+        self.missing = []  # (ipl file, line, id, model)
+        self.mismatches = []  # (ipl file, line, id, model, what the ID defines, what the model is defined as)
+        self.definitions = 0
+        self.placements = 0
+        self.ide_files = 0
+        self.ipl_files = 0
+
+    def add_ide_files(self, ide_files, cache=None, sources=None, errors=None):
+        # Returns the error messages of unreadable IDEs, added to `errors` when given
+        if errors is None:
+            errors = []
+        for ide_file in ide_files:
+            try:
+                # parse_ide reads lazily, so the records are walked inside the try
+                for record in file_records(ide_file, cache, sources):
+                    if record.section in ID_SECTIONS and record.id is not None and record.model:
+                        definition = (record.model, ide_file, record.section)
+                        model = record.model.lower()
+                        self.pairs.add((record.id, model))
+                        self.id_models.setdefault(record.id, definition)
+                        self.model_ids.setdefault(model, (record.id, ide_file, record.section))
+                        self.definitions += 1
+            except (OSError, UnicodeError) as e:
+                errors.append(f"{ide_file}: {e}")
+                continue
+            self.ide_files += 1
+        return errors
+
+    def check_ipl_file(self, ipl_file):
+        self.ipl_files += 1
+        if is_binary_ipl(ipl_file):
+            # Binary entries have no model names, only their IDs can be checked
+            from binary_ipl import read_binary_ipl
+            inst, _ = read_binary_ipl(ipl_file)
+            for row, model_id in enumerate(inst["id"].tolist()):
+                self.placements += 1
+                self.used_ids.add(model_id)
+                if model_id not in self.id_models:
+                    self.missing.append((ipl_file, row, model_id, None))
+            return
+
+        pairs = self.pairs
+        for record in parse_ipl(ipl_file):
+            if record.section != "inst" or record.id is None:
+                continue
+            self.placements += 1
+            self.used_ids.add(record.id)
+            model = (record.model or "").lower()
+            if (record.id, model) in pairs:
+                continue
+            defined_as = self.id_models.get(record.id)
+            model_id = self.model_ids.get(model)
+            if defined_as is None and model_id is None:
+                self.missing.append((ipl_file, record.line_no, record.id, record.model))
+            else:
+                self.mismatches.append((ipl_file, record.line_no, record.id, record.model, defined_as, model_id))
+
+    def unused_definitions(self):
+        # (ide file, id, model, section) of placeable models that no IPL places, by file and ID
+        unused = {}
+        for model_id, (model, ide_file, section) in self.id_models.items():
+            if section in PLACED_SECTIONS and model_id not in self.used_ids:
+                unused[(ide_file, model_id)] = (ide_file, model_id, model, section)
+        return [unused[key] for key in sorted(unused)]
+
+
+@profiled("validate")
+def validate_placements(ide_files, ipl_files, cache=None, progress=None, sources=None):
+    # Checks every IPL inst entry against the IDE definitions.
+    # Returns (PlacementCheck, [error messages]).
+    check = PlacementCheck()
+    errors = []
+    with profiler.phase("validate.ides"):
+        check.add_ide_files(ide_files, cache, sources, errors)
+    for done, ipl_file in enumerate(ipl_files, 1):
+        try:
+            with profiler.phase("validate.ipl"):
+                check.check_ipl_file(ipl_file)
+        except (OSError, UnicodeError, ValueError) as e:
+            errors.append(f"{ipl_file}: {e}")
+        if progress:
+            progress(done, len(ipl_files), ipl_file)
+    profiler.count("validate.placements", check.placements)
+    return check, errors
+
+
+def describe_mismatch(model_id, model, defined_as, model_definition):
+    # "ID 1234 defines foo (a.ide, objs), bar is ID 1250 (b.ide, objs)"
+    if defined_as is None:
+        id_text = f"ID {model_id} is not defined"
+    else:
+        id_text = f"ID {model_id} defines {defined_as[0]} ({os.path.basename(defined_as[1])}, {defined_as[2]})"
+    if model_definition is None:
+        return f"{id_text}, {model} is not defined"
+    return f"{id_text}, {model} is ID {model_definition[0]} ({os.path.basename(model_definition[1])}, {model_definition[2]})"
+
+
+def write_validation_report(check, output_path, json_path=None):
+    # Readable report, and the same findings as JSON when json_path is given.
+    # Returns the unused definitions.
+    unused = check.unused_definitions()
+    with open(output_path, "w", encoding="utf-8") as output_file:
+        output_file.write("=== IPL / IDE Cross-Reference ===\n")
+        output_file.write(f"{check.definitions} IDE definitions in {check.ide_files} files, {check.placements} placements in {check.ipl_files} IPL files\n")
+        output_file.write(f"Missing models: {len(check.missing)}, ID/name mismatches: {len(check.mismatches)}, unused IDE definitions: {len(unused)}\n")
+
+        output_file.write("\n=== Missing Models (no IDE defines the ID or the model name) ===\n")
+        for ipl_file, line, model_id, model in check.missing:
+            where = f"row {line}" if model is None else f"line {line}"
+            output_file.write(f"{ipl_file} {where}: ID {model_id} {model or '(binary IPL)'}\n")
+        if not check.missing:
+            output_file.write("None.\n")
+
+        output_file.write("\n=== ID / Name Mismatches ===\n")
+        for ipl_file, line, model_id, model, defined_as, model_id_definition in check.mismatches:
+            output_file.write(f"{ipl_file} line {line}: {describe_mismatch(model_id, model, defined_as, model_id_definition)}\n")
+        if not check.mismatches:
+            output_file.write("None.\n")
+
+        output_file.write("\n=== Unused IDE Definitions (objs/tobj/anim models no IPL places) ===\n")
+        for ide_file, model_id, model, section in unused:
+            output_file.write(f"{ide_file}: ID {model_id} {model} ({section})\n")
+        if not unused:
+            output_file.write("None.\n")
+
+    if json_path:
+        definition = lambda found: None if found is None else {"value": found[0], "ide": found[1], "section": found[2]}
+        report = {
+            "summary": {"ide_files": check.ide_files, "definitions": check.definitions, "ipl_files": check.ipl_files,
+                        "placements": check.placements, "missing_models": len(check.missing),
+                        "mismatches": len(check.mismatches), "unused_definitions": len(unused)},
+            # Binary IPL entries have a null model and give their row instead of a line
+            "missing_models": [{"ipl": ipl_file, "line": line, "id": model_id, "model": model}
+                               for ipl_file, line, model_id, model in check.missing],
+            "mismatches": [{"ipl": ipl_file, "line": line, "id": model_id, "model": model,
+                            "id_defines": definition(defined_as), "model_defined_as": definition(model_id_definition)}
+                           for ipl_file, line, model_id, model, defined_as, model_id_definition in check.mismatches],
+            "unused_definitions": [{"ide": ide_file, "id": model_id, "model": model, "section": section}
+                                   for ide_file, model_id, model, section in unused],
+        }
+        with open(json_path, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=1)
+    return unused
+
+
+# ----- Self checks -----
+# Quick end to end checks of behaviour that broke before, run with
+# `python batch_tools.py self-check`. Each takes an empty scratch folder and raises
+# AssertionError when something is wrong.
+
+def check_journal_scan(directory):
+    # Two committed batches in a row must not make their backups show up in the scans
+    data = os.path.join(directory, "data")
+    os.makedirs(os.path.join(data, "maps"))
+    ide_file = os.path.join(data, "maps", "a.ide")
+    ipl_file = os.path.join(data, "maps", "a.ipl")
+    with open(ide_file, "w") as file:
+        file.write("objs\n1000, vgn_a, vgn_tex, 100, 0\nend\n")
+    with open(ipl_file, "w") as file:
+        file.write("inst\n1000, vgn_a, 0, 0, 0, 0, 0, 0, 0, 1, -1\nend\n")
+    for find, replace in (("vgn_", "lvn_"), ("lvn_", "sfn_")):
+        with WriteJournal(journal_root([ide_file, ipl_file])) as journal:
+            replace_in_files([ide_file], ReplaceRule(find, replace), journal=journal)
+            replace_in_files([ipl_file], ReplaceRule(find, replace), journal=journal)
+    assert len(list_journals(os.path.join(data, "maps"))) == 2, "the two batches were not journaled"
+
+    from parse_cache import ParseCache
+    assert find_ide_files(data) == [ide_file], f"find_ide_files found {find_ide_files(data)}"
+    assert find_ipl_files(data) == [ipl_file], f"find_ipl_files found {find_ipl_files(data)}"
+    assert collect_ide_files([data]) == [ide_file], f"collect_ide_files found {collect_ide_files([data])}"
+    assert ParseCache(os.path.join(directory, "cache.pickle")).walk(data) == [ide_file], "ParseCache.walk found the backups"
+
+
+def check_separate_twice(directory):
+    # Separating a file that was separated already must refuse and change nothing,
+    # with or without its LOD file still next to it
+    ipl_file = os.path.join(directory, "a.ipl")
+    with open(ipl_file, "w") as file:
+        file.write("inst\n"
+                   "1000, bldg_a, 0, 0, 0, 0, 0, 0, 0, 1, 3\n"
+                   "1001, bldg_b, 0, 10, 0, 0, 0, 0, 0, 1, 4\n"
+                   "1002, bldg_c, 0, 20, 0, 0, 0, 0, 0, 1, -1\n"
+                   "1003, lodbldg_a, 0, 0, 0, 0, 0, 0, 0, 1, -1\n"
+                   "1004, farbldg_b, 0, 10, 0, 0, 0, 0, 0, 1, -1\n"
+                   "end\n")
+    separated, errors = separate_lod_files([ipl_file], workers=1)
+    assert separated == {ipl_file: 2} and not errors, f"first run moved {separated}, errors {errors}"
+    lod_file = lod_output_path(ipl_file)
+    with open(ipl_file) as file:
+        remainder = file.read()
+
+    separated, errors = separate_lod_files([ipl_file], workers=1)
+    assert not separated and len(errors) == 1, f"second run with the LOD file moved {separated}, errors {errors}"
+    os.remove(lod_file)
+    separated, errors = separate_lod_files([ipl_file], workers=1)
+    assert not separated and len(errors) == 1, f"second run without the LOD file moved {separated}, errors {errors}"
+    with open(ipl_file) as file:
+        assert file.read() == remainder, "the separated file was rewritten"
+
+
+SELF_CHECKS = [check_journal_scan, check_separate_twice]
+
+
+# ----- Command line -----
+
+def print_progress(done, total, path):
+    print(f"[{done}/{total}] {path}", file=sys.stderr)
+
+
+def report_errors(errors):
+    for error in errors:
+        print(f"Error: {error}", file=sys.stderr)
+    return EXIT_FILE_ERRORS if errors else EXIT_OK
+
+
+def collect_ide_files(paths):
+    # IDE files from a mix of files and folders (folders are scanned recursively)
+    files = []
+    for path in paths:
+        files.extend(find_ide_files(path) if os.path.isdir(path) else [path])
+    return files
+
+
+def collect_ipl_files(paths):
+    files = []
+    for path in paths:
+        files.extend(sorted(get_files_with_extension(path, "ipl")) if os.path.isdir(path) else [path])
+    return files
+
+
+def run_renumber(args, progress):
+    mode = "Individual" if args.file_ids else "Batch"
+    file_ids = None
+    if args.file_ids:
+        file_ids = {}
+        for item in args.file_ids:
+            name, _, value = item.rpartition("=")
+            file_ids[path_key(os.path.join(args.directory, name))] = value
+
+    start_id = args.start
+    if args.auto:
+        picked = auto_start_ids(args.directory, "Individual" if args.per_file else mode, args.start or 0, args.ceiling, args.reference)
+        if picked is None:
+            print(f"Error: not enough contiguous free IDs between {args.start or 0} and {args.ceiling}", file=sys.stderr)
+            return EXIT_FINDINGS
+        start_id, file_ids = picked
+        mode = "Individual" if file_ids else "Batch"
+    elif start_id is None and not file_ids:
+        print("Error: give --start, --file-id or --auto", file=sys.stderr)
+        return EXIT_USAGE
+
+    ide_files_list = get_ide_files(args.directory)
+    if not ide_files_list:
+        print(f"Error: no IDE files found in {args.directory}", file=sys.stderr)
+        return EXIT_USAGE
+    if args.file_ids and not args.auto:
+        # A typo or a file left out must not fall back to renumbering from 0
+        found = {path_key(path) for path in ide_files_list}
+        unknown = [item for item in args.file_ids if path_key(os.path.join(args.directory, item.rpartition("=")[0])) not in found]
+        if unknown:
+            print(f"Error: --file-id names no IDE file in {args.directory}: {', '.join(unknown)}", file=sys.stderr)
+            return EXIT_USAGE
+        missing = [os.path.basename(path) for path in ide_files_list if path_key(path) not in file_ids]
+        if missing and start_id is None:
+            print(f"Error: no --file-id for {', '.join(missing)}, give them one or --start for the rest", file=sys.stderr)
+            return EXIT_USAGE
+
+    # The IDEs and IPLs are committed together, a failure leaves both untouched
+    ipl_files_list = find_ipl_files(args.ipl) if args.ipl else []
+    with make_journal(args, ide_files_list + ipl_files_list) as journal:
+        renumbered, errors, remap = renumber_ide_files(ide_files_list, start_id, mode, file_ids, progress, journal)
+        if args.ipl:
+            rewritten, ipl_errors = apply_remap_to_ipl_files(ipl_files_list, remap, progress, journal)
+            errors += ipl_errors
+
+    print(f"Renumbered {sum(renumbered.values())} entries in {len(renumbered)} IDE files, {remap.changed} IDs changed")
+    if args.ipl:
+        print(f"Rewrote {sum(rewritten.values())} inst lines in {sum(1 for count in rewritten.values() if count)} of {len(rewritten)} IPL files")
+    if args.remap:
+        remap.save(args.remap)
+        print(f"ID remap table saved to {args.remap}")
+    return report_errors(errors)
+
+
+def run_apply_remap(args, progress):
+    remap = load_remap(args.remap)
+    ipl_files = []
+    for path in args.paths:
+        ipl_files.extend(find_ipl_files(path) if os.path.isdir(path) else [path])
+    with make_journal(args, ipl_files) as journal:
+        rewritten, errors = apply_remap_to_ipl_files(ipl_files, remap, progress, journal)
+    print(f"Rewrote {sum(rewritten.values())} inst lines in {sum(1 for count in rewritten.values() if count)} of {len(rewritten)} IPL files")
+    return report_errors(errors)
+
+
+def run_sort_ipl_ids(args, progress):
+    sorter = IPLIDSorter()
+    ide_files_list = get_files_with_extension(args.ide, "ide")
+    ipl_files_list = get_files_with_extension(args.ipl, "ipl")
+    if not ide_files_list or not ipl_files_list:
+        print("Error: the IDE and IPL folders must both contain files", file=sys.stderr)
+        return EXIT_USAGE
+
+    sorter.process_ide_files(ide_files_list)
+    with make_journal(args, ipl_files_list) as journal:
+        rewritten = sorter.process_ipl_files(ipl_files_list, progress, journal)
+    report_path = sorter.write_report(rewritten, args.report or args.ipl)
+    print(f"Rewrote {sum(rewritten.values())} lines in {sum(1 for count in rewritten.values() if count)} of {len(rewritten)} IPL files, report saved to {report_path}")
+    if sorter.ambiguous_models:
+        print(f"{len(sorter.ambiguous_models)} models are defined with different IDs and were left untouched")
+        if args.strict:
+            return EXIT_FINDINGS
+    return EXIT_OK
+
+
+def run_separate_lods(args, progress):
+    ipl_files = collect_ipl_files(args.paths)
+    with make_journal(args, ipl_files) as journal:
+        separated, errors = separate_lod_files(ipl_files, args.output, progress, journal, args.binary, args.workers)
+    print(f"Moved {sum(separated.values())} LOD entries out of {sum(1 for count in separated.values() if count)} of {len(separated)} IPL files")
+    return report_errors(errors)
+
+
+def run_convert(args, progress):
+    ipl_files = collect_ipl_files(args.paths)
+    models = model_names(collect_ide_files(args.ide)) if args.ide else None
+    with make_journal(args, ipl_files) as journal:
+        converted, errors = convert_ipl_files(ipl_files, args.to == "binary", args.output, models, progress, journal)
+    done = [count for count in converted.values() if count is not None]
+    print(f"Converted {len(done)} IPL files to {args.to} ({sum(done)} inst entries), {len(converted) - len(done)} were already {args.to}")
+    return report_errors(errors)
+
+
+def run_transform(args, progress):
+    if not (args.rotate or args.translate or args.interior is not None):
+        print("Error: nothing to do, give --rotate, --translate and/or --interior", file=sys.stderr)
+        return EXIT_USAGE
+    ipl_files = collect_ipl_files(args.paths)
+    with make_journal(args, ipl_files) as journal:
+        transformed, errors = transform_ipl_files(ipl_files, args.min, args.max, args.rotate, args.pivot, args.translate, args.interior, progress, journal)
+    print(f"Changed {sum(transformed.values())} inst entries in {sum(1 for count in transformed.values() if count)} of {len(transformed)} IPL files")
+    return report_errors(errors)
+
+
+@profiled("spatial_index")
+def build_spatial_index(args):
+    ipl_files = []
+    for path in args.paths:
+        ipl_files.extend(find_ipl_files(path) if os.path.isdir(path) else [path])
+    from spatial_index import SpatialIndex
+    models = model_names(collect_ide_files(args.ide)) if args.ide else None
+    index = SpatialIndex.from_files(ipl_files, models)
+    if not args.quiet:
+        print(f"Indexed {len(index)} inst entries of {len(ipl_files)} IPL files")
+    return index
+
+
+def run_region(args, progress):
+    if (args.center is None) == (args.min is None and args.max is None):
+        print("Error: give either --center and --radius or --min/--max", file=sys.stderr)
+        return EXIT_USAGE
+    index = build_spatial_index(args)
+    if args.center is not None:
+        entries = index.in_radius(args.center, args.radius)
+    else:
+        entries = index.in_bbox(args.min or (None, None, None), args.max or (None, None, None))
+    entries = entries.tolist()
+    if args.model:
+        wanted = {entry for name in args.model for entry in index.with_model(name).tolist()}
+        entries = [entry for entry in entries if entry in wanted]
+    if args.output:
+        with make_journal(args, [args.output]) as journal:
+            with open(journal.stage(args.output), "w", encoding="utf-8") as out:
+                out.writelines(index.export_lines(entries))
+        print(f"Exported {len(entries)} inst entries to {args.output}")
+    else:
+        for entry in entries:
+            print(index.describe(entry))
+        print(f"{len(entries)} inst entries found")
+    return report_errors(index.errors)
+
+
+def run_nearest(args, progress):
+    index = build_spatial_index(args)
+    for entry in index.nearest(args.at, args.model, args.count).tolist():
+        print(f"{index.describe(entry)} at {float(((index.position[entry] - args.at) ** 2).sum() ** 0.5):.2f}")
+    return report_errors(index.errors)
+
+
+def run_replace(args, progress):
+    try:
+        rule = ReplaceRule(args.find, args.replace, args.column, args.regex, args.match_case, args.whole_field, args.where, args.section)
+    except (ValueError, re.error) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    ide_files = collect_ide_files(args.paths)
+    with make_journal(args, ide_files) as journal:
+        replaced, errors = replace_in_files(ide_files, rule, progress, journal)
+    print(f"Replaced {sum(replaced.values())} matches in {sum(1 for count in replaced.values() if count)} of {len(replaced)} IDE files")
+    return report_errors(errors)
+
+
+def run_unused_ids(args, progress):
+    cache = make_cache(args)
+    free_ranges, errors = write_unused_ids_report(collect_ide_files(args.paths), args.output, args.ceiling, cache, progress)
+    if cache:
+        cache.save()
+    print(f"{sum(last - first + 1 for first, last in free_ranges)} unused IDs up to {args.ceiling}, report saved to {args.output}")
+    return report_errors(errors)
+
+
+def run_duplicates(args, progress):
+    cache = make_cache(args)
+    id_duplicates, model_duplicates, errors = write_duplicate_ids_report(collect_ide_files(args.paths), args.output, cache, progress)
+    if cache:
+        cache.save()
+    print(f"{len(id_duplicates)} duplicate IDs and {len(model_duplicates)} duplicate model names, report saved to {args.output}")
+    status = report_errors(errors)
+    if status == EXIT_OK and args.strict and (id_duplicates or model_duplicates):
+        return EXIT_FINDINGS
+    return status
+
+
+def run_validate(args, progress):
+    cache = make_cache(args)
+    ipl_files = []
+    for path in args.ipl:
+        ipl_files.extend(find_ipl_files(path) if os.path.isdir(path) else [path])
+    check, errors = validate_placements(collect_ide_files(args.ide), ipl_files, cache, progress)
+    if cache:
+        cache.save()
+    unused = write_validation_report(check, args.output, args.json)
+    print(f"Checked {check.placements} placements in {check.ipl_files} IPL files against {check.definitions} IDE definitions: "
+          f"{len(check.missing)} missing models, {len(check.mismatches)} ID/name mismatches, {len(unused)} unused definitions, "
+          f"report saved to {args.output}" + (f" and {args.json}" if args.json else ""))
+    status = report_errors(errors)
+    if status == EXIT_OK and args.strict and (check.missing or check.mismatches):
+        return EXIT_FINDINGS
+    return status
+
+
+def run_recover(args, progress):
+    recovered = recover(args.folder)
+    for directory in recovered:
+        print(f"Rolled back interrupted batch {directory}")
+    if not recovered:
+        print("No interrupted batches found")
+    return EXIT_OK
+
+
+def run_restore(args, progress):
+    restored = restore(args.journal)
+    print(f"Restored {len(restored)} files from {args.journal}")
+    return EXIT_OK
+
+
+def run_journals(args, progress):
+    for directory, manifest in list_journals(args.folder):
+        print(f"{directory}  {manifest.get('created')}  {manifest.get('state')}  {len(manifest.get('files', []))} files")
+    return EXIT_OK
+
+
+def run_prune(args, progress):
+    removed = prune(args.folder, args.keep)
+    for directory in removed:
+        print(f"Removed batch {directory}")
+    print(f"Removed {len(removed)} batches, kept the newest {args.keep}")
+    return EXIT_OK
+
+
+def run_self_check(args, progress):
+    import tempfile
+    failed = 0
+    for check in SELF_CHECKS:
+        with tempfile.TemporaryDirectory() as directory:
+            try:
+                check(directory)
+                print(f"OK      {check.__name__}")
+            except AssertionError as e:
+                failed += 1
+                print(f"FAILED  {check.__name__}: {e}")
+    return EXIT_FINDINGS if failed else EXIT_OK
+
+
+def make_journal(args, paths):
+    return WriteJournal(journal_root(paths), keep_backups=not args.no_backup, keep=args.keep_batches)
+
+
+def make_cache(args):
+    if not args.cache:
+        return None
+    from parse_cache import ParseCache
+    return ParseCache(args.cache)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="GTA SA IDE/IPL batch tools")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not print per-file progress")
+    parser.add_argument("--profile", metavar="TRACE", help="time the run and write a JSON trace of its phases, counts and peak memory")
+    parser.add_argument("--no-memory", action="store_true", help="with --profile, skip tracing allocations (faster, no peak memory)")
+    parser.add_argument("--no-backup", action="store_true", help="do not keep backups of rewritten files in .write_journal")
+    parser.add_argument("--keep-batches", type=int, default=KEEP_BATCHES, metavar="N", help=f"batches kept in .write_journal, older ones are pruned (default {KEEP_BATCHES})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    renumber = commands.add_parser("renumber", help="renumber objs/tobj IDs of the IDE files in a folder")
+    renumber.add_argument("directory")
+    renumber.add_argument("--start", type=int, help="first ID (with --auto, the lowest ID to use)")
+    renumber.add_argument("--file-id", dest="file_ids", action="append", metavar="NAME=ID", help="start ID of one file (Individual mode), repeatable")
+    renumber.add_argument("--auto", action="store_true", help="pick free start IDs automatically")
+    renumber.add_argument("--per-file", action="store_true", help="with --auto, one free block per file instead of one for all")
+    renumber.add_argument("--reference", help="with --auto, folder whose IDE files define the used IDs")
+    renumber.add_argument("--ceiling", type=int, default=DEFAULT_ID_CEILING, help="highest model ID")
+    renumber.add_argument("--remap", help="save the old ID -> new ID table to this file")
+    renumber.add_argument("--ipl", help="apply the new IDs to the inst entries of the IPL files in this folder (and subfolders)")
+    renumber.set_defaults(run=run_renumber)
+
+    apply_remap = commands.add_parser("apply-remap", help="apply a saved renumber table to IPL files")
+    apply_remap.add_argument("remap", help="table saved with renumber --remap")
+    apply_remap.add_argument("paths", nargs="+", help="IPL files or folders")
+    apply_remap.set_defaults(run=run_apply_remap)
+
+    sort_ids = commands.add_parser("sort-ipl-ids", help="rewrite IPL inst IDs from the IDE definitions of their models")
+    sort_ids.add_argument("--ide", required=True, help="folder with the IDE files")
+    sort_ids.add_argument("--ipl", required=True, help="folder with the IPL files")
+    sort_ids.add_argument("--report", help="folder for ipl_id_sorting_report.txt (default: the IPL folder)")
+    sort_ids.add_argument("--strict", action="store_true", help="exit with 3 when models have conflicting IDs")
+    sort_ids.set_defaults(run=run_sort_ipl_ids)
+
+    lods = commands.add_parser("separate-lods", help="move LOD inst entries to separate IPL files")
+    lods.add_argument("paths", nargs="+", help="IPL files or folders")
+    lods.add_argument("--output", help="folder for the LOD IPLs (default: 'Separated IPLs' next to each file)")
+    lods.add_argument("--binary", action="store_true", help="write the remaining entries as binary IPLs")
+    lods.add_argument("--workers", type=int, help="worker processes (default: one per CPU, 1 runs in this process)")
+    lods.set_defaults(run=run_separate_lods)
+
+    convert = commands.add_parser("convert", help="convert IPL files between text and binary")
+    convert.add_argument("paths", nargs="+", help="IPL files or folders")
+    convert.add_argument("--to", choices=("binary", "text"), required=True)
+    convert.add_argument("--ide", nargs="+", help="IDE files or folders naming the models of binary entries")
+    convert.add_argument("--output", help="folder for the converted files (default: convert in place)")
+    convert.set_defaults(run=run_convert)
+
+    transform = commands.add_parser("transform", help="move, rotate or change the interior of inst entries in a region")
+    transform.add_argument("paths", nargs="+", help="IPL files or folders")
+    transform.add_argument("--min", type=float, nargs=3, metavar=("X", "Y", "Z"), help="lower corner of the region (default: everything)")
+    transform.add_argument("--max", type=float, nargs=3, metavar=("X", "Y", "Z"), help="upper corner of the region")
+    transform.add_argument("--rotate", type=float, metavar="DEGREES", help="turn the region around the Z axis through --pivot")
+    transform.add_argument("--pivot", type=float, nargs=3, metavar=("X", "Y", "Z"), default=(0, 0, 0))
+    transform.add_argument("--translate", type=float, nargs=3, metavar=("X", "Y", "Z"), help="move the region, after rotating")
+    transform.add_argument("--interior", type=int, help="set the interior of the region")
+    transform.set_defaults(run=run_transform)
+
+    region = commands.add_parser("region", help="list or export the inst entries placed in an area")
+    region.add_argument("paths", nargs="+", help="IPL files or folders (and subfolders)")
+    region.add_argument("--center", type=float, nargs=3, metavar=("X", "Y", "Z"))
+    region.add_argument("--radius", type=float, default=50.0)
+    region.add_argument("--min", type=float, nargs=3, metavar=("X", "Y", "Z"), help="lower corner of a box, instead of --center")
+    region.add_argument("--max", type=float, nargs=3, metavar=("X", "Y", "Z"), help="upper corner of a box")
+    region.add_argument("--model", nargs="+", help="only these models")
+    region.add_argument("--ide", nargs="+", help="IDE files or folders naming the models of binary IPL entries")
+    region.add_argument("--output", help="write the entries to this IPL instead of listing them")
+    region.set_defaults(run=run_region)
+
+    nearest = commands.add_parser("nearest", help="list the inst entries closest to a point")
+    nearest.add_argument("paths", nargs="+", help="IPL files or folders (and subfolders)")
+    nearest.add_argument("--at", type=float, nargs=3, metavar=("X", "Y", "Z"), required=True)
+    nearest.add_argument("--model", help="only entries of this model")
+    nearest.add_argument("--count", type=int, default=1)
+    nearest.add_argument("--ide", nargs="+", help="IDE files or folders naming the models of binary IPL entries")
+    nearest.set_defaults(run=run_nearest)
+
+    replace = commands.add_parser("replace", help="find and replace in IDE files, optionally in one column of matching entries")
+    replace.add_argument("paths", nargs="+", help="IDE files or folders")
+    replace.add_argument("--find", required=True)
+    replace.add_argument("--replace", required=True, help="replacement, may use \\1 groups with --regex")
+    replace.add_argument("--column", type=int, help="only this comma separated column of entries, from 1 (3 is the TXD)")
+    replace.add_argument("--where", help="only entries matching a search query, e.g. \"model ^= lae_\"")
+    replace.add_argument("--section", nargs="+", help="only entries of these sections")
+    replace.add_argument("--regex", action="store_true")
+    replace.add_argument("--match-case", action="store_true")
+    replace.add_argument("--whole-field", action="store_true", help="the whole field (or line) has to match")
+    replace.set_defaults(run=run_replace)
+
+    unused = commands.add_parser("unused-ids", help="write the IDE description and unused ID report")
+    unused.add_argument("paths", nargs="+", help="IDE files or folders")
+    unused.add_argument("--output", default="unused_ids_and_description_of_IDEs.txt")
+    unused.add_argument("--ceiling", type=int, default=DEFAULT_ID_CEILING, help="highest model ID")
+    unused.add_argument("--cache", help="parse cache file to reuse between runs")
+    unused.set_defaults(run=run_unused_ids)
+
+    duplicates = commands.add_parser("duplicates", help="write the duplicate ID and model name report")
+    duplicates.add_argument("paths", nargs="+", help="IDE files or folders")
+    duplicates.add_argument("--output", default="duplicated_objects.txt")
+    duplicates.add_argument("--cache", help="parse cache file to reuse between runs")
+    duplicates.add_argument("--strict", action="store_true", help="exit with 3 when duplicates are found")
+    duplicates.set_defaults(run=run_duplicates)
+
+    validate = commands.add_parser("validate", help="check every IPL placement against the IDE definitions")
+    validate.add_argument("--ide", nargs="+", required=True, help="IDE files or folders")
+    validate.add_argument("--ipl", nargs="+", required=True, help="IPL files or folders (searched recursively)")
+    validate.add_argument("--output", default="placement_report.txt")
+    validate.add_argument("--json", help="also write the findings as JSON to this file")
+    validate.add_argument("--cache", help="parse cache file to reuse between runs")
+    validate.add_argument("--strict", action="store_true", help="exit with 3 when placements are missing or mismatched")
+    validate.set_defaults(run=run_validate)
+
+    recover_command = commands.add_parser("recover", help="roll back batches that were interrupted while committing")
+    recover_command.add_argument("folder", help="folder holding the .write_journal")
+    recover_command.set_defaults(run=run_recover)
+
+    restore_command = commands.add_parser("restore", help="undo a committed batch from its backups")
+    restore_command.add_argument("journal", help="batch folder inside .write_journal")
+    restore_command.set_defaults(run=run_restore)
+
+    journals = commands.add_parser("journals", help="list the batches recorded under a folder")
+    journals.add_argument("folder")
+    journals.set_defaults(run=run_journals)
+
+    prune_command = commands.add_parser("prune", help="remove the backups of all but the newest batches under a folder")
+    prune_command.add_argument("folder", help="folder holding the .write_journal")
+    prune_command.add_argument("--keep", type=int, default=KEEP_BATCHES, help=f"finished batches to keep (default {KEEP_BATCHES})")
+    prune_command.set_defaults(run=run_prune)
+
+    self_check = commands.add_parser("self-check", help="run the built-in checks in a scratch folder (exit 3 when one fails)")
+    self_check.set_defaults(run=run_self_check)
+    return parser
+
+
+def write_profile(trace_path):
+    profiler.stop()
+    print("\n".join(profiler.report_lines()))
+    try:
+        profiler.write_trace(trace_path)
+        print(f"Profile trace saved to {trace_path}")
+    except OSError as e:
+        print(f"Error writing the profile trace: {e}", file=sys.stderr)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.profile:
+        profiler.start(memory=not args.no_memory)
+    try:
+        status = args.run(args, None if args.quiet else print_progress)
+    except (OSError, JournalError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_FILE_ERRORS
+    except ImportError as e:
+        # Binary IPLs, transforms and region queries need NumPy, the rest does not
+        print(f"Error: this command needs {e.name or e} (pip install {e.name or 'numpy'})", file=sys.stderr)
+        return EXIT_USAGE
+    finally:
+        if args.profile:
+            write_profile(args.profile)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
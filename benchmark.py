@@ -0,0 +1,353 @@
+# Times and memory-profiles the tools and the editor's hot paths on synthetic corpora.
+#
+#   python benchmark.py --entries 10000 100000 --output benchmark_results.json
+#   python benchmark.py --entries 2000000 --only renumber_ide_files editor_load --no-memory
+#
+# Results are written as JSON, one record per (benchmark, corpus size), so two runs
+# can be compared with --compare OLD.json.
+
+import argparse
+import json
+import os
+import platform
+import queue
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+
+import batch_tools
+from id_allocator import DEFAULT_ID_CEILING
+from parse_cache import ParseCache
+from search_index import SearchIndex
+from synthetic_corpus import generate_corpus
+
+SEARCH_QUERIES = ("model ^= lod", "ID = 20000", "TXD contains wall", "/^vgn_.*0$/", "fence")
+
+
+# ----- Tool benchmarks -----
+# Each one gets the pristine corpus and a scratch copy, does its setup and returns
+# the function to time. Tools that rewrite files work on the scratch copy.
+
+def bench_renumber(corpus, scratch):
+    ide_files = batch_tools.get_ide_files(os.path.join(scratch, "ide"))
+    return lambda: batch_tools.renumber_ide_files(ide_files, 20000)
+
+
+def bench_renumber_with_ipls(corpus, scratch):
+    # Full map renumber: one pass over the IDEs, one over the IPLs
+    ide_files = batch_tools.get_ide_files(os.path.join(scratch, "ide"))
+    ipl_files = batch_tools.find_ipl_files(os.path.join(scratch, "ipl"))
+
+    def run():
+        _, _, remap = batch_tools.renumber_ide_files(ide_files, 20000)
+        return batch_tools.apply_remap_to_ipl_files(ipl_files, remap)
+    return run
+
+
+def bench_ipl_id_sort(corpus, scratch):
+    ide_files = batch_tools.get_ide_files(os.path.join(scratch, "ide"))
+    ipl_files = batch_tools.get_files_with_extension(os.path.join(scratch, "ipl"), "ipl")
+
+    def run():
+        sorter = batch_tools.IPLIDSorter()
+        sorter.process_ide_files(ide_files)
+        return sorter.process_ipl_files(ipl_files)
+    return run
+
+
+def bench_lod_separation(corpus, scratch):
+    ipl_files = batch_tools.get_files_with_extension(os.path.join(scratch, "ipl"), "ipl")
+    return lambda: batch_tools.separate_lod_files(ipl_files)
+
+
+def bench_unused_ids(corpus, scratch):
+    ide_files = batch_tools.get_ide_files(os.path.join(corpus, "ide"))
+    output_path = os.path.join(scratch, "unused.txt")
+    ceiling = max(DEFAULT_ID_CEILING, corpus_summary(corpus)["max_id"])
+    return lambda: batch_tools.write_unused_ids_report(ide_files, output_path, ceiling)
+
+
+def bench_duplicate_ids(corpus, scratch):
+    ide_files = batch_tools.get_ide_files(os.path.join(corpus, "ide"))
+    output_path = os.path.join(scratch, "duplicates.txt")
+    return lambda: batch_tools.write_duplicate_ids_report(ide_files, output_path)
+
+
+# ----- Editor benchmarks -----
+# With a display these drive a real (withdrawn) editor window. Without one they run
+# the same code paths that do not need Tk: the loader worker, the tokenizer behind
+# the highlighter, the search index and the atomic writer.
+
+def display_available():
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+        root.destroy()
+        return True
+    except Exception:
+        return False
+
+
+def make_editor(scratch):
+    import tkinter as tk
+    from IDE_editor import IDEFileEditor
+    root = tk.Tk()
+    root.withdraw()
+    editor = IDEFileEditor(root)
+    editor.parse_cache = ParseCache(os.path.join(scratch, "ide_parse_cache.pickle"))
+    return editor
+
+
+def pump(editor, done):
+    while not done():
+        editor.root.update()
+
+
+def loaded_editor(corpus, scratch):
+    editor = make_editor(scratch)
+    editor.start_loading(directory=os.path.join(scratch, "ide"))
+    pump(editor, lambda: editor.load_queue is None)
+    return editor
+
+
+def read_documents(directory):
+    documents = []
+    for file_path in batch_tools.get_ide_files(directory):
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as file:
+            documents.append((file_path, file.read()))
+    return documents
+
+
+def bench_editor_load(corpus, scratch):
+    directory = os.path.join(scratch, "ide")
+    if GUI:
+        editor = make_editor(scratch)
+
+        def run():
+            editor.start_loading(directory=directory)
+            pump(editor, lambda: editor.load_queue is None)
+        return run
+
+    from IDE_editor import IDEFileEditor
+    holder = types.SimpleNamespace(parse_cache=ParseCache(os.path.join(scratch, "ide_parse_cache.pickle")))
+
+    def run():
+        out = queue.Queue()
+        IDEFileEditor.load_files_worker(holder, directory, None, out, threading.Event())
+        texts = []
+        while True:
+            message = out.get()
+            if message[0] == "file":
+                texts.append(message[2])
+            elif message[0] == "done":
+                return texts
+    return run
+
+
+def bench_editor_highlight(corpus, scratch):
+    if GUI:
+        editor = loaded_editor(corpus, scratch)
+
+        def run():
+            editor.highlight_syntax()
+            pump(editor, lambda: editor.highlight_job is None)
+        return run
+
+    from IDE_editor import IDEFileEditor
+    documents = read_documents(os.path.join(corpus, "ide"))
+
+    def run():
+        tokens = 0
+        for _, text in documents:
+            for line in text.split('\n'):
+                tokens += len(IDEFileEditor.tokenize_line(None, line))
+        return tokens
+    return run
+
+
+def bench_editor_search(corpus, scratch):
+    if GUI:
+        editor = loaded_editor(corpus, scratch)
+
+        def run():
+            for query in SEARCH_QUERIES:
+                editor.search_entry.delete(0, "end")
+                editor.search_entry.insert(0, query)
+                editor.search_text()
+            return len(editor.search_results)
+        return run
+
+    documents = read_documents(os.path.join(corpus, "ide"))
+
+    def run():
+        index = SearchIndex()
+        for document, (_, text) in enumerate(documents):
+            index.index_document(document, text)
+        return sum(len(index.search(query)) for query in SEARCH_QUERIES)
+    return run
+
+
+def bench_editor_save(corpus, scratch):
+    # One edited file among all the loaded ones
+    if GUI:
+        editor = loaded_editor(corpus, scratch)
+        editor.text_editor.insert(f"{editor.file_mark(0)} +1 lines", "# edited\n")
+
+        def run():
+            editor.sync_window()
+            for index in range(len(editor.documents)):
+                if editor.is_document_dirty(index):
+                    editor.write_document(index)
+        return run
+
+    from IDE_editor import text_hash, write_text_atomic
+    documents = read_documents(os.path.join(scratch, "ide"))
+    hashes = [text_hash(text) for _, text in documents]
+    documents[0] = (documents[0][0], documents[0][1] + "\n# edited")
+
+    def run():
+        for (file_path, text), original in zip(documents, hashes):
+            if text_hash(text) != original:
+                write_text_atomic(file_path, text)
+    return run
+
+
+BENCHMARKS = {
+    "renumber_ide_files": bench_renumber,
+    "renumber_with_ipls": bench_renumber_with_ipls,
+    "ipl_id_sort": bench_ipl_id_sort,
+    "lod_separation": bench_lod_separation,
+    "unused_ids_report": bench_unused_ids,
+    "duplicate_ids_report": bench_duplicate_ids,
+    "editor_load": bench_editor_load,
+    "editor_highlight": bench_editor_highlight,
+    "editor_search": bench_editor_search,
+    "editor_save": bench_editor_save,
+}
+GUI = False  # set by main() when a display is available
+
+
+# ----- Harness -----
+
+def corpus_summary(corpus):
+    with open(os.path.join(corpus, "corpus.json"), "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def prepare_corpus(work_directory, entries, seed):
+    # Corpora are kept in the work directory and reused between runs
+    corpus = os.path.join(work_directory, f"corpus_{entries}_{seed}")
+    if not os.path.exists(os.path.join(corpus, "corpus.json")):
+        shutil.rmtree(corpus, ignore_errors=True)
+        started = time.perf_counter()
+        summary = generate_corpus(corpus, entries, seed)
+        summary["generate_seconds"] = round(time.perf_counter() - started, 3)
+        with open(os.path.join(corpus, "corpus.json"), "w", encoding="utf-8") as file:
+            json.dump(summary, file, indent=2)
+    return corpus
+
+
+def measure(name, corpus, work_directory, repeat, memory):
+    # Every run gets a fresh scratch copy of the corpus, made outside the timed section
+    seconds = []
+    peak_bytes = None
+    for run_index in range(repeat + (1 if memory else 0)):
+        scratch = tempfile.mkdtemp(dir=work_directory, prefix=name + ".")
+        try:
+            shutil.copytree(os.path.join(corpus, "ide"), os.path.join(scratch, "ide"))
+            shutil.copytree(os.path.join(corpus, "ipl"), os.path.join(scratch, "ipl"))
+            run = BENCHMARKS[name](corpus, scratch)
+            if run_index < repeat:
+                started = time.perf_counter()
+                run()
+                seconds.append(time.perf_counter() - started)
+            else:
+                # Separate traced run, tracemalloc slows the code down too much to time it
+                tracemalloc.start()
+                run()
+                peak_bytes = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+    return seconds, peak_bytes
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(old_results, results):
+    old = {(result["benchmark"], result["entries"]): result for result in old_results["results"]}
+    for result in results["results"]:
+        previous = old.get((result["benchmark"], result["entries"]))
+        if previous and previous.get("best_seconds") and result.get("best_seconds"):
+            change = (result["best_seconds"] / previous["best_seconds"] - 1) * 100
+            print(f"{result['benchmark']:<22} {result['entries']:>9}  {previous['best_seconds']:.3f}s -> {result['best_seconds']:.3f}s  ({change:+.1f}%)")
+
+
+def main(argv=None):
+    global GUI
+    parser = argparse.ArgumentParser(description="Benchmark the IDE/IPL tools on synthetic corpora")
+    parser.add_argument("--entries", type=int, nargs="+", default=[10000], help="corpus sizes in IDE definitions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced run that measures peak memory")
+    parser.add_argument("--no-gui", action="store_true", help="run the editor benchmarks headless even with a display")
+    parser.add_argument("--work", help="folder for corpora and scratch copies (default: a temp folder)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    work_directory = args.work or os.path.join(tempfile.gettempdir(), "gta_sa_benchmark")
+    os.makedirs(work_directory, exist_ok=True)
+    GUI = not args.no_gui and display_available()
+
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "editor_mode": "gui" if GUI else "headless",
+        "repeat": args.repeat,
+        "results": [],
+    }
+    for entries in args.entries:
+        corpus = prepare_corpus(work_directory, entries, args.seed)
+        summary = corpus_summary(corpus)
+        for name in args.only or BENCHMARKS:
+            result = {"benchmark": name, "entries": entries, "ide_files": summary["ide_files"], "ipl_files": summary["ipl_files"]}
+            try:
+                seconds, peak_bytes = measure(name, corpus, work_directory, args.repeat, not args.no_memory)
+                result.update(status="ok", seconds=[round(value, 4) for value in seconds],
+                              best_seconds=round(min(seconds), 4) if seconds else None, peak_bytes=peak_bytes)
+                peak = f"{peak_bytes / 1048576:8.1f} MB" if peak_bytes is not None else ""
+                best = f"{result['best_seconds']:8.3f}s" if seconds else ""
+                print(f"{name:<22} {entries:>9}  {best}  {peak}")
+            except Exception as e:
+                result.update(status="error", error=f"{type(e).__name__}: {e}")
+                print(f"{name:<22} {entries:>9}  error: {e}")
+            results["results"].append(result)
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            compare(json.load(file), results)
+    return 1 if any(result["status"] != "ok" for result in results["results"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+# Binary ("bnry") IPL files, the stream IPLs SA loads from gta3.img.
+#
+# A binary IPL only holds inst and cars entries. The header is the "bnry" magic, six
+# section counts and six (offset, size) pairs in the order inst, unk1, unk2, unk3, cars,
+# unk4, so the inst count is at 0x04 and the cars count at 0x14, the inst offset at 0x1C
+# and the cars offset at 0x3C. Only inst and cars are used:
+#
+#   inst: x, y, z (float), rotation x, y, z, w (float), model ID, interior, LOD index (int32)
+#   cars: x, y, z, angle (float), model ID, primary and secondary colour, force spawn,
+#         alarm, door lock, two unknowns (int32)
+#
+# Whole sections are converted at once through NumPy record arrays. Binary entries have
+# no model names, they are looked up by ID when converting back to text ("dummy" if unknown).
+#
+#   python binary_ipl.py   checks the header layout against one built like the game's files
+
+import struct
+import warnings
+
+import numpy as np
+
+from gta_parser import iter_ipl_lines, is_binary_ipl, ENTRY, BINARY_IPL_MAGIC as MAGIC
+
+HEADER = struct.Struct("<4s6i12i")  # 76 bytes
+INST_SECTION = 0
+CARS_SECTION = 4
+
+INST_DTYPE = np.dtype([("x", "<f4"), ("y", "<f4"), ("z", "<f4"),
+                       ("rx", "<f4"), ("ry", "<f4"), ("rz", "<f4"), ("rw", "<f4"),
+                       ("id", "<i4"), ("interior", "<i4"), ("lod", "<i4")])
+CARS_DTYPE = np.dtype([("x", "<f4"), ("y", "<f4"), ("z", "<f4"), ("angle", "<f4"),
+                       ("id", "<i4"), ("primary_color", "<i4"), ("secondary_color", "<i4"),
+                       ("force_spawn", "<i4"), ("alarm", "<i4"), ("door_lock", "<i4"),
+                       ("unknown1", "<i4"), ("unknown2", "<i4")])
+
+# Text column order of each section, the inst model name comes second and is not stored
+INST_TEXT_FIELDS = ("id", "interior", "x", "y", "z", "rx", "ry", "rz", "rw", "lod")
+CARS_TEXT_FIELDS = CARS_DTYPE.names
+DEFAULT_MODEL = "dummy"
+
+
+def parse_binary_ipl(data):
+    # (inst, cars) record arrays of the bytes of a binary IPL
+    if len(data) < HEADER.size or data[:4] != MAGIC:
+        raise ValueError("not a binary IPL")
+    header = HEADER.unpack_from(data)
+    counts, offsets = header[1:7], header[7::2]
+    sections = []
+    for section, dtype in ((INST_SECTION, INST_DTYPE), (CARS_SECTION, CARS_DTYPE)):
+        count, offset = counts[section], offsets[section]
+        if count and offset + count * dtype.itemsize > len(data):
+            raise ValueError("binary IPL is truncated")
+        sections.append(np.frombuffer(data, dtype, count, offset if count else 0).copy())
+    return sections[0], sections[1]
+
+
+def read_binary_ipl(file_path):
+    with open(file_path, "rb") as file:
+        return parse_binary_ipl(file.read())
+
+
+def binary_header(inst_count, cars_count):
+    counts = [0] * 6
+    offsets = [0] * 12  # (offset, size) pairs, the size is always written as 0
+    counts[INST_SECTION] = inst_count
+    counts[CARS_SECTION] = cars_count
+    offsets[2 * INST_SECTION] = HEADER.size
+    offsets[2 * CARS_SECTION] = HEADER.size + inst_count * INST_DTYPE.itemsize if cars_count else 0
+    return HEADER.pack(MAGIC, *counts, *offsets)
+
+
+def binary_ipl_bytes(inst, cars=None):
+    if cars is None:
+        cars = np.zeros(0, CARS_DTYPE)
+    inst = np.asarray(inst, INST_DTYPE)
+    cars = np.asarray(cars, CARS_DTYPE)
+    return binary_header(len(inst), len(cars)) + inst.tobytes() + cars.tobytes()
+
+
+class BinaryIPLWriter:
+    # Writes a binary IPL a chunk of entries at a time when the counts are known up
+    # front, so a large file is never held as one array. Both sections can be written
+    # in any order, each chunk goes to its place after the header.
+    def __init__(self, file, inst_count, cars_count):
+        self.file = file
+        self.remaining = {INST_SECTION: inst_count, CARS_SECTION: cars_count}
+        self.positions = {INST_SECTION: HEADER.size, CARS_SECTION: HEADER.size + inst_count * INST_DTYPE.itemsize}
+        file.write(binary_header(inst_count, cars_count))
+
+    def write(self, section, entries):
+        if len(entries) > self.remaining[section]:
+            raise ValueError("more entries than the binary IPL header was written for")
+        self.file.seek(self.positions[section])
+        self.file.write(entries.tobytes())
+        self.positions[section] += entries.nbytes
+        self.remaining[section] -= len(entries)
+
+    def write_text(self, inst_lines=(), cars_lines=(), file_path="IPL"):
+        # Converts text entry lines of the inst and cars sections and writes them
+        inst, cars = text_sections_to_arrays(["inst\n", *inst_lines, "end\n", "cars\n", *cars_lines, "end\n"], file_path)
+        if len(inst):
+            self.write(INST_SECTION, inst)
+        if len(cars):
+            self.write(CARS_SECTION, cars)
+
+    def finish(self):
+        if any(self.remaining.values()):
+            raise ValueError("fewer entries than the binary IPL header was written for")
+
+
+def write_binary_ipl(file_path, inst, cars=None):
+    with open(file_path, "wb") as file:
+        file.write(binary_ipl_bytes(inst, cars))
+
+
+def parse_numbers(rows, columns, file_path):
+    # One np.fromstring over every row of a section instead of a float() per field
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)  # text that is not a number just ends the parse
+        values = np.fromstring(",".join(rows), sep=",") if rows else np.zeros(0)
+    if values.size != len(rows) * columns:
+        for row in rows:
+            if row.count(",") != columns - 1:
+                raise ValueError(f"{file_path}: malformed entry \"{row.strip()}\"")
+        raise ValueError(f"{file_path}: entries with values that are not numbers")
+    return values.reshape(len(rows), columns)
+
+
+def text_sections_to_arrays(lines, file_path="IPL"):
+    # (inst, cars) record arrays of the lines of a text IPL. Entries of sections that a
+    # binary IPL cannot hold are an error rather than being dropped silently.
+    inst_rows = []
+    cars_rows = []
+    for line, record in iter_ipl_lines(lines):
+        if record.kind != ENTRY:
+            continue
+        if record.section == "inst":
+            # id, model, interior, ... -> id, interior, ...
+            first, _, rest = line.split(",", 2)
+            inst_rows.append(first + "," + rest)
+        elif record.section == "cars":
+            cars_rows.append(line)
+        else:
+            raise ValueError(f"{file_path}: {record.section} entries cannot be stored in a binary IPL (line {record.line_no})")
+
+    inst = np.zeros(len(inst_rows), INST_DTYPE)
+    for name, column in zip(INST_TEXT_FIELDS, parse_numbers(inst_rows, len(INST_TEXT_FIELDS), file_path).T):
+        inst[name] = column
+    cars = np.zeros(len(cars_rows), CARS_DTYPE)
+    for name, column in zip(CARS_TEXT_FIELDS, parse_numbers(cars_rows, len(CARS_TEXT_FIELDS), file_path).T):
+        cars[name] = column
+    return inst, cars
+
+
+def format_floats(column):
+    # 8 significant digits read like the text IPLs (0.1 stays 0.1) and give back the
+    # same float32 for nearly every value, the few that do not get 9, which always do
+    values = column.tolist()
+    text = ["%.8g" % value for value in values]
+    read_back = parse_numbers(text, 1, "float column").ravel().astype(np.float32)
+    for index in np.nonzero(read_back != column)[0].tolist():
+        text[index] = "%.9g" % values[index]
+    return text
+
+
+def format_rows(array, fields, row_format, prefix=None):
+    # Formats whole columns at once, then %-formats every row
+    columns = [format_floats(array[name]) if array.dtype[name].kind == "f" else array[name].tolist() for name in fields]
+    if prefix is not None:
+        columns.insert(1, prefix)
+    return [row_format % row for row in zip(*columns)]
+
+
+def arrays_to_text_lines(inst, cars=None, models=None):
+    # Text IPL lines of inst and cars arrays. `models` maps model IDs to names.
+    models = models or {}
+    names = [models.get(model_id, DEFAULT_MODEL) for model_id in inst["id"].tolist()]
+    lines = ["inst\n"]
+    lines += format_rows(inst, INST_TEXT_FIELDS, "%d, %s, %d, %s, %s, %s, %s, %s, %s, %s, %d\n", names)
+    lines.append("end\n")
+    if cars is not None and len(cars):
+        lines.append("cars\n")
+        lines += format_rows(cars, CARS_TEXT_FIELDS, "%s, %s, %s, %s, %d, %d, %d, %d, %d, %d, %d, %d\n")
+        lines.append("end\n")
+    return lines
+
+
+def text_ipl_to_binary(file_path, output_path):
+    # Returns the number of inst entries written
+    with open(file_path, "r", encoding="utf-8", errors="ignore") as file:
+        inst, cars = text_sections_to_arrays(file, file_path)
+    write_binary_ipl(output_path, inst, cars)
+    return len(inst)
+
+
+def binary_ipl_to_text(file_path, output_path, models=None):
+    inst, cars = read_binary_ipl(file_path)
+    with open(output_path, "w", encoding="utf-8") as out:
+        out.writelines(arrays_to_text_lines(inst, cars, models))
+    return len(inst)
+
+
+def check_header_layout():
+    # Builds a stream IPL the way the game's own files are laid out, with the offsets
+    # written by hand rather than through HEADER, and checks it reads and writes back
+    inst = np.zeros(2, INST_DTYPE)
+    inst["id"] = (18631, 18632)
+    inst["lod"] = (-1, 0)
+    inst["rw"] = 1.0
+    cars = np.zeros(1, CARS_DTYPE)
+    cars["id"] = 411
+    cars["x"], cars["angle"], cars["primary_color"] = 2495.5, 90.0, -1
+    data = bytearray(HEADER.size)
+    data[:4] = MAGIC
+    struct.pack_into("<i", data, 0x04, len(inst))  # inst count
+    struct.pack_into("<i", data, 0x14, len(cars))  # cars count
+    struct.pack_into("<i", data, 0x1C, HEADER.size)  # inst offset
+    struct.pack_into("<i", data, 0x3C, HEADER.size + inst.nbytes)  # cars offset
+    data += inst.tobytes() + cars.tobytes()
+
+    read_inst, read_cars = parse_binary_ipl(bytes(data))
+    assert read_inst.tobytes() == inst.tobytes(), "inst entries read back wrong"
+    assert read_cars.tobytes() == cars.tobytes(), "cars entries read back wrong"
+    assert binary_ipl_bytes(read_inst, read_cars) == bytes(data), "written header differs from the game's layout"
+    inst_back, cars_back = text_sections_to_arrays(arrays_to_text_lines(read_inst, read_cars))
+    assert inst_back.tobytes() == inst.tobytes() and cars_back.tobytes() == cars.tobytes(), "text round trip lost entries"
+
+
+if __name__ == "__main__":
+    check_header_layout()
+    print("Binary IPL header layout OK")
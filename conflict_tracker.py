@@ -0,0 +1,142 @@
+# Live duplicate ID / model name tracking over the editor's documents, unsaved edits included.
+#
+# Every document keeps one slot per line with the (id, model) the line defines, and the
+# section in effect after it. An edit replaces the slots of the lines it touched and
+# re-reads following lines only while the section they are in changed (e.g. after
+# typing an "end"), so a keystroke costs a line, not a rescan of every file.
+# The ID and model multimaps count the defining entries per document.
+
+from gta_parser import iter_ide_lines, section_after, ENTRY, ID_SECTIONS
+
+
+class ConflictTracker:
+    def __init__(self):
+        self.entries = {}  # document -> [(id, model) or None per line]
+        self.sections = {}  # document -> [section in effect after each line]
+        self.ids = {}  # id -> {document: entries}
+        self.models = {}  # lowercase model name -> {document: entries}
+        self.conflicting_ids = set()
+        self.conflicting_models = set()
+        self.changed = False  # conflicts appeared or went away since the last take_changed()
+
+    def clear(self):
+        self.entries.clear()
+        self.sections.clear()
+        self.ids.clear()
+        self.models.clear()
+        self.changed = bool(self.conflicting_ids or self.conflicting_models)
+        self.conflicting_ids.clear()
+        self.conflicting_models.clear()
+
+    def take_changed(self):
+        changed, self.changed = self.changed, False
+        return changed
+
+    # --- Multimaps ---
+
+    def count(self, multimap, conflicts, key, document, step):
+        documents = multimap.setdefault(key, {})
+        count = documents.get(document, 0) + step
+        if count:
+            documents[document] = count
+        else:
+            del documents[document]
+            if not documents:
+                del multimap[key]
+        conflicting = sum(documents.values()) > 1 if documents else False
+        if conflicting != (key in conflicts):
+            self.changed = True
+            if conflicting:
+                conflicts.add(key)
+            else:
+                conflicts.discard(key)
+
+    def add_entry(self, document, entry, step=1):
+        model_id, model = entry
+        if model_id is not None:
+            self.count(self.ids, self.conflicting_ids, model_id, document, step)
+        if model:
+            self.count(self.models, self.conflicting_models, model.lower(), document, step)
+
+    def parse_lines(self, lines, section):
+        # (entries, sections) slots of lines starting in `section`
+        entries = []
+        sections = []
+        for _, record in iter_ide_lines(lines, section):
+            if record.kind == ENTRY and record.section in ID_SECTIONS and record.id is not None:
+                entries.append((record.id, record.model))
+            else:
+                entries.append(None)
+            sections.append(section_after(record))
+        return entries, sections
+
+    # --- Documents ---
+
+    def set_document(self, document, text):
+        self.remove_document(document)
+        entries, sections = self.parse_lines(text.split('\n'), None)
+        for entry in entries:
+            if entry:
+                self.add_entry(document, entry)
+        self.entries[document] = entries
+        self.sections[document] = sections
+
+    def remove_document(self, document):
+        for entry in self.entries.pop(document, ()):
+            if entry:
+                self.add_entry(document, entry, -1)
+        self.sections.pop(document, None)
+
+    def line_count(self, document):
+        return len(self.entries.get(document, ()))
+
+    def replace_lines(self, document, first, old_count, new_lines, read_line):
+        # Lines first .. first + old_count - 1 (from 0) of a document became `new_lines`.
+        # read_line(n) returns line n of the edited document, for the lines after the
+        # edit that are re-read when the section they are in changed.
+        entries = self.entries[document]
+        sections = self.sections[document]
+        start_section = sections[first - 1] if first > 0 else None
+        old_end_section = sections[first + old_count - 1] if old_count else start_section
+
+        new_entries, new_sections = self.parse_lines(new_lines, start_section)
+        for entry in entries[first:first + old_count]:
+            if entry:
+                self.add_entry(document, entry, -1)
+        for entry in new_entries:
+            if entry:
+                self.add_entry(document, entry)
+        entries[first:first + old_count] = new_entries
+        sections[first:first + old_count] = new_sections
+
+        # Re-read the following lines until they are back in the section they were in
+        line = first + len(new_lines)
+        section = new_sections[-1] if new_sections else start_section
+        while line < len(entries) and section != old_end_section:
+            (entry,), (section_after_line,) = self.parse_lines([read_line(line)], section)
+            if entries[line]:
+                self.add_entry(document, entries[line], -1)
+            if entry:
+                self.add_entry(document, entry)
+            entries[line] = entry
+            old_end_section = sections[line]
+            sections[line] = section = section_after_line
+            line += 1
+
+    # --- Queries ---
+
+    def locations(self, model_id=None, model=None):
+        # (document, line) of every entry defining an ID or a model name, in document order
+        multimap, key = (self.ids, model_id) if model is None else (self.models, model.lower())
+        found = []
+        for document in sorted(multimap.get(key, ())):
+            for line, entry in enumerate(self.entries[document]):
+                if entry and (entry[0] == key if model is None else (entry[1] or "").lower() == key):
+                    found.append((document, line))
+        return found
+
+    def conflicts(self):
+        # ("id", id, entries) and ("model", name, entries) of every conflict, IDs first
+        listed = [("id", model_id, sum(self.ids[model_id].values())) for model_id in sorted(self.conflicting_ids)]
+        listed += [("model", model, sum(self.models[model].values())) for model in sorted(self.conflicting_models)]
+        return listed
@@ -0,0 +1,206 @@
+# Shared line tokenizer for GTA SA IDE and IPL files, used by the editor and all the tools
+
+import mmap
+import os
+import sys
+
+IDE_SECTIONS = {"objs", "tobj", "anim", "weap", "peds", "cars", "hier", "txdp", "2dfx", "path"}
+IPL_SECTIONS = {"inst", "cull", "grge", "enex", "pick", "cars", "jump", "tcyc", "auzo", "mult", "occl", "zone", "path"}
+
+# IDE sections whose entries define a model ID (id, model, txd, ...)
+ID_SECTIONS = {"objs", "tobj", "anim", "weap", "peds", "cars", "hier"}
+# IPL sections whose entries reference a model by (id, model, ...)
+MODEL_REF_SECTIONS = {"inst"}
+
+# Files from this size up are parsed by scan_entries() straight from a memory map
+LARGE_FILE_BYTES = 16 * 1024 * 1024
+
+# First bytes of a binary stream IPL (see binary_ipl.py)
+BINARY_IPL_MAGIC = b"bnry"
+
+# Record kinds
+SECTION = "section"  # section header line such as "objs" or "inst"
+END = "end"          # "end" line closing a section
+COMMENT = "comment"
+BLANK = "blank"
+ENTRY = "entry"      # data line inside a section
+OTHER = "other"      # data-looking line outside of any section
+
+
+class Record:
+    __slots__ = ("kind", "section", "id", "model", "txd", "line_no", "start", "end")
+
+    def __init__(self, kind, section, line_no, start, end, id=None, model=None, txd=None):
+        self.kind = kind
+        self.section = section
+        self.id = id
+        self.model = model
+        self.txd = txd
+        self.line_no = line_no
+        self.start = start  # character offset of the line in the file
+        self.end = end      # character offset just past the line (including the newline)
+
+    def __repr__(self):
+        return f"Record({self.kind}, {self.section}, {self.id}, {self.model}, {self.txd}, line {self.line_no})"
+
+
+def split_fields(line):
+    return [part.strip() for part in line.split(',')]
+
+
+def iter_records(lines, sections, section=None):
+    # Yields (line, Record) for every line, tracking the current section.
+    # `sections` is IDE_SECTIONS or IPL_SECTIONS, `section` the one the lines start in.
+    intern = sys.intern
+    offset = 0
+    for line_no, line in enumerate(lines, 1):
+        start = offset
+        offset += len(line)
+        stripped = line.strip()
+
+        if not stripped:
+            yield line, Record(BLANK, section, line_no, start, offset)
+            continue
+        if stripped[0] == '#':
+            yield line, Record(COMMENT, section, line_no, start, offset)
+            continue
+
+        lowered = stripped.lower()
+        if lowered == "end":
+            yield line, Record(END, section, line_no, start, offset)
+            section = None
+            continue
+        if lowered in sections:
+            section = lowered
+            yield line, Record(SECTION, section, line_no, start, offset)
+            continue
+
+        if section is None:
+            yield line, Record(OTHER, None, line_no, start, offset)
+            continue
+
+        record = Record(ENTRY, section, line_no, start, offset)
+        if section in ID_SECTIONS or section in MODEL_REF_SECTIONS:
+            parts = stripped.split(',', 3)
+            first = parts[0].strip()
+            if first.isdigit():
+                record.id = int(first)
+            if len(parts) > 1:
+                record.model = intern(parts[1].strip())
+            if len(parts) > 2 and section in ID_SECTIONS:
+                record.txd = intern(parts[2].strip())
+        elif section == "txdp":
+            parts = stripped.split(',', 2)
+            record.txd = intern(parts[0].strip())
+        elif section == "2dfx":
+            first = stripped.split(',', 1)[0].strip()
+            if first.isdigit():
+                record.id = int(first)
+        yield line, record
+
+
+def iter_ide_lines(lines, section=None):
+    return iter_records(lines, IDE_SECTIONS, section)
+
+
+def iter_ipl_lines(lines, section=None):
+    return iter_records(lines, IPL_SECTIONS, section)
+
+
+def section_after(record):
+    # Section in effect on the line after `record`
+    return None if record.kind in (END, OTHER) else record.section
+
+
+def scan_entries(file_path, sections):
+    # Yields the entry records of a file like iter_records, but works on the bytes of a
+    # memory map: lines are found with find() and sliced as bytes, and only the fields a
+    # record keeps are decoded. The file is never read or decoded as a whole, so memory
+    # stays flat however big it is. Record.start/end are byte offsets here, and lines
+    # end with \n or \r\n.
+    with open(file_path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield from scan_buffer(data, sections)
+
+
+def scan_buffer(data, sections):
+    intern = sys.intern
+    headers = {name.encode(): name for name in sections}
+    find = data.find
+    size = len(data)
+    section = None
+    start = 0
+    line_no = 0
+    while start < size:
+        end = find(b"\n", start)
+        end = size if end == -1 else end + 1
+        line_no += 1
+        stripped = data[start:end].strip()
+        line_start, start = start, end
+
+        if not stripped or stripped[0] == 35:  # blank or '#'
+            continue
+        lowered = stripped.lower()
+        if lowered == b"end":
+            section = None
+            continue
+        if lowered in headers:
+            section = headers[lowered]
+            continue
+        if section is None:
+            continue
+
+        record = Record(ENTRY, section, line_no, line_start, end)
+        if section in ID_SECTIONS or section in MODEL_REF_SECTIONS:
+            parts = stripped.split(b",", 3)
+            first = parts[0].strip()
+            if first.isdigit():
+                record.id = int(first)
+            if len(parts) > 1:
+                record.model = intern(parts[1].strip().decode("utf-8", "ignore"))
+            if len(parts) > 2 and section in ID_SECTIONS:
+                record.txd = intern(parts[2].strip().decode("utf-8", "ignore"))
+        elif section == "txdp":
+            record.txd = intern(stripped.split(b",", 2)[0].strip().decode("utf-8", "ignore"))
+        elif section == "2dfx":
+            first = stripped.split(b",", 1)[0].strip()
+            if first.isdigit():
+                record.id = int(first)
+        yield record
+
+
+def is_large_file(file_path):
+    try:
+        return os.path.getsize(file_path) >= LARGE_FILE_BYTES
+    except OSError:
+        return False  # let open() report it
+
+
+def parse_ide(file_path):
+    # Yields the entry records of an IDE file
+    if is_large_file(file_path):
+        yield from scan_entries(file_path, IDE_SECTIONS)
+        return
+    with open(file_path, "r", encoding="utf-8", errors="ignore") as file:
+        for _, record in iter_ide_lines(file):
+            if record.kind == ENTRY:
+                yield record
+
+
+def is_binary_ipl(file_path):
+    # Here rather than in binary_ipl.py, so telling the formats apart needs no NumPy
+    with open(file_path, "rb") as file:
+        return file.read(4) == BINARY_IPL_MAGIC
+
+
+def parse_ipl(file_path):
+    # Yields the entry records of an IPL file
+    if is_large_file(file_path):
+        yield from scan_entries(file_path, IPL_SECTIONS)
+        return
+    with open(file_path, "r", encoding="utf-8", errors="ignore") as file:
+        for _, record in iter_ipl_lines(file):
+            if record.kind == ENTRY:
+                yield record
@@ -0,0 +1,166 @@
+# Free model ID ranges, kept as sorted intervals instead of a set of every ID,
+# so the ceiling can be raised for fastman92's limit adjuster without cost.
+
+import bisect
+
+from gta_parser import parse_ide, ID_SECTIONS
+from write_journal import find_files
+
+DEFAULT_ID_CEILING = 90000  # highest model ID searched for free slots (inclusive)
+
+
+def format_ranges(ranges):
+    # "0-17, 20, 25-90000"
+    return ", ".join(str(first) if first == last else f"{first}-{last}" for first, last in ranges)
+
+
+def collect_used_ids(ide_files, skip=None):
+    # Model IDs defined by a list of IDE files. `skip(record)` may exclude entries,
+    # e.g. the ones a renumber is about to move.
+    used_ids = set()
+    for file_path in ide_files:
+        try:
+            for record in parse_ide(file_path):
+                if record.id is not None and record.section in ID_SECTIONS and not (skip and skip(file_path, record)):
+                    used_ids.add(record.id)
+        except OSError as e:
+            print(f"Error reading {file_path}: {e}")
+    return used_ids
+
+
+def find_ide_files(directory):
+    return find_files(directory, ".ide")
+
+
+class IDAllocator:
+    def __init__(self, used_ids=(), ceiling=DEFAULT_ID_CEILING):
+        self.ceiling = ceiling
+        # Free intervals [starts[i], ends[i]], sorted and never adjacent
+        self.starts = []
+        self.ends = []
+
+        next_free = 0
+        for used in sorted(set(used_ids)):
+            if used > ceiling:
+                break
+            if used > next_free:
+                self.starts.append(next_free)
+                self.ends.append(used - 1)
+            next_free = max(next_free, used + 1)
+        if next_free <= ceiling:
+            self.starts.append(next_free)
+            self.ends.append(ceiling)
+        self.build_tree()
+
+    def build_tree(self):
+        # Max-tree over the interval lengths, so the first interval that fits
+        # a request is found in O(log n). Every interval gets an empty spare slot
+        # (first > last) after it, so reserve() can split an interval and update
+        # only its own leaves; the tree is rebuilt when a split finds no spare.
+        starts, ends = [], []
+        for first, last in zip(self.starts, self.ends):
+            if first <= last:
+                starts += (first, last + 1)
+                ends += (last, last)
+        self.starts, self.ends = starts, ends
+        self.size = 1
+        while self.size < len(self.starts):
+            self.size *= 2
+        self.tree = [0] * (2 * self.size)
+        for i, (first, last) in enumerate(zip(self.starts, self.ends)):
+            self.tree[self.size + i] = max(last - first + 1, 0)
+        for node in range(self.size - 1, 0, -1):
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+
+    def update_tree(self, first_slot, end_slot):
+        # Refreshes the leaves of slots first_slot..end_slot-1 and the nodes above them
+        for i in range(first_slot, end_slot):
+            node = self.size + i
+            self.tree[node] = max(self.ends[i] - self.starts[i] + 1, 0)
+            node //= 2
+            while node and self.tree[node] != max(self.tree[2 * node], self.tree[2 * node + 1]):
+                self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+                node //= 2
+
+    def first_fitting(self, index, count, node=1, low=0, high=None):
+        # First interval at or after `index` with at least `count` IDs, or -1
+        if high is None:
+            high = self.size - 1
+        if high < index or self.tree[node] < count:
+            return -1
+        if low == high:
+            return low
+        middle = (low + high) // 2
+        found = self.first_fitting(index, count, 2 * node, low, middle)
+        if found == -1:
+            found = self.first_fitting(index, count, 2 * node + 1, middle + 1, high)
+        return found
+
+    def is_free(self, first, last=None):
+        # True when every ID from first to last (inclusive) is free
+        last = first if last is None else last
+        i = bisect.bisect_right(self.starts, first) - 1
+        return i >= 0 and self.ends[i] >= last and first <= last
+
+    def find_free(self, count, at_least=0):
+        # Start of the first block of `count` contiguous free IDs at or above `at_least`, or None
+        if count <= 0:
+            return at_least if at_least <= self.ceiling else None
+        i = bisect.bisect_right(self.starts, at_least) - 1
+        if i >= 0 and self.ends[i] - at_least + 1 >= count:
+            return at_least
+        i = self.first_fitting(i + 1, count)
+        return self.starts[i] if i != -1 else None
+
+    def reserve(self, first, last):
+        # Mark first..last as used, in O(log n) unless the tree has to be rebuilt
+        i = bisect.bisect_left(self.ends, first)
+        j = bisect.bisect_right(self.starts, last)
+        taken = [k for k in range(i, j) if self.starts[k] <= self.ends[k]]
+        if not taken:
+            return
+        pieces = []
+        if self.starts[taken[0]] < first:
+            pieces.append((self.starts[taken[0]], first - 1))
+        if self.ends[taken[-1]] > last:
+            pieces.append((last + 1, self.ends[taken[-1]]))
+
+        # Slots i..j-1 are rewritten in place, a split borrows an empty neighbour
+        while j - i < len(pieces):
+            if j < len(self.starts) and self.starts[j] > self.ends[j]:
+                j += 1
+            elif i > 0 and self.starts[i - 1] > self.ends[i - 1]:
+                i -= 1
+            else:
+                self.build_tree()
+                self.reserve(first, last)
+                return
+        previous_end = pieces[-1][1] if pieces else (self.ends[i - 1] if i > 0 else -1)
+        pieces += [(previous_end + 1, previous_end)] * (j - i - len(pieces))
+        self.starts[i:j] = [piece[0] for piece in pieces]
+        self.ends[i:j] = [piece[1] for piece in pieces]
+        self.update_tree(i, j)
+
+    def allocate(self, count, at_least=0):
+        # Reserve and return the start of `count` contiguous free IDs, or None if they do not fit
+        start = self.find_free(count, at_least)
+        if start is not None and count > 0:
+            self.reserve(start, start + count - 1)
+        return start
+
+    def free_ranges(self):
+        return [(first, last) for first, last in zip(self.starts, self.ends) if first <= last]
+
+    def used_ranges(self):
+        ranges = []
+        next_used = 0
+        for first, last in self.free_ranges():
+            if first > next_used:
+                ranges.append((next_used, first - 1))
+            next_used = last + 1
+        if next_used <= self.ceiling:
+            ranges.append((next_used, self.ceiling))
+        return ranges
+
+    def free_count(self):
+        return sum(last - first + 1 for first, last in self.free_ranges())
@@ -1,87 +1,103 @@
 import os
+import queue
+import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext
+from batch_tools import separate_lod_files, collect_ipl_files
+from profiling import profile_from_environment
 
-def process_ipl():
+def select_files():
     file_paths = filedialog.askopenfilenames(filetypes=[("IPL Files", "*.ipl")])
+    if file_paths:
+        process_ipl(list(file_paths))
+
+def select_folder():
+    directory = filedialog.askdirectory(title="Select the IPL folder")
+    if not directory:
+        return
+    file_paths = collect_ipl_files([directory])
     if not file_paths:
+        messagebox.showerror("Error", "No IPL files found in the selected folder.")
         return
-    
-    for file_path in file_paths:
+    process_ipl(file_paths)
+
+def process_ipl(file_paths):
+    # Separates on a background thread (which runs the worker pool) so the window stays responsive
+    if busy.get():
+        return
+    busy.set(True)
+    updates = queue.Queue()
+    binary = binary_var.get()  # Tk variables are read on this thread only
+
+    def progress(done, total, path):
+        updates.put(("progress", done, total, path))
+
+    def worker():
         try:
-            with open(file_path, "r") as file:
-                lines = file.readlines()
-            
-            inst_section = False
-            lod_entries = []
-            modified_lines = []
-
-            for line in lines:
-                stripped = line.strip()
-                
-                if stripped.lower() == "inst":
-                    inst_section = True
-                    modified_lines.append(line)
-                    continue
-                
-                if inst_section and stripped == "end":
-                    inst_section = False
-                    modified_lines.append(line)
-                    continue
-                
-                if inst_section:
-                    parts = stripped.split(",")
-                    if len(parts) > 1:
-                        model_name = parts[1].strip()
-                        if model_name.lower().startswith("lod"):
-                            lod_entries.append(line)
-                            continue
-                    
-                modified_lines.append(line)
-            
-            if lod_entries:
-                save_lod_entries(file_path, lod_entries)
-                with open(file_path, "w") as file:
-                    file.writelines(modified_lines)
+            updates.put(("done",) + separate_lod_files(file_paths, progress=progress, binary=binary))
         except Exception as e:
-            messagebox.showerror("Error", f"An error occurred while processing {file_path}: {e}")
-    
-    status_label.config(text=f"Processing complete! Processed {len(file_paths)} files.")
-
-def save_lod_entries(file_path, lod_entries):
-    directory = os.path.join(os.path.dirname(file_path), "Separated IPLs")
-    os.makedirs(directory, exist_ok=True)
-    
-    new_ipl_path = os.path.join(directory, os.path.basename(file_path))
-    with open(new_ipl_path, "w") as new_file:
-        new_file.write("inst\n")
-        new_file.writelines(lod_entries)
-        new_file.write("end\n")
+            updates.put(("failed", e))
+
+    threading.Thread(target=worker, daemon=True).start()
+    status_label.config(text=f"Processing {len(file_paths)} files...")
+    root.after(50, poll, updates, len(file_paths))
+
+def poll(updates, total):
+    while True:
+        try:
+            message = updates.get_nowait()
+        except queue.Empty:
+            root.after(50, poll, updates, total)
+            return
+        if message[0] == "progress":
+            status_label.config(text=f"Processing... {message[1]}/{message[2]} {os.path.basename(message[3])}")
+            continue
+        busy.set(False)
+        if message[0] == "failed":
+            status_label.config(text="Processing failed, no files were changed.")
+            messagebox.showerror("Error", f"Processing failed, no files were changed: {message[1]}")
+            return
+        _, separated, errors = message
+        status_label.config(text=f"Processing complete! Processed {total} files, moved {sum(separated.values())} LOD entries.")
+        if errors:
+            # One summary for the whole batch
+            messagebox.showerror("Error", f"{len(errors)} of {total} files could not be processed:\n" + "\n".join(errors[:30]) +
+                                 (f"\n... and {len(errors) - 30} more" if len(errors) > 30 else ""))
+        return
 
 def create_gui():
-    global status_label
-    
+    global status_label, binary_var, busy, root
+
     root = tk.Tk()
     root.title("IPL LOD Separator")
     root.geometry("600x450")
     root.configure(bg="#1e1e1e")
-    
+    busy = tk.BooleanVar(value=False)
+
     frame = tk.Frame(root, padx=20, pady=20, bg="#1e1e1e")
     frame.pack(expand=True)
-    
+
     description_label = tk.Label(frame, text="This tool processes IPL files by extracting LOD models and saving them separately.\n" \
-                                      "The original file is updated to remove LOD models, which is very handy for creating Binary IPLs. Select one or more IPL files to begin.",
+                                      "The original file is updated to remove LOD models, which is very handy for creating Binary IPLs. Select one or more IPL files, or a whole folder, to begin.",
                                       font=("Arial", 10, "bold"), wraplength=500, justify="left", fg="white", bg="#1e1e1e")
     description_label.pack(pady=10)
-    
-    select_btn = tk.Button(frame, text="Select IPL Files", command=process_ipl, font=("Arial", 12, "bold"), padx=10, pady=5, bg="#2d89ef", fg="white", relief="flat", cursor="hand2")
+
+    select_btn = tk.Button(frame, text="Select IPL Files", command=select_files, font=("Arial", 12, "bold"), padx=10, pady=5, bg="#2d89ef", fg="white", relief="flat", cursor="hand2")
     select_btn.pack(pady=10)
-    
+
+    folder_btn = tk.Button(frame, text="Select IPL Folder", command=select_folder, font=("Arial", 12, "bold"), padx=10, pady=5, bg="#2d89ef", fg="white", relief="flat", cursor="hand2")
+    folder_btn.pack(pady=5)
+
+    binary_var = tk.BooleanVar(value=False)
+    tk.Checkbutton(frame, text="Write the remaining entries as binary IPLs", variable=binary_var, font=("Arial", 10),
+                   fg="white", bg="#1e1e1e", selectcolor="#1e1e1e", activebackground="#1e1e1e", activeforeground="white").pack(pady=5)
+
     status_label = tk.Label(frame, text="Select IPL files to begin.", font=("Arial", 10), wraplength=500, fg="white", bg="#1e1e1e")
     status_label.pack(pady=10)
-    
-    
+
+
     root.mainloop()
 
 if __name__ == "__main__":
-    create_gui()
\ No newline at end of file
+    profile_from_environment()
+    create_gui()
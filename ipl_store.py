@@ -0,0 +1,178 @@
+# Columnar view of the inst entries of a text IPL, for moving or rotating whole map
+# regions at once.
+#
+#   store = InstStore.load("lae.ipl")
+#   rows = store.in_bbox((-100, -100, 0), (100, 100, 50))
+#   store.rotate(90, pivot=(0, 0, 0), rows=rows)
+#   store.translate((0, 500, 0), rows=rows)
+#   store.save("lae.ipl")
+#
+# Columns are NumPy arrays (id, model, interior, position x/y/z, rotation quaternion
+# x/y/z/w, lod index), one row per inst entry in file order. Every operation takes an
+# optional `rows` selection (boolean mask or row numbers). Writing back only reformats
+# the rows that were changed, comments, other sections and untouched lines stay as they were.
+
+import numpy as np
+
+from binary_ipl import parse_numbers
+from gta_parser import iter_ipl_lines, ENTRY
+
+# Columns of a text inst entry after the model name (id, model, interior, ...)
+NUMERIC_FIELDS = 10
+
+
+def quaternion_multiply(a, b):
+    # Hamilton product of (..., 4) arrays of x, y, z, w
+    ax, ay, az, aw = np.moveaxis(a, -1, 0)
+    bx, by, bz, bw = np.moveaxis(b, -1, 0)
+    return np.stack([aw * bx + ax * bw + ay * bz - az * by,
+                     aw * by - ax * bz + ay * bw + az * bx,
+                     aw * bz + ax * by - ay * bx + az * bw,
+                     aw * bw - ax * bx - ay * by - az * bz], axis=-1)
+
+
+def axis_angle_quaternion(axis, angle):
+    # Quaternion of a rotation by `angle` degrees around `axis`
+    axis = np.asarray(axis, dtype=np.float64)
+    axis = axis / np.linalg.norm(axis)
+    half = np.radians(angle) / 2
+    return np.append(axis * np.sin(half), np.cos(half))
+
+
+def rotation_matrix(quaternion):
+    x, y, z, w = quaternion
+    return np.array([[1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+                     [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+                     [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)]])
+
+
+def format_number(value):
+    # Up to 6 decimals without trailing zeros, like the map editors write them
+    text = "%.6f" % value
+    text = text.rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
+
+
+class InstStore:
+    def __init__(self, lines, file_path="IPL"):
+        # `lines` is every line of the file, with line endings
+        self.file_path = file_path
+        self.lines = list(lines)
+        line_numbers = []
+        models = []
+        numbers = []
+        for line, record in iter_ipl_lines(self.lines):
+            if record.kind == ENTRY and record.section == "inst":
+                parts = line.split(",", 2)
+                if len(parts) < 3:
+                    raise ValueError(f"{file_path}: malformed entry on line {record.line_no}")
+                first, model, rest = parts
+                line_numbers.append(record.line_no - 1)
+                models.append(model.strip())
+                numbers.append(first + "," + rest)
+
+        values = parse_numbers(numbers, NUMERIC_FIELDS, file_path)
+        self.line_numbers = np.array(line_numbers, dtype=np.int64)  # line of each row in `lines`
+        self.id = values[:, 0].astype(np.int32)
+        self.model = np.array(models, dtype=object)
+        self.interior = values[:, 1].astype(np.int32)
+        self.position = values[:, 2:5].copy()
+        self.rotation = values[:, 5:9].copy()
+        self.lod = values[:, 9].astype(np.int32)
+        self.changed = np.zeros(len(line_numbers), dtype=bool)
+
+    @classmethod
+    def load(cls, file_path):
+        with open(file_path, "r", encoding="utf-8", errors="ignore", newline="") as file:
+            return cls(file.readlines(), file_path)
+
+    def __len__(self):
+        return len(self.line_numbers)
+
+    def select(self, rows=None):
+        # Boolean mask of a selection, every row when `rows` is None
+        if rows is None:
+            return np.ones(len(self), dtype=bool)
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            return rows
+        mask = np.zeros(len(self), dtype=bool)
+        mask[rows] = True
+        return mask
+
+    # --- Queries ---
+
+    def in_bbox(self, minimum, maximum, rows=None):
+        # Rows whose position is inside the box (inclusive), None bounds are open
+        mask = self.select(rows).copy()
+        for axis in range(3):
+            if minimum[axis] is not None:
+                mask &= self.position[:, axis] >= minimum[axis]
+            if maximum[axis] is not None:
+                mask &= self.position[:, axis] <= maximum[axis]
+        return mask
+
+    def with_model(self, names, rows=None):
+        names = {name.lower() for name in names}
+        lowered = np.array([model.lower() for model in self.model], dtype=object)
+        return self.select(rows) & np.isin(lowered, list(names))
+
+    # --- Bulk edits ---
+
+    def translate(self, offset, rows=None):
+        mask = self.select(rows)
+        self.position[mask] += np.asarray(offset, dtype=np.float64)
+        self.changed |= mask
+
+    def rotate(self, angle, pivot=(0, 0, 0), axis=(0, 0, 1), rows=None):
+        # Rotates the positions around `pivot` and every object with them, `angle`
+        # degrees around `axis` (counter-clockwise seen from above for the default Z).
+        # IPL rotations are stored inverted (conjugated), so the turn is applied on the right.
+        mask = self.select(rows)
+        turn = axis_angle_quaternion(axis, angle)
+        pivot = np.asarray(pivot, dtype=np.float64)
+        self.position[mask] = (self.position[mask] - pivot) @ rotation_matrix(turn).T + pivot
+        inverse_turn = turn * np.array([-1, -1, -1, 1])
+        rotation = quaternion_multiply(self.rotation[mask], inverse_turn)
+        self.rotation[mask] = rotation / np.linalg.norm(rotation, axis=1, keepdims=True)
+        self.changed |= mask
+
+    def set_interior(self, interior, rows=None):
+        mask = self.select(rows)
+        self.interior[mask] = interior
+        self.changed |= mask
+
+    def set_column(self, name, values, rows=None):
+        # Assigns any column (id, model, interior, position, rotation, lod)
+        mask = self.select(rows)
+        getattr(self, name)[mask] = values
+        self.changed |= mask
+
+    # --- Writing ---
+
+    def format_row(self, row, line):
+        # Rebuilds one entry line, keeping the separator and line ending of the original
+        separator = ", " if ", " in line else ","
+        ending = line[len(line.rstrip("\r\n")):]
+        indent = line[:len(line) - len(line.lstrip())]
+        fields = [str(self.id[row]), self.model[row], str(self.interior[row])]
+        fields += [format_number(value) for value in self.position[row]]
+        fields += [format_number(value) for value in self.rotation[row]]
+        fields.append(str(self.lod[row]))
+        return indent + separator.join(fields) + ending
+
+    def text_lines(self):
+        lines = list(self.lines)
+        for row in np.nonzero(self.changed)[0].tolist():
+            line_number = self.line_numbers[row]
+            lines[line_number] = self.format_row(row, lines[line_number])
+        return lines
+
+    def save(self, file_path=None):
+        # Writes the file (to `file_path`, default the loaded one) and makes the written text the new baseline
+        lines = self.text_lines()
+        with open(file_path or self.file_path, "w", encoding="utf-8", newline="") as out:
+            out.writelines(lines)
+        self.lines = lines
+        self.changed[:] = False
+        return len(lines)
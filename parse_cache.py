@@ -0,0 +1,188 @@
+# Persistent on-disk cache of parsed IDE records, so reopening an unchanged game
+# directory only has to stat files instead of reading and parsing them again.
+
+import hashlib
+import io
+import os
+import pickle
+import threading
+
+import mmap
+
+from gta_parser import Record, iter_ide_lines, scan_entries, ENTRY, IDE_SECTIONS, LARGE_FILE_BYTES
+from profiling import profiled
+from write_journal import is_journal_directory
+
+CACHE_FILE = "ide_parse_cache.pickle"
+CACHE_VERSION = 1
+
+
+def cache_key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def decode_text(data):
+    # Same text open(..., encoding="utf-8", errors="ignore") would return
+    return data.decode("utf-8", errors="ignore").replace('\r\n', '\n').replace('\r', '\n')
+
+
+@profiled("cache.parse")
+def parse_rows(data):
+    # Compact rows stored in the cache for the raw bytes of an IDE file.
+    # Module level so it can run in a worker process.
+    return [(r.section, r.id, r.model, r.txd, r.line_no, r.start, r.end)
+            for _, r in iter_ide_lines(io.StringIO(decode_text(data))) if r.kind == ENTRY]
+
+
+@profiled("cache.parse")
+def scan_rows(file_path):
+    # parse_rows for files too large to read into memory, start/end are byte offsets
+    return [(r.section, r.id, r.model, r.txd, r.line_no, r.start, r.end)
+            for r in scan_entries(file_path, IDE_SECTIONS)]
+
+
+def hash_file(file_path):
+    # sha1 of a file through a memory map, without reading it into memory
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha1(b"").hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return hashlib.sha1(data).hexdigest()
+
+
+class ParseCache:
+    def __init__(self, cache_path=None):
+        self.cache_path = cache_path or os.path.join(os.getcwd(), CACHE_FILE)
+        # path -> (mtime_ns, size, sha1 hex, [(section, id, model, txd, line_no, start, end), ...])
+        self.files = {}
+        # directory -> (mtime_ns, [subdirectories], [ide files])
+        self.dirs = {}
+        self.modified = False
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()  # the editor's loader fills the cache from worker threads
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.cache_path, "rb") as f:
+                data = pickle.load(f)
+            if data.get("version") == CACHE_VERSION:
+                self.files = data["files"]
+                self.dirs = data["dirs"]
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, KeyError, TypeError, ValueError):
+            # Missing or unreadable cache, start from scratch
+            self.files = {}
+            self.dirs = {}
+
+    def save(self):
+        if not self.modified:
+            return
+        temp_path = self.cache_path + ".tmp"
+        try:
+            with self.lock, open(temp_path, "wb") as f:
+                pickle.dump({"version": CACHE_VERSION, "files": self.files, "dirs": self.dirs}, f, pickle.HIGHEST_PROTOCOL)
+                self.modified = False
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            print(f"Error writing parse cache {self.cache_path}: {e}")
+
+    @profiled("cache.walk")
+    def walk(self, directory, extension=".ide"):
+        # Same files os.walk would find, but directories whose mtime did not change
+        # since the last scan are not listed again. The .write_journal backups are skipped.
+        found = []
+        pending = [directory]
+        while pending:
+            dirpath = pending.pop()
+            key = cache_key(dirpath)
+            try:
+                mtime = os.stat(dirpath).st_mtime_ns
+            except OSError:
+                continue
+
+            cached = self.dirs.get(key)
+            if cached and cached[0] == mtime:
+                _, subdirs, files = cached
+            else:
+                subdirs, files = [], []
+                try:
+                    with os.scandir(dirpath) as entries:
+                        for entry in entries:
+                            if entry.is_dir():
+                                if not entry.is_symlink():
+                                    subdirs.append(entry.name)
+                            elif entry.name.lower().endswith(extension):
+                                files.append(entry.name)
+                except OSError:
+                    continue
+                with self.lock:
+                    self.dirs[key] = (mtime, subdirs, files)
+                    self.modified = True
+
+            found.extend(os.path.join(dirpath, name) for name in files)
+            # Checked here rather than when listing, so caches written before it still skip them
+            pending.extend(os.path.join(dirpath, name) for name in reversed(subdirs) if not is_journal_directory(name))
+        return found
+
+    def get_records(self, file_path, data=None):
+        # Entry records of an IDE file, see refresh()
+        return self.to_records(self.refresh(file_path, data))
+
+    def refresh(self, file_path, data=None):
+        # Cached rows of an IDE file. Reads and parses the file only when its
+        # mtime/size changed and its content hash no longer matches.
+        # `data` may hold the raw bytes if the caller has already read the file.
+        rows, stamp, data = self.lookup(file_path, data)
+        if rows is None:
+            rows = parse_rows(data) if data is not None else scan_rows(file_path)
+            self.store(file_path, stamp, rows)
+        return rows
+
+    @profiled("cache.lookup")
+    def lookup(self, file_path, data=None, stat=None):
+        # Returns (rows, None, data) when the cached rows are still valid, or
+        # (None, stamp, data) when the file has to be parsed and stored with store().
+        # Pass the stat taken before reading `data` so a concurrent write is not missed.
+        key = cache_key(file_path)
+        stat = stat or os.stat(file_path)
+        cached = self.files.get(key)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            self.hits += 1
+            return cached[3], None, data
+
+        if data is None and stat.st_size >= LARGE_FILE_BYTES:
+            # Hashed and later parsed from a memory map, `data` stays None
+            stamp = (stat.st_mtime_ns, stat.st_size, hash_file(file_path))
+        else:
+            if data is None:
+                with open(file_path, "rb") as f:
+                    data = f.read()
+            stamp = (stat.st_mtime_ns, stat.st_size, hashlib.sha1(data).hexdigest())
+
+        if cached and cached[2] == stamp[2]:
+            # Touched but not changed
+            self.hits += 1
+            self.store(file_path, stamp, cached[3])
+            return cached[3], None, data
+
+        self.misses += 1
+        return None, stamp, data
+
+    def store(self, file_path, stamp, rows):
+        with self.lock:
+            self.files[cache_key(file_path)] = stamp + (rows,)
+            self.modified = True
+
+    def to_records(self, rows):
+        return [Record(ENTRY, section, line_no, start, end, id, model, txd)
+                for section, id, model, txd, line_no, start, end in rows]
+
+    def forget_missing(self, directory, present):
+        # Drop cached files under `directory` that no longer exist
+        prefix = cache_key(directory)
+        present = {cache_key(path) for path in present}
+        with self.lock:
+            for key in [key for key in self.files if key.startswith(prefix) and key not in present]:
+                del self.files[key]
+                self.modified = True
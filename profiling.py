@@ -0,0 +1,259 @@
+# Optional profiling of the editor and the tools: per-phase timings, counts and peak
+# memory, written as a JSON trace that can be sent along with a slowness report.
+#
+#   profiler.start()
+#   with profiler.phase("renumber"):
+#       with profiler.phase("renumber.read"):
+#           ...
+#       profiler.count("renumber.entries", count)
+#   profiler.stop()
+#   profiler.write_trace("trace.json")
+#
+# Whole functions are timed with the @profiled("name") decorator. The editor turns
+# profiling on from Tools > Profile Operations, batch_tools.py with --profile TRACE,
+# and every tool when GTA_TOOLS_PROFILE=TRACE is set in the environment.
+#
+# Phases are named "tool" or "tool.step". A top-level phase (no dot) is one operation
+# and leaves a one line summary of itself and of what ran during it in last_summary.
+# Work that spans several main loop ticks uses begin()/end() instead of a with block. The trace holds the totals per phase and counter plus every phase
+# call in Chrome trace event format, so it also opens in chrome://tracing or Perfetto.
+# Phases run in worker processes are not recorded, only the parent's view of them.
+#
+# While the profiler is stopped phase() returns a shared no-op context, so the
+# instrumentation can stay in hot paths.
+
+import atexit
+import contextlib
+import functools
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+
+PROFILE_ENVIRONMENT = "GTA_TOOLS_PROFILE"  # trace path, profiles a whole run of any of the tools
+MAX_EVENTS = 200000  # phase calls kept for the trace, the totals keep counting past it
+NOT_PROFILING = contextlib.nullcontext()
+
+
+class PhaseTotals:
+    __slots__ = ("calls", "seconds", "max_seconds", "allocated")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.allocated = 0  # bytes still allocated when the phase ended, summed over calls
+
+    def as_dict(self):
+        return {"calls": self.calls, "seconds": round(self.seconds, 6),
+                "max_seconds": round(self.max_seconds, 6), "allocated_bytes": self.allocated}
+
+
+class Span:
+    # A phase started by Profiler.begin(), recorded when end() is called
+    __slots__ = ("profiler", "name", "started", "memory", "totals")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.memory = profiler.traced_memory()
+        # Top-level phases report what their children and counters added while they ran
+        self.totals = profiler.snapshot() if "." not in name else None
+        self.started = time.perf_counter()
+
+    def end(self):
+        return self.profiler.record(self.name, self.started, self.memory, self.totals)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.end(self)
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.phases = {}  # name -> PhaseTotals
+        self.counters = {}  # name -> total
+        self.events = []  # (name, thread, start, seconds)
+        self.dropped_events = 0
+        self.origin = time.perf_counter()
+        self.started_at = None
+        self.stopped_at = None
+        self.peak_bytes = None
+        self.last_summary = ""
+
+    # --- Control ---
+
+    def start(self, memory=True):
+        # Starts a new profile. `memory` traces allocations for the peak (slows Python code down)
+        self.reset()
+        self.started_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.memory = memory and not tracemalloc.is_tracing()
+        if self.memory:
+            tracemalloc.start()
+        self.enabled = True
+
+    def stop(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        self.stopped_at = time.perf_counter()
+        if self.memory:
+            self.peak_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    # --- Recording ---
+
+    def phase(self, name):
+        if not self.enabled:
+            return NOT_PROFILING
+        return Span(self, name)
+
+    def begin(self, name):
+        # A phase that ends somewhere else (e.g. a later main loop tick), None when not profiling
+        return Span(self, name) if self.enabled else None
+
+    def end(self, span):
+        return span.end() if span is not None and self.enabled else None
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    def traced_memory(self):
+        return tracemalloc.get_traced_memory()[0] if self.memory and tracemalloc.is_tracing() else 0
+
+    def snapshot(self):
+        with self.lock:
+            return {name: (totals.calls, totals.seconds) for name, totals in self.phases.items()}, dict(self.counters)
+
+    def record(self, name, started, memory, before):
+        seconds = time.perf_counter() - started
+        allocated = self.traced_memory() - memory
+        with self.lock:
+            totals = self.phases.get(name)
+            if totals is None:
+                totals = self.phases[name] = PhaseTotals()
+            totals.calls += 1
+            totals.seconds += seconds
+            totals.max_seconds = max(totals.max_seconds, seconds)
+            totals.allocated += allocated
+            if len(self.events) < MAX_EVENTS:
+                self.events.append((name, threading.get_ident(), started - self.origin, seconds))
+            else:
+                self.dropped_events += 1
+        if before is not None:
+            self.last_summary = self.summarize(name, seconds, before)
+        return seconds
+
+    # --- Reporting ---
+
+    def current_peak(self):
+        if self.memory and tracemalloc.is_tracing():
+            return tracemalloc.get_traced_memory()[1]
+        return self.peak_bytes
+
+    def summarize(self, name, seconds, before):
+        # "load 1.23s: load.read 0.40s, editor.insert 0.61s | 2100 load.files | peak 45.1 MB"
+        # for one top-level phase, from what the phases and counters added while it ran
+        phases_before, counters_before = before
+        phases, counters = self.snapshot()
+        added = []
+        for other, (_, other_seconds) in phases.items():
+            extra = other_seconds - phases_before.get(other, (0, 0.0))[1]
+            if other != name and extra > 0:
+                added.append((extra, other))
+        added.sort(reverse=True)
+        text = f"{name} {seconds:.2f}s"
+        if added:
+            text += ": " + ", ".join(f"{other} {extra:.2f}s" for extra, other in added[:4])
+        counts = [f"{value - counters_before.get(counter, 0)} {counter}" for counter, value in counters.items()
+                  if value != counters_before.get(counter, 0)]
+        if counts:
+            text += " | " + ", ".join(counts[:3])
+        peak = self.current_peak()
+        if peak is not None:
+            text += f" | peak {peak / 1048576:.1f} MB"
+        return text
+
+    def trace(self):
+        ended = self.stopped_at if self.stopped_at is not None and not self.enabled else time.perf_counter()
+        pid = os.getpid()
+        with self.lock:
+            events = [{"name": name, "cat": name.split(".", 1)[0], "ph": "X", "pid": pid, "tid": thread,
+                       "ts": round(start * 1e6, 1), "dur": round(seconds * 1e6, 1)}
+                      for name, thread, start, seconds in self.events]
+            phases = {name: totals.as_dict() for name, totals in sorted(self.phases.items())}
+            counters = dict(sorted(self.counters.items()))
+        return {
+            "created": self.started_at,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "total_seconds": round(ended - self.origin, 6),
+            "peak_bytes": self.current_peak(),
+            "phases": phases,
+            "counters": counters,
+            "dropped_events": self.dropped_events,
+            "traceEvents": events,
+        }
+
+    def write_trace(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.trace(), file, indent=1)
+        return path
+
+    def report_lines(self, limit=20):
+        # Slowest phases and the counters, for printing at the end of a command line run
+        lines = [f"{'phase':<36} {'calls':>8} {'seconds':>10} {'max':>9}"]
+        slowest = sorted(self.phases.items(), key=lambda item: item[1].seconds, reverse=True)
+        for name, totals in slowest[:limit]:
+            lines.append(f"{name:<36} {totals.calls:>8} {totals.seconds:>10.3f} {totals.max_seconds:>9.3f}")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name:<36} {value:>8}")
+        peak = self.current_peak()
+        if peak is not None:
+            lines.append(f"peak memory {peak / 1048576:.1f} MB")
+        return lines
+
+
+# The one profiler the editor and the tools record into
+profiler = Profiler()
+
+
+def profiled(name):
+    # Decorator recording every call of a function as phase `name`
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return function(*args, **kwargs)
+            with profiler.phase(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def profile_from_environment():
+    # Profiles the whole run when GTA_TOOLS_PROFILE names a trace file, written at exit
+    trace_path = os.environ.get(PROFILE_ENVIRONMENT)
+    if not trace_path or profiler.enabled:
+        return
+
+    def write():
+        profiler.stop()
+        profiler.write_trace(trace_path)
+        print(f"Profile trace saved to {trace_path}")
+    profiler.start()
+    atexit.register(write)
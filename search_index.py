@@ -0,0 +1,110 @@
+# In-memory inverted index over the ID, model name and TXD columns of loaded IDE files
+
+import re
+
+from gta_parser import iter_ide_lines, ENTRY, ID_SECTIONS
+
+FIELDS = ("id", "model", "txd")
+
+# Query operators, "ID = 1234", "model ^= lod", "TXD contains vgn", "model ~ ^lod.*_a$"
+OPERATORS = {
+    "=": "exact", "==": "exact", "is": "exact",
+    "^=": "prefix", "starts": "prefix", "startswith": "prefix",
+    "contains": "contains", "has": "contains",
+    "~": "regex", "~=": "regex", "matches": "regex", "regex": "regex",
+}
+QUERY_PATTERN = re.compile(r'^\s*(id|model|txd)\s*(==|=|\^=|~=|~|\bis\b|\bstarts\b|\bstartswith\b|\bcontains\b|\bhas\b|\bmatches\b|\bregex\b)\s*(.+?)\s*$', re.IGNORECASE)
+
+
+def parse_query(query):
+    # Returns (fields, mode, value) for a search box query.
+    #   "ID = 1234"         exact match on one column
+    #   "model ^= lod"      prefix match on one column
+    #   "TXD contains vgn"  substring match on one column
+    #   "model ~ ^lod.*"    regex on one column
+    #   "/regex/"           regex on every column
+    #   "lod*"              prefix on every column
+    #   "vgn"               substring on every column
+    match = QUERY_PATTERN.match(query)
+    if match:
+        fields = (match.group(1).lower(),)
+        mode = OPERATORS[match.group(2).lower()]
+        value = match.group(3)
+    elif len(query) > 1 and query.startswith('/') and query.endswith('/'):
+        fields, mode, value = FIELDS, "regex", query[1:-1]
+    elif query.endswith('*'):
+        fields, mode, value = FIELDS, "prefix", query[:-1]
+    else:
+        fields, mode, value = FIELDS, "contains", query
+
+    if mode == "regex":
+        value = re.compile(value, re.IGNORECASE)  # raises re.error for a bad pattern
+    else:
+        value = value.lower()
+    return fields, mode, value
+
+
+def line_fields(line, section):
+    # (field, term, column, length) for the indexed columns of an entry line
+    columns = ("id", "model", "txd") if section in ID_SECTIONS else ("txd", "txd") if section == "txdp" else ("id",) if section == "2dfx" else ()
+    column = 0
+    for field, part in zip(columns, line.split(',', len(columns))):
+        value = part.strip()
+        if value and (field != "id" or value.isdigit()):
+            start = column + len(part) - len(part.lstrip())
+            yield field, value.lower(), start, len(value)
+        column += len(part) + 1
+
+
+class SearchIndex:
+    def __init__(self):
+        # field -> term -> {document: [(line, column, length), ...]}
+        self.terms = {field: {} for field in FIELDS}
+        # document -> [(field, term), ...] so a document can be dropped before re-indexing it
+        self.document_terms = {}
+
+    def clear(self):
+        for terms in self.terms.values():
+            terms.clear()
+        self.document_terms.clear()
+
+    def remove_document(self, document):
+        for field, term in self.document_terms.pop(document, ()):
+            postings = self.terms[field].get(term)
+            if postings is not None:
+                postings.pop(document, None)
+                if not postings:
+                    del self.terms[field][term]
+
+    def index_document(self, document, text):
+        # (Re)index the text of a document, lines are counted from 0
+        self.remove_document(document)
+        indexed = set()
+        for line, record in iter_ide_lines(text.split('\n')):
+            if record.kind != ENTRY:
+                continue
+            for field, term, column, length in line_fields(line, record.section):
+                self.terms[field].setdefault(term, {}).setdefault(document, []).append((record.line_no - 1, column, length))
+                indexed.add((field, term))
+        self.document_terms[document] = list(indexed)
+
+    def matching_terms(self, field, mode, value):
+        terms = self.terms[field]
+        if mode == "exact":
+            return [value] if value in terms else []
+        if mode == "prefix":
+            return [term for term in terms if term.startswith(value)]
+        if mode == "contains":
+            return [term for term in terms if value in term]
+        return [term for term in terms if value.search(term)]
+
+    def search(self, query):
+        # Sorted (document, line, column, length) hits of a query, see parse_query()
+        fields, mode, value = parse_query(query)
+        hits = []
+        for field in fields:
+            for term in self.matching_terms(field, mode, value):
+                for document, postings in self.terms[field][term].items():
+                    hits.extend((document,) + posting for posting in postings)
+        hits.sort()
+        return hits
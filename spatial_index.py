@@ -0,0 +1,181 @@
+# Spatial index over the inst placements of a folder of IPL files, for finding what is
+# placed in an area and exporting it.
+#
+#   index = SpatialIndex.from_files(find_ipl_files("data/maps"))
+#   rows = index.in_radius((2495, -1665, 13), 50)
+#   index.export(rows, "grove_street.ipl")
+#
+# Positions go into a uniform XY grid: every entry gets a cell key and the entries are
+# sorted by key once (O(n log n)), so a cell column of the grid is one contiguous slice
+# found with searchsorted. Queries only touch the cells that overlap them.
+
+import os
+
+import numpy as np
+
+from binary_ipl import is_binary_ipl, read_binary_ipl, arrays_to_text_lines
+from ipl_store import InstStore
+
+DEFAULT_CELL_SIZE = 100.0  # world units, SA is about 6000 x 6000
+
+
+class SpatialIndex:
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self.files = []
+        self.errors = []
+        # Per file pieces, concatenated by build() which must run before querying
+        self.pieces = []
+
+    @classmethod
+    def from_files(cls, file_paths, models=None, cell_size=DEFAULT_CELL_SIZE):
+        # `models` (model ID -> name) names the entries of binary IPLs
+        index = cls(cell_size)
+        for file_path in file_paths:
+            try:
+                index.add_file(file_path, models)
+            except (OSError, ValueError) as e:
+                index.errors.append(f"{file_path}: {e}")
+        index.build()
+        return index
+
+    def add_file(self, file_path, models=None):
+        if is_binary_ipl(file_path):
+            inst, _ = read_binary_ipl(file_path)
+            lines = arrays_to_text_lines(inst, models=models)[1:-1]
+            position = np.stack([inst["x"], inst["y"], inst["z"]], axis=1).astype(np.float64)
+            model = np.array([line.split(",", 2)[1].strip() for line in lines], dtype=object)
+            line_numbers = np.arange(len(inst))  # binary entries are reported by row
+            lod = inst["lod"].astype(np.int32)
+        else:
+            store = InstStore.load(file_path)
+            lines = [store.lines[line_number] for line_number in store.line_numbers.tolist()]
+            position, model, line_numbers, lod = store.position, store.model, store.line_numbers + 1, store.lod
+        self.pieces.append((len(self.files), position, model, line_numbers, lod, lines))
+        self.files.append(file_path)
+
+    def build(self):
+        pieces = self.pieces
+        self.file = np.concatenate([np.full(len(piece[1]), piece[0], dtype=np.int32) for piece in pieces]) if pieces else np.zeros(0, np.int32)
+        self.position = np.concatenate([piece[1] for piece in pieces]) if pieces else np.zeros((0, 3))
+        self.model = np.concatenate([piece[2] for piece in pieces]) if pieces else np.zeros(0, dtype=object)
+        self.line_number = np.concatenate([piece[3] for piece in pieces]) if pieces else np.zeros(0, np.int64)
+        self.lod = np.concatenate([piece[4] for piece in pieces]) if pieces else np.zeros(0, np.int32)
+        self.lines = [line for piece in pieces for line in piece[5]]
+        # Entries of a file are contiguous, so row r of file f is entry file_start[f] + r
+        self.file_start = np.zeros(len(self.files) + 1, dtype=np.int64)
+        self.file_start[1:] = np.cumsum([len(piece[1]) for piece in pieces])
+
+        # Grid cells, sorted by key = column * rows + row
+        if len(self.position):
+            self.origin = self.position[:, :2].min(axis=0)
+            cells = np.floor((self.position[:, :2] - self.origin) / self.cell_size).astype(np.int64)
+            self.grid_size = cells.max(axis=0) + 1
+        else:
+            self.origin = np.zeros(2)
+            cells = np.zeros((0, 2), dtype=np.int64)
+            self.grid_size = np.zeros(2, dtype=np.int64)
+        keys = cells[:, 0] * self.grid_size[1] + cells[:, 1]
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+
+        # Entries of each model (case-insensitive), for nearest-by-model lookups
+        lowered = np.array([model.lower() for model in self.model], dtype=object)
+        self.model_names, model_keys = np.unique(lowered, return_inverse=True) if len(lowered) else (np.zeros(0, dtype=object), np.zeros(0, np.int64))
+        self.model_order = np.argsort(model_keys, kind="stable")
+        self.model_bounds = np.searchsorted(model_keys[self.model_order], np.arange(len(self.model_names) + 1))
+        self.pieces = []
+
+    def __len__(self):
+        return len(self.position)
+
+    # --- Queries, all return entry numbers ---
+
+    def in_bbox(self, minimum, maximum):
+        # Entries inside the box (inclusive), in file order. None bounds are open.
+        if not len(self):
+            return np.zeros(0, dtype=np.int64)
+        low = [self.position[:, axis].min() if minimum[axis] is None else minimum[axis] for axis in range(3)]
+        high = [self.position[:, axis].max() if maximum[axis] is None else maximum[axis] for axis in range(3)]
+        first = np.floor((np.array(low[:2]) - self.origin) / self.cell_size).astype(np.int64)
+        last = np.floor((np.array(high[:2]) - self.origin) / self.cell_size).astype(np.int64)
+        first = np.maximum(first, 0)
+        last = np.minimum(last, self.grid_size - 1)
+        if (first > last).any():
+            return np.zeros(0, dtype=np.int64)
+
+        slices = []
+        for column in range(first[0], last[0] + 1):
+            start = np.searchsorted(self.sorted_keys, column * self.grid_size[1] + first[1], "left")
+            end = np.searchsorted(self.sorted_keys, column * self.grid_size[1] + last[1], "right")
+            slices.append(self.order[start:end])
+        candidates = np.concatenate(slices)
+        position = self.position[candidates]
+        inside = np.all((position >= low) & (position <= high), axis=1)
+        return np.sort(candidates[inside])
+
+    def in_radius(self, center, radius):
+        # Entries within `radius` of `center` (3D), nearest first
+        center = np.asarray(center, dtype=np.float64)
+        candidates = self.in_bbox(center - radius, center + radius)
+        distance = np.linalg.norm(self.position[candidates] - center, axis=1)
+        inside = distance <= radius
+        return candidates[inside][np.argsort(distance[inside], kind="stable")]
+
+    def with_model(self, model):
+        i = np.searchsorted(self.model_names, model.lower())
+        if i == len(self.model_names) or self.model_names[i] != model.lower():
+            return np.zeros(0, dtype=np.int64)
+        return self.model_order[self.model_bounds[i]:self.model_bounds[i + 1]]
+
+    def nearest(self, point, model=None, count=1):
+        # The `count` entries closest to `point`, of one model or of any, nearest first
+        point = np.asarray(point, dtype=np.float64)
+        if model is not None:
+            candidates = self.with_model(model)
+        else:
+            # Grow a search radius from one cell until it holds enough entries or the whole map
+            if not len(self):
+                return np.zeros(0, dtype=np.int64)
+            farthest = np.linalg.norm(np.maximum(np.abs(point - self.position.min(axis=0)), np.abs(point - self.position.max(axis=0))))
+            radius = self.cell_size
+            candidates = self.in_radius(point, min(radius, farthest))
+            while len(candidates) < count and radius < farthest:
+                radius *= 2
+                candidates = self.in_radius(point, min(radius, farthest))
+        distance = np.linalg.norm(self.position[candidates] - point, axis=1)
+        return candidates[np.argsort(distance, kind="stable")[:count]]
+
+    # --- Results ---
+
+    def describe(self, entry):
+        # "file:line model (x, y, z)", binary IPLs give the row instead of the line
+        x, y, z = self.position[entry]
+        return f"{self.files[self.file[entry]]}:{self.line_number[entry]} {self.model[entry]} ({x:.3f}, {y:.3f}, {z:.3f})"
+
+    def export_lines(self, entries):
+        # Text IPL lines of the entries, in file order. LOD indices are pointed at the
+        # exported rows, or -1 when the LOD was not exported with them.
+        entries = np.sort(np.asarray(entries, dtype=np.int64))
+        new_row = np.full(len(self), -1, dtype=np.int64)
+        new_row[entries] = np.arange(len(entries))
+        lod = self.lod[entries]
+        lod_entry = self.file_start[self.file[entries]] + lod
+        file_rows = self.file_start[self.file[entries] + 1] - self.file_start[self.file[entries]]
+        valid = (lod >= 0) & (lod < file_rows)
+        new_lod = np.full(len(entries), -1, dtype=np.int64)
+        new_lod[valid] = new_row[lod_entry[valid]]
+
+        lines = [f"# {len(entries)} inst entries exported from {len(np.unique(self.file[entries]))} IPL files\n", "inst\n"]
+        for entry, lod_row in zip(entries.tolist(), new_lod.tolist()):
+            line = self.lines[entry].rstrip("\r\n")
+            head, separator, _ = line.rpartition(",")
+            lines.append(f"{head}{separator}{' ' if ', ' in line else ''}{lod_row}\n")
+        lines.append("end\n")
+        return lines
+
+    def export(self, entries, output_path):
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        with open(output_path, "w", encoding="utf-8") as out:
+            out.writelines(self.export_lines(entries))
+        return len(entries)
@@ -0,0 +1,141 @@
+# Writes a synthetic GTA SA map corpus (IDE definitions and IPL placements) for benchmarks.
+#
+#   python synthetic_corpus.py OUTPUT_DIR --entries 100000 [--seed 1]
+#
+# `entries` is the number of IDE definitions. Every definition is placed once in the
+# IPLs, so the corpus has about the same number of inst lines. About a quarter of the
+# objects get a "lod" model, a few IDs are duplicated on purpose, and every file has
+# comments and blank lines like the real ones.
+
+import argparse
+import os
+import random
+
+AREAS = ("lae", "law", "lan", "sfe", "sfn", "sfs", "sfw", "vgn", "vgs", "vge", "cen", "cun", "cw")
+KINDS = ("bldg", "road", "tree", "hse", "shop", "wall", "land", "bit", "grnd", "fence")
+FIRST_ID = 18631  # first ID after the original SA models
+ENTRIES_PER_IDE = 2000
+LOD_RATIO = 0.25
+DUPLICATE_RATIO = 0.005
+TOBJ_RATIO = 0.1
+COMMENT_RATIO = 0.02
+WRITE_CHUNK = 5000  # lines buffered before each write
+
+
+class CorpusWriter:
+    # Buffers lines and writes them in chunks, so even 2M entries stream in constant memory
+    def __init__(self, path):
+        self.file = open(path, "w", encoding="utf-8", newline="\n")
+        self.lines = []
+
+    def write(self, line):
+        self.lines.append(line)
+        if len(self.lines) >= WRITE_CHUNK:
+            self.flush()
+
+    def flush(self):
+        self.file.write("".join(self.lines))
+        self.lines = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def generate_corpus(directory, entries=10000, seed=0, entries_per_file=ENTRIES_PER_IDE,
+                    lod_ratio=LOD_RATIO, duplicate_ratio=DUPLICATE_RATIO, tobj_ratio=TOBJ_RATIO,
+                    comment_ratio=COMMENT_RATIO):
+    # Writes DIRECTORY/ide/*.ide and DIRECTORY/ipl/*.ipl and returns a summary dict
+    rng = random.Random(seed)
+    ide_directory = os.path.join(directory, "ide")
+    ipl_directory = os.path.join(directory, "ipl")
+    os.makedirs(ide_directory, exist_ok=True)
+    os.makedirs(ipl_directory, exist_ok=True)
+
+    summary = {"entries": entries, "seed": seed, "ide_files": 0, "ipl_files": 0,
+               "objs": 0, "tobj": 0, "lod_models": 0, "duplicate_ids": 0, "inst": 0, "comments": 0}
+    next_id = FIRST_ID
+    written = 0
+    file_index = 0
+    while written < entries:
+        count = min(entries_per_file, entries - written)
+        area = AREAS[file_index % len(AREAS)]
+        name = f"{area}_{file_index:04d}"
+        ide = CorpusWriter(os.path.join(ide_directory, name + ".ide"))
+        ipl = CorpusWriter(os.path.join(ipl_directory, name + ".ipl"))
+
+        # Models of this file: (id, model, section, lod index in the list or None)
+        models = []
+        while len(models) < count:
+            model = f"{area}_{rng.choice(KINDS)}{written + len(models):07d}"
+            section = "tobj" if rng.random() < tobj_ratio else "objs"
+            has_lod = section == "objs" and len(models) + 1 < count and rng.random() < lod_ratio
+            if has_lod:
+                models.append((next_id, "lod" + model, "objs", None))
+                next_id += 1
+                summary["lod_models"] += 1
+            if rng.random() < duplicate_ratio and next_id > FIRST_ID + 1:
+                model_id = rng.randrange(FIRST_ID, next_id - 1)
+                summary["duplicate_ids"] += 1
+            else:
+                model_id = next_id
+                next_id += 1
+            models.append((model_id, model, section, len(models) - 1 if has_lod else None))
+
+        ide.write(f"# IDE generated for benchmarks, {name}\n")
+        for section in ("objs", "tobj"):
+            ide.write(section + "\n")
+            for model_id, model, model_section, _ in models:
+                if model_section != section:
+                    continue
+                if rng.random() < comment_ratio:
+                    ide.write(f"# {model}\n")
+                    summary["comments"] += 1
+                txd = model[:-3]
+                draw_distance = 1500 if model.startswith("lod") else rng.choice((80, 150, 299))
+                if section == "objs":
+                    ide.write(f"{model_id}, {model}, {txd}, {draw_distance}, {rng.choice((0, 4, 128, 2097152))}\n")
+                else:
+                    ide.write(f"{model_id}, {model}, {txd}, {draw_distance}, 4, {rng.choice((20, 22))}, {rng.choice((5, 6))}\n")
+                summary[section] += 1
+            ide.write("end\n\n")
+        ide.close()
+
+        # inst rows: the LOD of an object comes right before it and is referenced by row index
+        ipl.write(f"# IPL generated for benchmarks, {name}\ninst\n")
+        rows = {}
+        for index, (model_id, model, _, lod) in enumerate(models):
+            if rng.random() < comment_ratio:
+                ipl.write(f"# {model}\n")
+                summary["comments"] += 1
+            x, y, z = rng.uniform(-3000, 3000), rng.uniform(-3000, 3000), rng.uniform(0, 200)
+            rotation = rng.choice(("0, 0, 0, 1", "0, 0, -0.7071068, 0.7071068", "0, 0, 1, 0"))
+            lod_row = rows.get(lod, -1)
+            ipl.write(f"{model_id}, {model}, 0, {x:.5f}, {y:.5f}, {z:.5f}, {rotation}, {lod_row}\n")
+            rows[index] = len(rows)
+        ipl.write("end\ncull\nend\npath\nend\n")
+        ipl.close()
+        summary["inst"] += len(models)
+
+        written += count
+        file_index += 1
+        summary["ide_files"] += 1
+        summary["ipl_files"] += 1
+    summary["max_id"] = next_id - 1
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic GTA SA IDE/IPL corpus")
+    parser.add_argument("directory")
+    parser.add_argument("--entries", type=int, default=10000, help="number of IDE definitions (10000 to 2000000)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--entries-per-file", type=int, default=ENTRIES_PER_IDE)
+    args = parser.parse_args(argv)
+
+    summary = generate_corpus(args.directory, args.entries, args.seed, args.entries_per_file)
+    print(", ".join(f"{key}: {value}" for key, value in summary.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+# Journaled multi-file commits for the tools that rewrite game files.
+#
+# Every output of a batch is staged to a unique temp file next to its target (workers may
+# write them in parallel). commit() then backs up the originals, records them in a
+# manifest and renames every staged file over its target. If a rename fails the batch is
+# rolled back; if the process dies mid-commit, recover() puts the originals back.
+#
+#   with WriteJournal(folder) as journal:
+#       with open(journal.stage(path), "w") as out:
+#           ...
+#   # committed here, or rolled back if the block raised
+#
+# Only the newest KEEP_BATCHES finished batches under a folder keep their backups, older
+# ones are pruned after each commit (or with prune(root, keep)). Batches interrupted
+# mid-commit are never pruned, recover() still needs them.
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from profiling import profiled
+
+JOURNAL_DIR = ".write_journal"
+MANIFEST = "manifest.json"
+KEEP_BATCHES = 20  # finished batches whose backups are kept under a folder
+
+# Manifest states
+STAGED = "staged"
+COMMITTING = "committing"
+COMMITTED = "committed"
+ROLLED_BACK = "rolled back"
+RESTORED = "restored"
+
+
+def is_journal_directory(name):
+    # Folders that scanners for game files must not walk into
+    return name.lower() == JOURNAL_DIR
+
+
+def find_files(directory, extension):
+    # Files ending in `extension` in a folder and its subfolders, without the backups in
+    # .write_journal (which are old copies of the same files)
+    found = []
+    for dirpath, dirnames, files in os.walk(directory):
+        dirnames[:] = [name for name in dirnames if not is_journal_directory(name)]
+        found.extend(os.path.join(dirpath, name) for name in sorted(files) if name.lower().endswith(extension))
+    return found
+
+
+def write_json_atomic(path, data):
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file, indent=2)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+
+def fsync_file(path):
+    try:
+        with open(path, "rb+") as file:
+            os.fsync(file.fileno())
+    except OSError:
+        pass
+
+
+def backup_file(path, backup_path):
+    # A hard link costs nothing and keeps the old content once the target is replaced
+    try:
+        os.link(path, backup_path)
+    except OSError:
+        shutil.copy2(path, backup_path)
+
+
+def restore_file(backup_path, path):
+    # Copy the backup back through a temp file so the backup itself survives
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=os.path.basename(path) + ".", suffix=".restore")
+    os.close(fd)
+    try:
+        shutil.copy2(backup_path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class JournalError(Exception):
+    pass
+
+
+class WriteJournal:
+    def __init__(self, root, keep_backups=True, keep=KEEP_BATCHES):
+        # Backups and the manifest go to ROOT/.write_journal/<time>_<pid>, the batches
+        # beyond the newest `keep` are pruned once this one is committed
+        self.root = root
+        self.directory = os.path.join(root, JOURNAL_DIR, time.strftime("%Y%m%d_%H%M%S") + f"_{os.getpid()}_{id(self):x}")
+        self.keep_backups = keep_backups
+        self.keep = keep
+        self.staged = {}  # target path -> staged temp path, in staging order
+        self.created_directories = set()  # output folders made by stage(), removed again if left empty
+        self.lock = threading.Lock()  # stage() is called from worker threads
+        self.state = STAGED
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+    def __len__(self):
+        return len(self.staged)
+
+    def stage(self, path):
+        # Unique temp file next to `path` to write its new content to
+        path = os.path.abspath(path)
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+            with self.lock:
+                self.created_directories.add(directory)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+        os.close(fd)
+        with self.lock:
+            if self.state != STAGED:
+                os.remove(temp_path)
+                raise JournalError("The journal was already committed or rolled back")
+            previous = self.staged.get(path)
+            self.staged[path] = temp_path
+        if previous and os.path.exists(previous):
+            os.remove(previous)
+        return temp_path
+
+    def discard(self, path):
+        # Drop a staged output, e.g. when the file turned out not to change
+        with self.lock:
+            temp_path = self.staged.pop(os.path.abspath(path), None)
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    def rollback(self):
+        # Before commit: drop every staged file, the originals were never touched
+        with self.lock:
+            staged, self.staged = self.staged, {}
+            if self.state == STAGED:
+                self.state = ROLLED_BACK
+        for temp_path in staged.values():
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        self.remove_empty_directories()
+
+    def remove_empty_directories(self):
+        for directory in sorted(self.created_directories, reverse=True):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                pass  # not empty, it holds outputs
+
+    @profiled("journal.commit")
+    def commit(self):
+        # Returns the list of files written
+        with self.lock:
+            if self.state != STAGED:
+                raise JournalError("The journal was already committed or rolled back")
+            self.state = COMMITTING
+            staged = list(self.staged.items())
+        if not staged:
+            self.state = COMMITTED
+            self.remove_empty_directories()
+            return []
+
+        for path, temp_path in staged:
+            if os.path.exists(path):
+                shutil.copymode(path, temp_path)  # mkstemp files are private
+            fsync_file(temp_path)
+
+        # Back up the originals and write the manifest before the first rename
+        os.makedirs(self.directory, exist_ok=True)
+        manifest = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "state": COMMITTING, "files": []}
+        for index, (path, temp_path) in enumerate(staged):
+            entry = {"path": path, "staged": temp_path, "backup": None}
+            if os.path.exists(path):
+                entry["backup"] = os.path.join(self.directory, f"{index:06d}_{os.path.basename(path)}")
+                backup_file(path, entry["backup"])
+            manifest["files"].append(entry)
+        manifest_path = os.path.join(self.directory, MANIFEST)
+        write_json_atomic(manifest_path, manifest)
+
+        replaced = []
+        try:
+            for path, temp_path in staged:
+                os.replace(temp_path, path)
+                replaced.append(path)
+        except BaseException:
+            undo_entries([entry for entry in manifest["files"] if entry["path"] in set(replaced)])
+            for _, temp_path in staged:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            manifest["state"] = ROLLED_BACK
+            write_json_atomic(manifest_path, manifest)
+            self.state = ROLLED_BACK
+            self.remove_empty_directories()
+            raise
+
+        manifest["state"] = COMMITTED
+        write_json_atomic(manifest_path, manifest)
+        self.state = COMMITTED
+        if not self.keep_backups:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            try:
+                os.rmdir(os.path.dirname(self.directory))
+            except OSError:
+                pass  # other batches are kept there
+        else:
+            try:
+                prune(self.root, self.keep)
+            except OSError as e:
+                print(f"Error pruning old batches in {self.root}: {e}")
+        return [path for path, _ in staged]
+
+
+def undo_entries(entries):
+    # Put the backed up originals back and remove files the batch created
+    for entry in entries:
+        if entry["backup"]:
+            restore_file(entry["backup"], entry["path"])
+        elif os.path.exists(entry["path"]):
+            os.remove(entry["path"])
+
+
+def list_journals(root):
+    # (journal directory, manifest) of every batch under ROOT, oldest first
+    journals = []
+    base = os.path.join(root, JOURNAL_DIR)
+    if not os.path.isdir(base):
+        return journals
+    for name in sorted(os.listdir(base)):
+        manifest_path = os.path.join(base, name, MANIFEST)
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as file:
+                journals.append((os.path.join(base, name), json.load(file)))
+        except (OSError, ValueError):
+            continue
+    return journals
+
+
+def recover(root):
+    # Rolls back every batch under ROOT that was interrupted mid-commit.
+    # Returns the journal directories that were recovered.
+    recovered = []
+    for directory, manifest in list_journals(root):
+        if manifest.get("state") != COMMITTING:
+            continue
+        undo_entries(manifest["files"])
+        for entry in manifest["files"]:
+            if os.path.exists(entry["staged"]):
+                os.remove(entry["staged"])
+        manifest["state"] = ROLLED_BACK
+        write_json_atomic(os.path.join(directory, MANIFEST), manifest)
+        recovered.append(directory)
+    return recovered
+
+
+def prune(root, keep=KEEP_BATCHES):
+    # Removes the backups of all but the newest `keep` finished batches under ROOT.
+    # Returns the journal directories that were removed.
+    finished = [directory for directory, manifest in list_journals(root) if manifest.get("state") != COMMITTING]
+    removed = finished[:max(len(finished) - max(keep, 0), 0)]
+    for directory in removed:
+        shutil.rmtree(directory)
+    return removed
+
+
+def restore(journal_directory):
+    # Undoes a committed batch from its backups (the newest batch first if several touched the same files)
+    manifest_path = os.path.join(journal_directory, MANIFEST)
+    with open(manifest_path, "r", encoding="utf-8") as file:
+        manifest = json.load(file)
+    if manifest.get("state") not in (COMMITTED, COMMITTING):
+        raise JournalError(f"Nothing to restore, the batch is {manifest.get('state')}")
+    undo_entries(manifest["files"])
+    manifest["state"] = RESTORED
+    write_json_atomic(manifest_path, manifest)
+    return [entry["path"] for entry in manifest["files"]]